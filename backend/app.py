@@ -1,26 +1,52 @@
 
 import os
 import json
+import asyncio
 import time
 import hmac
 import base64
 import hashlib
 import secrets
+import random
 import logging
+import threading
 from pathlib import Path
-from typing import Optional, Any, Dict, List, Tuple
+from urllib.parse import quote
+from typing import Optional, Any, Dict, List, Tuple, Literal
 
 from datetime import datetime, timezone
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Depends, Header, Request, Query
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
-
-from db import get_db, init_db
-from paystack_routes import router as paystack_router
+from pydantic import BaseModel, Field
+
+from db import get_db, init_db, get_content_version
+from paystack_routes import router as paystack_router, require_admin, paystack_public_key
+from question_bank import compile_bank, get_bank
+from question_index import QuestionIndex
+from question_replica import (
+    read_questions, start_replica_sync, primary_degraded, mark_primary_degraded, get_primary_db,
+)
+from question_search import search_questions, search_terms
+from question_similar import SIMILAR_TOP_K, build_similar_table
+from question_dedup import dedup_questions
+from question_topics import build_question_topics
+from mock_exam import sample_stratified
+from grading import grade_objective, CORRECT, UNGRADED
+from progress_events import progress_buffer, BufferFull, EVENT_KINDS, PROGRESS_FLUSH_SECONDS
+from question_stats import SQL_SORTS, add_deltas, rollup_question_stats, stats_snapshot, refresh_stats_snapshot
+from question_irt import MODELS as IRT_MODELS, calibrate as calibrate_irt
+from compression import CompressionMiddleware
+from paper_bundles import build_bundles, load_manifest, bundle_path
+from diagram_assets import DIAGRAM_ASSETS_DIR, DIAGRAM_ASSETS_URL, build_diagram_assets, diagram_details
+from diagram_server import DiagramStore
+from payloads import (
+    Diagram, Question, QuestionSummary, Solution, QuestionPage, SearchHit, SimilarQuestion,
+    FastJSONResponse, encode_json, negotiated_response, wants_msgpack,
+)
 
 # -----------------------------
 # ENV / CONFIG
@@ -35,6 +61,7 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 DIAGRAMS_DIR = Path(os.getenv("DIAGRAMS_DIR", str(Path(__file__).resolve().parent / "diagrams")))
 # Ensure diagrams dir exists (local + deployed)
 DIAGRAMS_DIR.mkdir(parents=True, exist_ok=True)
+DIAGRAM_ASSETS_DIR.mkdir(parents=True, exist_ok=True)
 
 cors_origins_raw = os.getenv("CORS_ORIGINS", "http://127.0.0.1:5173,http://127.0.0.1:5500")
 CORS_ORIGINS = [o.strip() for o in cors_origins_raw.split(",") if o.strip()]
@@ -42,6 +69,33 @@ CORS_ORIGINS = [o.strip() for o in cors_origins_raw.split(",") if o.strip()]
 FREE_SAMPLE_LIMIT_OBJ = int(os.getenv("FREE_SAMPLE_LIMIT_OBJ", "10"))
 FREE_SAMPLE_LIMIT_THEORY = int(os.getenv("FREE_SAMPLE_LIMIT_THEORY", "2"))
 
+# Compiled question bank (mmapped by every worker). Built by `python question_bank.py`
+# or POST /admin/question-bank/publish; empty value disables it.
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", str(Path(__file__).resolve().parent / "question_bank.bin"))
+# Max ids per /questions/batch call (viewer prefetch)
+QUESTION_BATCH_MAX = int(os.getenv("QUESTION_BATCH_MAX", "20"))
+# Max results per /questions/search page
+SEARCH_LIMIT_MAX = int(os.getenv("SEARCH_LIMIT_MAX", "50"))
+# /mock-exam paper size caps and timing (minutes per question)
+MOCK_MAX_OBJECTIVE = int(os.getenv("MOCK_MAX_OBJECTIVE", "100"))
+MOCK_MAX_THEORY = int(os.getenv("MOCK_MAX_THEORY", "20"))
+MOCK_MINUTES_PER_OBJECTIVE = float(os.getenv("MOCK_MINUTES_PER_OBJECTIVE", "1"))
+MOCK_MINUTES_PER_THEORY = float(os.getenv("MOCK_MINUTES_PER_THEORY", "12"))
+# Max answers per /attempts submission
+ATTEMPT_MAX_ANSWERS = int(os.getenv("ATTEMPT_MAX_ANSWERS", "200"))
+# A last-known account row may stand in for this long while the primary is unreachable
+ACCOUNT_CACHE_SECONDS = int(os.getenv("ACCOUNT_CACHE_SECONDS", "900"))
+# Max events per /progress/events batch
+PROGRESS_BATCH_MAX = int(os.getenv("PROGRESS_BATCH_MAX", "500"))
+# Rows per query while streaming /questions/changes
+QUESTION_CHANGES_CHUNK = int(os.getenv("QUESTION_CHANGES_CHUNK", "500"))
+# Founding seat count is cached this long (it only gates the Founding offer UI)
+FOUNDING_STATUS_TTL_SECONDS = int(os.getenv("FOUNDING_STATUS_TTL_SECONDS", "30"))
+# Response header carrying the content version (service worker cache versioning)
+CONTENT_VERSION_HEADER = "X-Content-Version"
+# How long a worker trusts its cached content version before re-reading it
+CONTENT_VERSION_TTL_SECONDS = int(os.getenv("CONTENT_VERSION_TTL_SECONDS", "15"))
+
 
 # -----------------------------
 # LOGGING
@@ -63,11 +117,27 @@ app.add_middleware(
     allow_credentials=False,      # ✅ must be False when using "*"
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[CONTENT_VERSION_HEADER],
 )
 
+# gzip/brotli for larger responses; see compression.py
+app.add_middleware(CompressionMiddleware)
+
+
+# Diagrams (served at /static/diagrams/<filename>) and their built WebP/AVIF
+# variants (content-hashed names, so immutable); see diagram_server.py
+diagram_files = DiagramStore(DIAGRAMS_DIR, immutable=False)
+diagram_asset_files = DiagramStore(DIAGRAM_ASSETS_DIR, immutable=True)
 
-# Serve diagrams (served at /static/diagrams/<filename>)
-app.mount("/static/diagrams", StaticFiles(directory=str(DIAGRAMS_DIR)), name="diagrams")
+
+@app.api_route("/static/diagrams/{name}", methods=["GET", "HEAD"], include_in_schema=False)
+def serve_diagram(name: str, request: Request):
+    return diagram_files.response(name, request)
+
+
+@app.api_route(DIAGRAM_ASSETS_URL + "/{name}", methods=["GET", "HEAD"], include_in_schema=False)
+def serve_diagram_asset(name: str, request: Request):
+    return diagram_asset_files.response(name, request)
 
 # Payments routes
 app.include_router(paystack_router)
@@ -78,6 +148,22 @@ def startup():
     logger.info("Starting ExamPartner API")
     init_db()  # <-- Postgres if DATABASE_URL set, else SQLite
     logger.info("Database initialized OK")
+    logger.info(
+        "Diagram manifest: %s files, %s variants",
+        diagram_files.refresh(), diagram_asset_files.refresh(),
+    )
+    start_replica_sync()  # <-- local SQLite copy of questions (Postgres only)
+    refresh_stats_snapshot()  # <-- first stats snapshot; later reloads run in the background
+    progress_buffer.start()  # <-- write-behind flusher for /progress/events
+
+
+@app.on_event("shutdown")
+def shutdown():
+    # anything not flushed stays in the spool and is replayed on the next start
+    try:
+        progress_buffer.flush()
+    except Exception:
+        logger.exception("Progress flush on shutdown failed")
 
 
 # -----------------------------
@@ -93,12 +179,21 @@ def health():
     }
 
 
+_founding_cache: Tuple[float, Optional[Dict[str, Any]]] = (0.0, None)
+
+
 @app.get("/founding/status")
 def founding_status():
     """
     Returns whether Founding (₦1,000) is still open for NEW users.
     Existing founders can still renew; frontend can decide that.
+    Cached per worker for FOUNDING_STATUS_TTL_SECONDS.
     """
+    global _founding_cache
+    checked_at, cached = _founding_cache
+    if cached is not None and time.monotonic() - checked_at < FOUNDING_STATUS_TTL_SECONDS:
+        return cached
+
     FOUNDING_CAP = int(os.getenv("FOUNDING_CAP", "100"))
     using_pg = bool(os.getenv("DATABASE_URL"))
 
@@ -117,7 +212,9 @@ def founding_status():
         except Exception:
             count = int(row[0])
 
-        return {"cap": FOUNDING_CAP, "count": count, "open": count < FOUNDING_CAP}
+        out = {"cap": FOUNDING_CAP, "count": count, "open": count < FOUNDING_CAP}
+        _founding_cache = (time.monotonic(), out)
+        return out
     finally:
         db.close()
 
@@ -248,26 +345,58 @@ def login(body: AuthReq):
     return {"token": token, "identifier": identifier, "is_paid": bool(row["is_paid"])}
 
 
-@app.get("/me")
-def me(user: Optional[Dict[str, Any]] = Depends(get_current_user)):
-    if not user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+class AccountUnavailable(Exception):
+    pass
 
-    identifier = user.get("sub")
-    if not identifier:
-        raise HTTPException(status_code=401, detail="Not authenticated")
 
-    db = db_conn()
-    cur = db.cursor()
-    cur.execute(
-        "SELECT is_paid, paid_until, plan, is_founding, email FROM users WHERE identifier = ?",
-        (identifier,),
-    )
-    row = cur.fetchone()
-    if not row:
-        raise HTTPException(status_code=401, detail="User not found")
+# identifier -> (read at, users row or None); per worker
+_accounts: Dict[str, Tuple[float, Any]] = {}
+_ACCOUNTS_MAX = 50_000
 
-    is_paid_active = _is_paid_user({"sub": identifier})
+
+def _account_row(identifier: str):
+    """
+    users row behind entitlement checks and /me (None if the user no longer exists).
+    - Connect and query bounded like question reads; a failure or timeout marks the primary degraded
+    - Primary degraded => the row last read within ACCOUNT_CACHE_SECONDS,
+      else AccountUnavailable (callers fall back instead of failing)
+    """
+    now = time.monotonic()
+    if not primary_degraded():
+        try:
+            db = get_primary_db()
+            try:
+                cur = db.cursor()
+                cur.execute(
+                    "SELECT is_paid, paid_until, plan, is_founding, email FROM users WHERE identifier = ?",
+                    (identifier,),
+                )
+                row = cur.fetchone()
+            finally:
+                db.close()
+        except Exception:
+            logger.exception("Account lookup failed; using cached entitlements for %ss", ACCOUNT_CACHE_SECONDS)
+            mark_primary_degraded()
+        else:
+            if len(_accounts) >= _ACCOUNTS_MAX:
+                _accounts.clear()
+            _accounts[identifier] = (now, row)
+            return row
+
+    cached = _accounts.get(identifier)
+    if cached is not None and now - cached[0] < ACCOUNT_CACHE_SECONDS:
+        return cached[1]
+    raise AccountUnavailable()
+
+
+def _me_payload(identifier: str) -> Optional[Dict[str, Any]]:
+    """Profile for /me (None if the user no longer exists)."""
+    try:
+        row = _account_row(identifier)
+    except AccountUnavailable:
+        raise HTTPException(status_code=503, detail="Account details temporarily unavailable")
+    if not row:
+        return None
 
     paid_until = row.get("paid_until")
     return {
@@ -275,7 +404,7 @@ def me(user: Optional[Dict[str, Any]] = Depends(get_current_user)):
         # legacy flag (kept for compatibility)
         "is_paid": bool(row.get("is_paid")),
         # preferred flag for access gating
-        "is_paid_active": bool(is_paid_active),
+        "is_paid_active": _paid_active(row),
         "paid_until": paid_until.isoformat() if paid_until else None,
         "plan": row.get("plan") or "free",
         "is_founding": bool(row.get("is_founding") or False),
@@ -283,6 +412,21 @@ def me(user: Optional[Dict[str, Any]] = Depends(get_current_user)):
     }
 
 
+@app.get("/me")
+def me(user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    identifier = user.get("sub")
+    if not identifier:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    out = _me_payload(identifier)
+    if out is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return out
+
+
 @app.post("/me/email")
 def update_email(
     payload: Dict[str, str],
@@ -318,12 +462,45 @@ def update_email(
 # -----------------------------
 # FILTER OPTIONS (dynamic)
 # -----------------------------
+_filters_cache: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+
+
 @app.get("/filters")
 def filters(
+    request: Request,
     qtype: Optional[str] = Query(default=None),
     exam: Optional[str] = Query(default=None),
     year: Optional[int] = Query(default=None),
+    subject: Optional[str] = Query(default=None, description="Narrows the topics facet only"),
 ):
+    version = _content_version()
+    _cache_compressed(request, "filters", qtype, exam, year, subject, version)
+    return _with_version(FastJSONResponse(_filters_payload(qtype, exam, year, version, subject)))
+
+
+def _filters_payload(
+    qtype: Optional[str],
+    exam: Optional[str],
+    year: Optional[int],
+    version: Any = None,
+    subject: Optional[str] = None,
+) -> Dict[str, Any]:
+    # ✅ cached per worker until the content version moves
+    key = (qtype, exam, year, subject, version if version is not None else _content_version())
+    cached = _filters_cache.get(key)
+    if cached is not None:
+        return cached
+
+    out = _filter_options(qtype, exam, year, subject)
+    if len(_filters_cache) >= 256:
+        _filters_cache.clear()
+    _filters_cache[key] = out
+    return out
+
+
+def _filter_options(
+    qtype: Optional[str], exam: Optional[str], year: Optional[int], subject: Optional[str] = None
+) -> Dict[str, Any]:
     where: List[str] = []
     params: List[Any] = []
 
@@ -341,52 +518,110 @@ def filters(
 
     where_sql = ("WHERE " + " AND ".join(where)) if where else ""
 
-    db = db_conn()
-    cur = db.cursor()
+    def query(db):
+        cur = db.cursor()
 
-    cur.execute(
-        f"""SELECT DISTINCT exam FROM questions
-        {('WHERE qtype = ?' if qtype else '')}
-        AND exam IS NOT NULL AND TRIM(exam) <> ''""" if qtype else
-        """SELECT DISTINCT exam FROM questions
-        WHERE exam IS NOT NULL AND TRIM(exam) <> ''""",
-        (qtype,) if qtype else None,
-    )
-    exams_rows = cur.fetchall()
-    exams = sorted([r["exam"] for r in exams_rows if r.get("exam")])
+        cur.execute(
+            f"""SELECT DISTINCT exam FROM questions
+            {('WHERE qtype = ?' if qtype else '')}
+            AND exam IS NOT NULL AND TRIM(exam) <> ''""" if qtype else
+            """SELECT DISTINCT exam FROM questions
+            WHERE exam IS NOT NULL AND TRIM(exam) <> ''""",
+            (qtype,) if qtype else None,
+        )
+        exams_rows = cur.fetchall()
+        exams = sorted([r["exam"] for r in exams_rows if r.get("exam")])
+
+        where_y: List[str] = []
+        params_y: List[Any] = []
+        if qtype:
+            where_y.append("qtype = ?"); params_y.append(qtype)
+        if exam:
+            where_y.append("exam = ?"); params_y.append(exam)
+        where_y_sql = ("WHERE " + " AND ".join(where_y)) if where_y else ""
+        cur.execute(
+            f"""SELECT DISTINCT year FROM questions
+            {where_y_sql}
+            {'AND' if where_y_sql else 'WHERE'} year IS NOT NULL""",
+            tuple(params_y) if params_y else None,
+        )
+        years_rows = cur.fetchall()
+        years = sorted([int(r["year"]) for r in years_rows if r.get("year") is not None], reverse=True)
 
-    where_y: List[str] = []
-    params_y: List[Any] = []
-    if qtype:
-        where_y.append("qtype = ?"); params_y.append(qtype)
-    if exam:
-        where_y.append("exam = ?"); params_y.append(exam)
-    where_y_sql = ("WHERE " + " AND ".join(where_y)) if where_y else ""
-    cur.execute(
-        f"""SELECT DISTINCT year FROM questions
-        {where_y_sql}
-        {'AND' if where_y_sql else 'WHERE'} year IS NOT NULL""",
-        tuple(params_y) if params_y else None,
-    )
-    years_rows = cur.fetchall()
-    years = sorted([int(r["year"]) for r in years_rows if r.get("year") is not None], reverse=True)
+        cur.execute(
+            f"""SELECT DISTINCT subject FROM questions
+            {where_sql}
+            {'AND' if where_sql else 'WHERE'} subject IS NOT NULL AND TRIM(subject) <> ''""",
+            tuple(params) if params else None,
+        )
+        subs_rows = cur.fetchall()
+        subjects = sorted([r["subject"] for r in subs_rows if r.get("subject")])
 
-    cur.execute(
-        f"""SELECT DISTINCT subject FROM questions
-        {where_sql}
-        {'AND' if where_sql else 'WHERE'} subject IS NOT NULL AND TRIM(subject) <> ''""",
-        tuple(params) if params else None,
-    )
-    subs_rows = cur.fetchall()
-    subjects = sorted([r["subject"] for r in subs_rows if r.get("subject")])
+        # topics (question_topics, tagged at build time) within the same filters (+ subject)
+        where_t, params_t = list(where), list(params)
+        if subject:
+            where_t.append("subject = ?"); params_t.append(subject)
+        cur.execute(
+            f"""SELECT DISTINCT t.topic FROM question_topics t
+            JOIN questions ON questions.id = t.qid
+            {("WHERE " + " AND ".join(where_t)) if where_t else ""}""",
+            tuple(params_t) if params_t else None,
+        )
+        topics = sorted([r["topic"] for r in cur.fetchall() if r.get("topic")])
+        return exams, years, subjects, topics
 
-    db.close()
+    exams, years, subjects, topics = read_questions(query)
 
     return {
         "ok": True,
         "exams": exams,
         "years": years,
         "subjects": subjects,
+        "topics": topics,
+    }
+
+
+# -----------------------------
+# BOOTSTRAP (one round trip at app start)
+# -----------------------------
+@app.get("/bootstrap")
+async def bootstrap(
+    qtype: Optional[str] = Query(default=None),
+    exam: Optional[str] = Query(default=None),
+    year: Optional[int] = Query(default=None),
+    user: Optional[Dict[str, Any]] = Depends(get_current_user),
+):
+    """
+    /health + /me + /filters + /founding/status + /payments/public-key in one response.
+    Lookups run concurrently (threadpool) and reuse the per-worker caches;
+    a part that fails comes back as null instead of failing the whole call.
+    """
+
+    def safe(fn, *args):
+        try:
+            return fn(*args)
+        except HTTPException:
+            return None
+        except Exception:
+            logger.exception("Bootstrap part failed: %s", getattr(fn, "__name__", fn))
+            return None
+
+    identifier = (user or {}).get("sub")
+    health_, me_, filters_, founding_, key_ = await asyncio.gather(
+        run_in_threadpool(safe, health),
+        run_in_threadpool(safe, _me_payload, identifier) if identifier else asyncio.sleep(0),
+        run_in_threadpool(safe, _filters_payload, qtype, exam, year),
+        run_in_threadpool(safe, founding_status),
+        run_in_threadpool(safe, paystack_public_key),
+    )
+
+    return {
+        "ok": True,
+        "health": health_,
+        "me": me_,
+        "filters": filters_,
+        "founding": founding_,
+        "paystack_public_key": (key_ or {}).get("public_key"),
     }
 
 
@@ -397,31 +632,97 @@ def _jloads(x: Optional[str]):
     return json.loads(x) if x else None
 
 
-def _row_to_question(row) -> Dict[str, Any]:
-    return {
-        "id": row["id"],
-        "exam": row.get("exam"),
-        "year": row.get("year"),
-        "subject": row.get("subject"),
-        "paper": row.get("paper"),
-        "section": row.get("section"),
-        "type": row["qtype"],
-        "page": row.get("page"),
-        "marks": row.get("marks"),
-        "question_text": row["question_text"],
-        "options": _jloads(row.get("options_json")),
-        "answer": row.get("answer"),
-        "explanation": row.get("explanation"),
-        "sub_questions": _jloads(row.get("sub_questions_json")),
-        "solution_steps": _jloads(row.get("solution_steps_json")),
-        "diagrams": _jloads(row.get("diagrams_json")) or [],
-    }
+def _row_to_question(row) -> Question:
+    """Question as shown before "reveal" (answers/explanations come from /question/{qid}/solution)."""
+    return Question(
+        id=row["id"],
+        exam=row.get("exam"),
+        year=row.get("year"),
+        subject=row.get("subject"),
+        paper=row.get("paper"),
+        section=row.get("section"),
+        type=row["qtype"],
+        page=row.get("page"),
+        marks=row.get("marks"),
+        question_text=row["question_text"],
+        options=_jloads(row.get("options_json")),
+        sub_questions=_strip_solutions(_jloads(row.get("sub_questions_json"))),
+        diagrams=[_diagram(d) for d in _jloads(row.get("diagrams_json")) or []],
+    )
+
+
+def _diagram(name: Any) -> Any:
+    """Diagram file name -> original URL + size, placeholder and WebP/AVIF srcsets (if the asset build has run)."""
+    if not isinstance(name, str):
+        return name
+    return Diagram(name=name, url=f"/static/diagrams/{quote(name)}", **diagram_details(name))
+
+
+def _row_to_solution(row) -> Solution:
+    """The heavy "reveal" half of a question: answer, explanation, steps, sub-question answers."""
+    return Solution(
+        id=row["id"],
+        answer=row.get("answer"),
+        explanation=row.get("explanation"),
+        solution_steps=_jloads(row.get("solution_steps_json")),
+        sub_questions=_jloads(row.get("sub_questions_json")),
+    )
+
+
+_SOLUTION_KEYS = {"answer", "explanation", "solution_steps", "steps"}
+
+
+def _strip_solutions(nodes):
+    """Sub-question tree without answers/explanations (label/text/children only)."""
+    if not isinstance(nodes, list):
+        return nodes
+    out = []
+    for n in nodes:
+        if isinstance(n, dict):
+            n = {k: v for k, v in n.items() if k not in _SOLUTION_KEYS}
+            if isinstance(n.get("children"), list):
+                n["children"] = _strip_solutions(n["children"])
+        out.append(n)
+    return out
+
+
+def _row_to_summary(row) -> QuestionSummary:
+    """List-card projection: just enough for renderList (stem is precomputed in the DB)."""
+    return QuestionSummary(
+        id=row["id"],
+        exam=row.get("exam"),
+        year=row.get("year"),
+        subject=row.get("subject"),
+        paper=row.get("paper"),
+        section=row.get("section"),
+        type=row["qtype"],
+        page=row.get("page"),
+        marks=row.get("marks"),
+        stem=row.get("stem"),
+    )
+
+
+# Columns behind each view (summary reads a handful of short columns only)
+_VIEW_COLUMNS = {
+    "full": (
+        "id, exam, year, subject, paper, section, qtype, page, marks, question_text, "
+        "options_json, sub_questions_json, diagrams_json"
+    ),
+    "summary": "id, exam, year, subject, paper, section, qtype, page, marks, stem",
+    "solution": "id, answer, explanation, sub_questions_json, solution_steps_json",
+}
+_VIEW_BUILDERS = {
+    "full": _row_to_question,
+    "summary": _row_to_summary,
+    "solution": _row_to_solution,
+}
 
 
 def _is_paid_user(user: Optional[Dict[str, Any]]) -> bool:
     """Paid access check.
     - If paid_until exists and is in the future => active
     - Else fallback to legacy is_paid (for older accounts)
+    - Primary unreachable and nothing cached => free tier (never an error)
     """
     if not user:
         return False
@@ -429,14 +730,17 @@ def _is_paid_user(user: Optional[Dict[str, Any]]) -> bool:
     if not identifier:
         return False
 
-    db = db_conn()
-    cur = db.cursor()
-    cur.execute("SELECT is_paid, paid_until FROM users WHERE identifier = ?", (identifier,))
-    row = cur.fetchone()
-    db.close()
+    try:
+        row = _account_row(identifier)
+    except AccountUnavailable:
+        return False
     if not row:
         return False
 
+    return _paid_active(row)
+
+
+def _paid_active(row) -> bool:
     paid_until = row.get("paid_until")
     if paid_until is not None:
         now = datetime.now(timezone.utc)
@@ -452,6 +756,7 @@ def _build_filters(
     exam: Optional[str],
     year: Optional[int],
     subject: Optional[str],
+    topic: Optional[str] = None,
 ) -> Tuple[str, List[Any]]:
     where = ["qtype = ?"]
     params: List[Any] = [qtype]
@@ -468,16 +773,228 @@ def _build_filters(
         where.append("subject = ?")
         params.append(subject)
 
+    if topic:
+        where.append("id IN (SELECT qid FROM question_topics WHERE topic = ?)")
+        params.append(topic)
+
     return " AND ".join(where), params
 
 
+# -----------------------------
+# CONTENT VERSION (per worker, cached)
+# -----------------------------
+_cv_value: Optional[int] = None
+_cv_checked_at = 0.0
+
+
+def _content_version() -> Optional[int]:
+    """Question-bank content version, re-read at most every CONTENT_VERSION_TTL_SECONDS."""
+    global _cv_value, _cv_checked_at
+    now = time.monotonic()
+    if _cv_value is not None and now - _cv_checked_at < CONTENT_VERSION_TTL_SECONDS:
+        return _cv_value
+    try:
+        _cv_value = read_questions(get_content_version)
+    except Exception:
+        logger.exception("Content version lookup failed")
+    _cv_checked_at = now
+    return _cv_value
+
+
+def _content_key() -> Any:
+    """What question payloads are served from right now: the bank file if published, else the DB version."""
+    bank = get_bank(QUESTION_BANK_PATH)
+    return bank.stamp if bank is not None else _content_version()
+
+
+def _respond(request: Request, obj: Any = None, raw: Optional[bytes] = None) -> Response:
+    """negotiated_response() + the content version, so clients/caches can tell stale copies apart."""
+    return _with_version(negotiated_response(request, obj, raw))
+
+
+def _with_version(response: Response) -> Response:
+    version = _content_version()
+    if version is not None:
+        response.headers[CONTENT_VERSION_HEADER] = str(version)
+    return response
+
+
+def _cache_compressed(request: Request, *key: Any) -> None:
+    """
+    Mark this response as cacheable in compressed form (see compression.py).
+    `key` names the route's inputs (the wire format is added here); the cache
+    also keys on a digest of the body, so an input left out only costs a miss.
+    """
+    request.state.compress_key = (*key, "msgpack" if wants_msgpack(request) else "json")
+
+
+# -----------------------------
+# LIVE STATS (question_stats.py snapshot)
+# -----------------------------
+# List orderings besides the default (sort_key) one; "-" = descending
+ListSort = Literal["default", "attempts", "-attempts", "pct_correct", "-pct_correct", "avg_time", "-avg_time"]
+
+
+def _with_stats(item: Any) -> Any:
+    """Question/QuestionSummary struct + its live stats (if any)."""
+    item.stats = stats_snapshot().get(item.id)
+    return item
+
+
+def _splice_stats(payload: Any, qid: str) -> bytes:
+    """Pre-encoded question JSON (bank) + its live stats: one slice, no re-encode."""
+    stats = stats_snapshot().get(qid)
+    if stats is None:
+        return bytes(payload)
+    return bytes(payload[:-1]) + b',"stats":' + encode_json(stats) + b"}"
+
+
+# -----------------------------
+# QUESTION INDEX (per worker)
+# -----------------------------
+_qindex: Optional[QuestionIndex] = None
+_qindex_source: Any = None
+_qindex_lock = threading.Lock()
+
+
+def _question_index(bank) -> Optional[QuestionIndex]:
+    """
+    Facet index for list queries.
+    - Bank published => built from the bank's facet arrays (positions = bank records)
+    - Else => built from the questions table
+    Topic tags come from question_topics either way; rebuilt when the content version moves.
+    Returns None if it cannot be built (callers fall back to SQL).
+    """
+    global _qindex, _qindex_source
+
+    source: Any = (bank.stamp, _content_version()) if bank is not None else ("db", _content_version())
+    if _qindex is not None and _qindex_source == source:
+        return _qindex
+
+    with _qindex_lock:
+        if _qindex is not None and _qindex_source == source:
+            return _qindex
+        try:
+            if bank is not None:
+                index = QuestionIndex.from_bank(bank)
+            else:
+                def query(db):
+                    cur = db.cursor()
+                    cur.execute("SELECT id, qtype, exam, year, subject, sort_key FROM questions")
+                    return cur.fetchall()
+
+                index = QuestionIndex.from_rows(read_questions(query))
+
+            def topics(db):
+                cur = db.cursor()
+                cur.execute("SELECT qid, topic FROM question_topics")
+                return [(r["qid"], r["topic"]) for r in cur.fetchall()]
+
+            index.add_tags("topic", read_questions(topics))
+        except Exception:
+            logger.exception("Question index build failed")
+            # a stale index beats no index (e.g. DB briefly unreachable)
+            return _qindex if bank is None and _qindex_source and _qindex_source[0] == "db" else None
+
+        _qindex, _qindex_source = index, source
+        return _qindex
+
+
+def _fetch_question_rows(ids: List[str], view: str = "full") -> List[Dict[str, Any]]:
+    """Rows for `ids` in one primary-key lookup, returned in the order of `ids`."""
+    if not ids:
+        return []
+    placeholders = ",".join("?" for _ in ids)
+
+    def query(db):
+        cur = db.cursor()
+        cur.execute(
+            f"SELECT {_VIEW_COLUMNS[view]} FROM questions WHERE id IN ({placeholders})",
+            tuple(ids),
+        )
+        return cur.fetchall()
+
+    by_id = {r["id"]: r for r in read_questions(query)}
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _list_questions(
+    request: Request,
+    qtype: str,
+    exam: Optional[str],
+    year: Optional[int],
+    subject: Optional[str],
+    limit: int,
+    offset: int,
+    view: str = "full",
+    topic: Optional[str] = None,
+    sort: str = "default",
+):
+    to_item = _VIEW_BUILDERS[view]
+    bank = get_bank(QUESTION_BANK_PATH)
+    index = _question_index(bank)
+
+    if index is not None:
+        facets = {"qtype": qtype, "exam": exam, "year": year, "subject": subject, "topic": topic}
+        if sort == "default":
+            recs = index.page(facets, limit, offset)
+        else:
+            # ✅ whole match set ordered by the stats snapshot's NumPy columns (no SQL aggregate)
+            ordered = stats_snapshot().order(index.ids, index.positions(facets), sort)
+            recs = ordered[max(0, offset):max(0, offset) + max(0, limit)].tolist()
+
+        # ✅ Served from the mmapped bank when published (no DB round trip)
+        if bank is not None and view in bank.views:
+            items = b",".join(_splice_stats(bank.payload(r, view), index.ids[r]) for r in recs)
+            body = b'{"items":[' + items + b'],"limit":%d,"offset":%d}' % (limit, offset)
+            return _respond(request, raw=body)
+
+        rows = _fetch_question_rows([index.ids[r] for r in recs], view)
+        return _respond(request, QuestionPage(items=[_with_stats(to_item(r)) for r in rows], limit=limit, offset=offset))
+
+    where_sql, params = _build_filters(qtype, exam, year, subject, topic)
+    stats_join, order_sql = "", "COALESCE(sort_key, 999999999), id"
+    if sort != "default":
+        expr = SQL_SORTS[sort.lstrip("-")]
+        stats_join = "LEFT JOIN question_stats s ON s.qid = questions.id"
+        order_sql = f"({expr}) IS NULL, {expr}{' DESC' if sort.startswith('-') else ''}, {order_sql}"
+
+    def query(db):
+        cur = db.cursor()
+        cur.execute(
+            f"""
+            SELECT {_VIEW_COLUMNS[view]}
+            FROM questions {stats_join}
+            WHERE {where_sql}
+            ORDER BY {order_sql}
+            LIMIT ? OFFSET ?
+            """,
+            (*params, limit, offset),
+        )
+        return cur.fetchall()
+
+    if sort == "default":
+        rows = read_questions(query)
+    else:
+        db = db_conn()  # question_stats is not in the replica
+        try:
+            rows = query(db)
+        finally:
+            db.close()
+    return _respond(request, QuestionPage(items=[_with_stats(to_item(r)) for r in rows], limit=limit, offset=offset))
+
+
 @app.get("/questions/objective")
 def list_objective(
+    request: Request,
     limit: int = 20,
     offset: int = 0,
     exam: Optional[str] = Query(default="NECO"),
     year: Optional[int] = Query(default=2023),
     subject: Optional[str] = Query(default="Mathematics"),
+    view: Literal["full", "summary"] = Query(default="full"),
+    topic: Optional[str] = Query(default=None),
+    sort: ListSort = Query(default="default"),
     user: Optional[Dict[str, Any]] = Depends(get_current_user),
 ):
     is_paid = _is_paid_user(user)
@@ -489,34 +1006,24 @@ def list_objective(
         remaining = FREE_SAMPLE_LIMIT_OBJ - offset
         limit = min(limit, remaining)
 
-    where_sql, params = _build_filters("objective", exam, year, subject)
-
-    db = db_conn()
-    cur = db.cursor()
-    cur.execute(
-        f"""
-        SELECT id, exam, year, subject, paper, section, qtype, page, marks, question_text,
-               options_json, answer, explanation, sub_questions_json,
-               solution_steps_json, diagrams_json
-        FROM questions
-        WHERE {where_sql}
-        ORDER BY COALESCE(sort_key, 999999999), id
-        LIMIT ? OFFSET ?
-        """,
-        (*params, limit, offset),
+    _cache_compressed(
+        request, "objective", exam, year, subject, limit, offset, view,
+        "paid" if is_paid else "free", _content_key(), topic, _content_version() if topic else None,
+        sort, stats_snapshot().stamp,
     )
-    rows = cur.fetchall()
-    db.close()
-
-    return {"items": [_row_to_question(r) for r in rows], "limit": limit, "offset": offset}
+    return _list_questions(request, "objective", exam, year, subject, limit, offset, view, topic, sort)
 
 @app.get("/questions/theory")
 def list_theory(
+    request: Request,
     limit: int = 20,
     offset: int = 0,
     exam: Optional[str] = Query(default="NECO"),
     year: Optional[int] = Query(default=2023),
     subject: Optional[str] = Query(default="Mathematics"),
+    view: Literal["full", "summary"] = Query(default="full"),
+    topic: Optional[str] = Query(default=None),
+    sort: ListSort = Query(default="default"),
     user: Optional[Dict[str, Any]] = Depends(get_current_user),
 ):
     is_paid = _is_paid_user(user)
@@ -528,46 +1035,651 @@ def list_theory(
         remaining = FREE_SAMPLE_LIMIT_THEORY - offset
         limit = min(limit, remaining)
 
-    where_sql, params = _build_filters("theory", exam, year, subject)
+    _cache_compressed(
+        request, "theory", exam, year, subject, limit, offset, view,
+        "paid" if is_paid else "free", _content_key(), topic, _content_version() if topic else None,
+        sort, stats_snapshot().stamp,
+    )
+    return _list_questions(request, "theory", exam, year, subject, limit, offset, view, topic, sort)
 
-    db = db_conn()
-    cur = db.cursor()
-    cur.execute(
-        f"""
-        SELECT id, exam, year, subject, paper, section, qtype, page, marks, question_text,
-               options_json, answer, explanation, sub_questions_json,
-               solution_steps_json, diagrams_json
-        FROM questions
-        WHERE {where_sql}
-        ORDER BY COALESCE(sort_key, 999999999), id
-        LIMIT ? OFFSET ?
-        """,
-        (*params, limit, offset),
+
+@app.get("/question/{qid}")
+def get_question(qid: str, request: Request, user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    stats = stats_snapshot().get(qid)  # everything spliced in, IRT values included
+    _cache_compressed(request, "question", qid, _content_key(), tuple(stats.items()) if stats else None)
+    payload = _question_payloads([qid]).get(qid)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Question not found")
+    return _respond(request, raw=payload)
+
+
+def _question_payloads(qids: List[str]) -> Dict[str, bytes]:
+    """
+    Pre-reveal JSON (live stats included) for whichever of `qids` exist:
+    bank lookups first, then one IN (...) query for the rest. Shared by
+    /question/{qid} and /questions/batch so both serve the same items;
+    answers stay behind /question/{qid}/solution's gate.
+    """
+    found: Dict[str, bytes] = {}
+    bank = get_bank(QUESTION_BANK_PATH)
+    if bank is not None:
+        for qid in qids:
+            payload = bank.get(qid)
+            if payload is not None:
+                found[qid] = _splice_stats(payload, qid)
+
+    missing = [q for q in qids if q not in found]
+    for row in _fetch_question_rows(missing):
+        found[row["id"]] = encode_json(_with_stats(_row_to_question(row)))
+    return found
+
+
+@app.get("/question/{qid}/similar")
+def get_similar(
+    qid: str,
+    request: Request,
+    limit: int = Query(default=5, ge=1),
+):
+    """Nearest questions in the same subject, read from the precomputed question_similar table."""
+    limit = min(limit, SIMILAR_TOP_K)
+    _cache_compressed(request, "similar", qid, limit, _content_version())
+
+    def query(db):
+        cur = db.cursor()
+        cur.execute(
+            """
+            SELECT q.id, q.exam, q.year, q.subject, q.qtype, q.marks, q.stem, s.score
+            FROM question_similar s
+            JOIN questions q ON q.id = s.similar_id
+            WHERE s.qid = ?
+            ORDER BY s.rank
+            LIMIT ?
+            """,
+            (qid, limit),
+        )
+        return cur.fetchall()
+
+    items = [
+        SimilarQuestion(
+            id=r["id"], exam=r.get("exam"), year=r.get("year"), subject=r.get("subject"), type=r["qtype"],
+            marks=r.get("marks"), stem=r.get("stem"), score=float(r["score"]),
+        )
+        for r in read_questions(query)
+    ]
+    return _respond(request, QuestionPage(items=items, limit=limit, offset=0))
+
+
+@app.get("/questions/batch")
+def get_questions_batch(
+    request: Request,
+    ids: str = Query(..., description="Comma-separated question ids"),
+):
+    """
+    Several questions in one round trip (viewer prefetch), in the requested order.
+    Same items as /question/{qid} (see _question_payloads); unknown ids come
+    back as {"id", "error": "not_found"}.
+    """
+    wanted: List[str] = []
+    for qid in ids.split(","):
+        qid = qid.strip()
+        if qid and qid not in wanted:
+            wanted.append(qid)
+    if not wanted:
+        raise HTTPException(status_code=400, detail="Missing ids")
+    if len(wanted) > QUESTION_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {QUESTION_BATCH_MAX} ids per batch")
+
+    found = _question_payloads(wanted)
+    parts = [found[qid] if qid in found else encode_json({"id": qid, "error": "not_found"}) for qid in wanted]
+
+    body = b'{"items":[' + b",".join(parts) + b"]}"
+    return _respond(request, raw=body)
+
+
+@app.get("/questions/search")
+def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    exam: Optional[str] = None,
+    year: Optional[int] = None,
+    subject: Optional[str] = None,
+    qtype: Optional[Literal["objective", "theory"]] = None,
+    limit: int = Query(default=20, ge=1),
+    offset: int = Query(default=0, ge=0),
+):
+    """
+    Ranked full-text search over question text and options (see question_search.py).
+    Explanations are deliberately not searchable: this route is public and they are
+    paid, post-reveal content. Items carry a highlighted snippet; open one via /question/{id}.
+    """
+    if not search_terms(q):
+        raise HTTPException(status_code=400, detail="Search needs at least one word")
+    limit = min(limit, SEARCH_LIMIT_MAX)
+
+    _cache_compressed(request, "search", q, exam, year, subject, qtype, limit, offset, _content_version())
+    rows = read_questions(lambda db: search_questions(db, q, exam, year, subject, qtype, limit, offset))
+    return _respond(request, QuestionPage(items=[SearchHit(**r) for r in rows], limit=limit, offset=offset))
+
+
+@app.get("/questions/changes")
+def question_changes(
+    since: int = Query(..., ge=0),
+    user: Optional[Dict[str, Any]] = Depends(get_current_user),
+):
+    """
+    Questions inserted/updated/deleted after content version `since`, streamed as NDJSON:
+      {"since": s, "version": v}
+      {"op": "insert" | "update", "id", "version", "question"[, "solution"]}
+      {"op": "delete", "id", "version"}
+      {"done": true, "version": v}      <- pass as `since` next time
+    Solutions are only included for paid users.
+    """
+    is_paid = _is_paid_user(user)
+    # upper bound for this stream: later changes are picked up by the next call
+    version = read_questions(get_content_version)
+    columns = _VIEW_COLUMNS["full"] + ", answer, explanation, solution_steps_json, version, created_version"
+
+    def stream():
+        yield encode_json({"since": since, "version": version}) + b"\n"
+        if since >= version:
+            yield encode_json({"done": True, "version": version}) + b"\n"
+            return
+
+        after: Tuple[int, str] = (since, "")
+        while True:
+            def query(db):
+                cur = db.cursor()
+                cur.execute(
+                    f"""
+                    SELECT {columns}
+                    FROM questions
+                    WHERE version > ? AND version <= ?
+                      AND (version > ? OR (version = ? AND id > ?))
+                    ORDER BY version, id
+                    LIMIT ?
+                    """,
+                    (since, version, after[0], after[0], after[1], QUESTION_CHANGES_CHUNK),
+                )
+                return cur.fetchall()
+
+            rows = read_questions(query)
+            for row in rows:
+                change: Dict[str, Any] = {
+                    "op": "insert" if (row.get("created_version") or 0) > since else "update",
+                    "id": row["id"],
+                    "version": row["version"],
+                    "question": _row_to_question(row),
+                }
+                if is_paid:
+                    change["solution"] = _row_to_solution(row)
+                yield encode_json(change) + b"\n"
+            if len(rows) < QUESTION_CHANGES_CHUNK:
+                break
+            after = (rows[-1]["version"], rows[-1]["id"])
+
+        def deleted(db):
+            cur = db.cursor()
+            cur.execute(
+                "SELECT id, version FROM question_tombstones WHERE version > ? AND version <= ? ORDER BY version, id",
+                (since, version),
+            )
+            return cur.fetchall()
+
+        for t in read_questions(deleted):
+            yield encode_json({"op": "delete", "id": t["id"], "version": t["version"]}) + b"\n"
+
+        yield encode_json({"done": True, "version": version}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+# -----------------------------
+# MOCK EXAMS (sampled papers, paid)
+# -----------------------------
+@app.get("/mock-exam")
+def mock_exam(
+    request: Request,
+    subject: str = Query(...),
+    exam: Optional[str] = Query(default=None),
+    years: Optional[str] = Query(default=None, description="Comma-separated years (default: all)"),
+    objective: int = Query(default=40, ge=0),
+    theory: int = Query(default=5, ge=0),
+    seed: Optional[int] = Query(default=None, ge=0, description="Same seed + same bank => same paper"),
+    user: Optional[Dict[str, Any]] = Depends(get_current_user),
+):
+    """
+    A timed paper: `objective` + `theory` questions of one subject, spread
+    evenly across years. Sampled from the facet index's per-year arrays
+    (see mock_exam.py); the seed is returned so the paper can be regenerated.
+    """
+    if not _is_paid_user(user):
+        raise HTTPException(status_code=402, detail="Mock exams are for paid users. Upgrade to continue.")
+    objective = min(objective, MOCK_MAX_OBJECTIVE)
+    theory = min(theory, MOCK_MAX_THEORY)
+    if objective + theory == 0:
+        raise HTTPException(status_code=400, detail="Ask for at least one question")
+    try:
+        wanted_years = {str(int(y)) for y in years.split(",") if y.strip()} if years else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="years must be comma-separated numbers")
+
+    seed = secrets.randbits(32) if seed is None else seed
+    rnd = random.Random(seed)
+
+    bank = get_bank(QUESTION_BANK_PATH)
+    index = _question_index(bank)
+    if index is None:
+        raise HTTPException(status_code=503, detail="Mock exams are temporarily unavailable")
+
+    sections: Dict[str, List[bytes]] = {}
+    for qtype, n in (("objective", objective), ("theory", theory)):
+        strata = index.strata({"qtype": qtype, "subject": subject, "exam": exam}, "year")
+        if wanted_years is not None:
+            strata = {y: p for y, p in strata.items() if y in wanted_years}
+        picked = sample_stratified(strata, n, rnd)
+
+        if bank is not None and "full" in bank.views:
+            sections[qtype] = [bytes(bank.payload(pos)) for pos in picked]
+        else:
+            rows = _fetch_question_rows([index.ids[pos] for pos in picked])
+            sections[qtype] = [encode_json(_row_to_question(r)) for r in rows]
+
+    n_obj, n_theory = len(sections["objective"]), len(sections["theory"])
+    if n_obj + n_theory == 0:
+        raise HTTPException(status_code=404, detail="No questions match this paper")
+
+    head = encode_json({
+        "seed": seed,
+        "subject": subject,
+        "exam": exam,
+        "years": sorted(int(y) for y in wanted_years) if wanted_years else None,
+        "duration_minutes": round(n_obj * MOCK_MINUTES_PER_OBJECTIVE + n_theory * MOCK_MINUTES_PER_THEORY),
+    })
+    body = (
+        head[:-1]
+        + b',"objective":[' + b",".join(sections["objective"])
+        + b'],"theory":[' + b",".join(sections["theory"]) + b"]}"
     )
-    rows = cur.fetchall()
-    db.close()
+    return _respond(request, raw=body)
 
-    return {"items": [_row_to_question(r) for r in rows], "limit": limit, "offset": offset}
 
+# -----------------------------
+# ATTEMPTS (whole-session grading)
+# -----------------------------
+class AttemptAnswer(BaseModel):
+    id: str
+    answer: Optional[str] = None
+    time_ms: Optional[int] = Field(default=None, ge=0)
+
+
+class AttemptReq(BaseModel):
+    session_id: str = Field(..., min_length=1, max_length=64)  # client-generated; resubmits are not stored twice
+    mode: Literal["practice", "mock"] = "practice"
+    exam: Optional[str] = None
+    subject: Optional[str] = None
+    seed: Optional[int] = None  # /mock-exam seed
+    duration_ms: Optional[int] = Field(default=None, ge=0)
+    answers: List[AttemptAnswer]
+
+
+@app.post("/attempts")
+def submit_attempt(body: AttemptReq, user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    """
+    Grade a whole session in one request: one answer-key query, one
+    vectorized comparison (grading.py), one transaction for the writes.
+    Theory answers are stored ungraded. Unpaid users only get verdicts
+    for free-preview questions (the rest come back "locked").
+    """
+    if not user or not user.get("sub"):
+        raise HTTPException(status_code=401, detail="Login required")
+    identifier = user["sub"]
+
+    answers: Dict[str, AttemptAnswer] = {}
+    for a in body.answers:
+        answers.setdefault(a.id, a)  # first answer per question wins
+    if not answers:
+        raise HTTPException(status_code=400, detail="No answers")
+    if len(answers) > ATTEMPT_MAX_ANSWERS:
+        raise HTTPException(status_code=400, detail=f"At most {ATTEMPT_MAX_ANSWERS} answers per attempt")
+
+    qids = list(answers)
+    placeholders = ",".join("?" for _ in qids)
+
+    def query(db):
+        cur = db.cursor()
+        cur.execute(f"SELECT id, qtype, answer FROM questions WHERE id IN ({placeholders})", tuple(qids))
+        return cur.fetchall()
+
+    key_rows = {r["id"]: r for r in read_questions(query)}
+    unknown = [q for q in qids if q not in key_rows]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown question ids: {', '.join(unknown[:5])}")
+
+    is_paid = _is_paid_user(user)
+    gradable = [
+        q for q in qids
+        if key_rows[q].get("qtype") == "objective" and (is_paid or _in_free_preview(q))
+    ]
+    verdicts = dict(zip(gradable, grade_objective(
+        [answers[q].answer for q in gradable], [key_rows[q].get("answer") for q in gradable],
+    ).tolist()))
+
+    results = []
+    for q in qids:
+        v = verdicts.get(q)
+        if v is None:
+            status = "ungraded" if key_rows[q].get("qtype") != "objective" else "locked"
+        else:
+            status = "ungraded" if v == UNGRADED else ("correct" if v == CORRECT else "wrong")
+        results.append({"id": q, "result": status})
+    graded = sum(1 for r in results if r["result"] in ("correct", "wrong"))
+    correct = sum(1 for r in results if r["result"] == "correct")
+
+    attempt_id = hashlib.sha256(f"{identifier}\x00{body.session_id}".encode("utf-8")).hexdigest()[:32]
+    summary = {
+        "ok": True,
+        "attempt_id": attempt_id,
+        "total": len(qids),
+        "graded": graded,
+        "correct": correct,
+        "score_pct": round(100.0 * correct / graded, 1) if graded else None,
+        "results": results,
+    }
 
-@app.get("/question/{qid}")
-def get_question(qid: str, user: Optional[Dict[str, Any]] = Depends(get_current_user)):
     db = db_conn()
-    cur = db.cursor()
-    cur.execute(
-        """
-        SELECT id, exam, year, subject, paper, section, qtype, page, marks, question_text,
-               options_json, answer, explanation, sub_questions_json,
-               solution_steps_json, diagrams_json
-        FROM questions
-        WHERE id = ?
-        """,
-        (qid,),
-    )
-    row = cur.fetchone()
-    db.close()
+    try:
+        cur = db.cursor()
+        # ✅ claim the session id atomically (two concurrent submits cannot both pass a SELECT)
+        cur.execute(
+            """
+            INSERT INTO attempts (id, identifier, session_id, mode, exam, subject, seed, total, graded, correct, duration_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO NOTHING
+            """,
+            (
+                attempt_id, identifier, body.session_id, body.mode, body.exam, body.subject, body.seed,
+                len(qids), graded, correct, body.duration_ms,
+            ),
+        )
+        if cur.rowcount == 0:
+            return {**summary, "duplicate": True}  # resubmitted session: graded again, not stored again
+        # ✅ every answer in one multi-row INSERT
+        cur.execute(
+            "INSERT INTO attempt_answers (attempt_id, qid, answer, correct, time_ms) VALUES "
+            + ",".join("(?, ?, ?, ?, ?)" for _ in qids),
+            tuple(
+                v
+                for q, r in zip(qids, results)
+                for v in (
+                    attempt_id, q, answers[q].answer,
+                    {"correct": 1, "wrong": 0}.get(r["result"]), answers[q].time_ms,
+                )
+            ),
+        )
+        # ✅ live per-question totals move in the same transaction (no COUNT/AVG later)
+        add_deltas(cur, [
+            (q, 1 if r["result"] == "correct" else 0, answers[q].time_ms)
+            for q, r in zip(qids, results)
+            if r["result"] in ("correct", "wrong")
+        ])
+        db.commit()
+    finally:
+        db.close()
 
-    if not row:
+    return summary
+
+
+@app.get("/attempts")
+def list_attempts(
+    limit: int = Query(default=20, ge=1, le=100),
+    user: Optional[Dict[str, Any]] = Depends(get_current_user),
+):
+    """The caller's most recent attempts (summaries only)."""
+    if not user or not user.get("sub"):
+        raise HTTPException(status_code=401, detail="Login required")
+
+    db = db_conn()
+    try:
+        cur = db.cursor()
+        cur.execute(
+            """
+            SELECT id, session_id, mode, exam, subject, seed, total, graded, correct, duration_ms, created_at
+            FROM attempts
+            WHERE identifier = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+            """,
+            (user["sub"], limit),
+        )
+        rows = cur.fetchall()
+    finally:
+        db.close()
+
+    return FastJSONResponse({"ok": True, "items": [dict(r) for r in rows]})
+
+
+# -----------------------------
+# PROGRESS EVENTS (write-behind)
+# -----------------------------
+class ProgressEvent(BaseModel):
+    qid: str = Field(..., min_length=1, max_length=128)
+    kind: Literal[EVENT_KINDS]
+    correct: Optional[bool] = None
+    time_ms: Optional[int] = Field(default=None, ge=0)
+    ts: Optional[int] = None  # client epoch ms
+
+
+class ProgressReq(BaseModel):
+    events: List[ProgressEvent]
+
+
+@app.post("/progress/events", status_code=202)
+def post_progress_events(body: ProgressReq, user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    """
+    Batched progress taps. Accepted into this worker's buffer + spool and
+    written in bulk by the flusher (see progress_events.py); 429 when full.
+    """
+    if not user or not user.get("sub"):
+        raise HTTPException(status_code=401, detail="Login required")
+    if len(body.events) > PROGRESS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {PROGRESS_BATCH_MAX} events per batch")
+    if not body.events:
+        return {"ok": True, "accepted": 0}
+
+    try:
+        accepted = progress_buffer.add(user["sub"], [e.model_dump() for e in body.events])
+    except BufferFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Progress buffer full, retry shortly",
+            headers={"Retry-After": str(max(1, round(PROGRESS_FLUSH_SECONDS)))},
+        )
+    return {"ok": True, "accepted": accepted}
+
+
+@app.get("/admin/progress/buffer")
+def admin_progress_buffer(request: Request):
+    require_admin(request)
+    return {"ok": True, **progress_buffer.snapshot()}
+
+
+def _in_free_preview(qid: str) -> bool:
+    """
+    True if an unpaid user may see this question's solution: it is among the first
+    FREE_SAMPLE_LIMIT_* items of its own (qtype, exam, year, subject) list, i.e. a
+    question the capped list endpoints could have shown them.
+    """
+    index = _question_index(get_bank(QUESTION_BANK_PATH))
+    if index is None:
+        return False
+    pos = index.position(qid)
+    if pos is None:
+        return False
+    cap = FREE_SAMPLE_LIMIT_OBJ if index.value_of("qtype", pos) == "objective" else FREE_SAMPLE_LIMIT_THEORY
+    return index.rank(pos) < cap
+
+
+@app.get("/question/{qid}/solution")
+def get_solution(qid: str, request: Request, user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    if not _is_paid_user(user) and not _in_free_preview(qid):
+        raise HTTPException(status_code=402, detail="Upgrade to see answers and solutions.")
+
+    _cache_compressed(request, "solution", qid, _content_key())
+
+    bank = get_bank(QUESTION_BANK_PATH)
+    if bank is not None and "solution" in bank.views:
+        payload = bank.get(qid, "solution")
+        if payload is not None:
+            return _respond(request, raw=bytes(payload))
+
+    rows = _fetch_question_rows([qid], "solution")
+    if not rows:
         raise HTTPException(status_code=404, detail="Question not found")
 
-    return _row_to_question(row)
+    return _respond(request, _row_to_solution(rows[0]))
+
+
+# -----------------------------
+# QUESTION STATS (roll-up + IRT calibration)
+# -----------------------------
+@app.post("/admin/stats/rollup")
+def admin_rollup_stats(request: Request):
+    require_admin(request)
+    return {"ok": True, **rollup_question_stats()}
+
+
+@app.post("/admin/irt/calibrate")
+def admin_calibrate_irt(request: Request, model: str = "2pl"):
+    require_admin(request)
+    if model not in IRT_MODELS:
+        raise HTTPException(status_code=400, detail=f"model must be one of: {', '.join(IRT_MODELS)}")
+    return {"ok": True, **calibrate_irt(model)}
+
+
+# -----------------------------
+# QUESTION BANK (compiled, mmapped)
+# -----------------------------
+def _all_question_rows() -> List[Dict[str, Any]]:
+    """Every question with all columns (build steps only)."""
+    db = db_conn()
+    try:
+        cur = db.cursor()
+        cur.execute(
+            """
+            SELECT id, exam, year, subject, paper, section, qtype, sort_key, page, marks, question_text,
+                   options_json, answer, explanation, sub_questions_json,
+                   solution_steps_json, diagrams_json, stem
+            FROM questions
+            """
+        )
+        return cur.fetchall()
+    finally:
+        db.close()
+
+
+def publish_question_bank() -> Dict[str, Any]:
+    """Compile the questions table into QUESTION_BANK_PATH (atomic swap)."""
+    if not QUESTION_BANK_PATH:
+        raise HTTPException(status_code=500, detail="QUESTION_BANK_PATH not set on server")
+
+    rows = _all_question_rows()
+    out = compile_bank(QUESTION_BANK_PATH, rows, _VIEW_BUILDERS, encode=encode_json)
+    logger.info("Question bank published: %s questions, %s bytes", out["count"], out["bytes"])
+    return out
+
+
+@app.post("/admin/question-bank/publish")
+def admin_publish_question_bank(request: Request):
+    require_admin(request)
+    return {"ok": True, **publish_question_bank()}
+
+
+# -----------------------------
+# DIAGRAM ASSETS (WebP/AVIF variants)
+# -----------------------------
+@app.post("/admin/diagrams/build")
+def admin_build_diagram_assets(request: Request):
+    """Rebuild diagram variants. Variant URLs are baked into the bank and bundles: republish those after."""
+    require_admin(request)
+    out = build_diagram_assets()
+    diagram_asset_files.refresh()
+    return {"ok": True, **out}
+
+
+# -----------------------------
+# SIMILAR QUESTIONS (precomputed neighbours)
+# -----------------------------
+@app.post("/admin/similar/build")
+def admin_build_similar(request: Request):
+    """Recompute question_similar (run after loading questions)."""
+    require_admin(request)
+    return {"ok": True, **build_similar_table()}
+
+
+# -----------------------------
+# TOPIC TAGS (syllabus dictionary)
+# -----------------------------
+@app.post("/admin/topics/build")
+def admin_build_topics(request: Request):
+    """Re-tag every question from SYLLABUS_PATH (run after loading questions or editing the syllabus)."""
+    require_admin(request)
+    return {"ok": True, **build_question_topics()}
+
+
+# -----------------------------
+# NEAR-DUPLICATES (MinHash/LSH report)
+# -----------------------------
+@app.post("/admin/dedup")
+def admin_dedup(request: Request, link: bool = False):
+    """Near-duplicate clusters; link=true also records canonical ids in question_duplicates."""
+    require_admin(request)
+    return {"ok": True, **dedup_questions(link=link)}
+
+
+# -----------------------------
+# OFFLINE PAPER BUNDLES (paid, cached by the service worker)
+# -----------------------------
+def publish_paper_bundles() -> Dict[str, Any]:
+    """Rebuild the per-paper bundles + manifest (see paper_bundles.py)."""
+    return build_bundles(_all_question_rows(), _row_to_question, _row_to_solution, encode_json)
+
+
+@app.post("/admin/bundles/publish")
+def admin_publish_paper_bundles(request: Request):
+    require_admin(request)
+    return {"ok": True, **publish_paper_bundles()}
+
+
+@app.get("/bundles/manifest")
+def bundles_manifest(user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    if not _is_paid_user(user):
+        raise HTTPException(status_code=402, detail="Offline papers are available on paid plans.")
+    manifest = load_manifest()
+    if manifest is None:
+        return {"ok": True, "built_at": None, "bundles": []}
+    return FastJSONResponse(
+        {"ok": True, **manifest},
+        headers={"Cache-Control": "private, no-cache"},
+    )
+
+
+@app.get("/bundles/{name}")
+def get_bundle(name: str, user: Optional[Dict[str, Any]] = Depends(get_current_user)):
+    if not _is_paid_user(user):
+        raise HTTPException(status_code=402, detail="Offline papers are available on paid plans.")
+    path = bundle_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Bundle not found")
+
+    with open(path, "rb") as f:
+        data = f.read()
+    # stored gzip'd: sent as-is, the browser inflates it; name is content-hashed
+    return Response(
+        content=data,
+        media_type="application/json",
+        headers={
+            "Content-Encoding": "gzip",
+            "Cache-Control": "private, max-age=31536000, immutable",
+            "ETag": f'"{name.rsplit(".", 3)[1]}"',
+        },
+    )
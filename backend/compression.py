@@ -0,0 +1,289 @@
+# compression.py (gzip/brotli response compression with a compressed-body cache)
+#
+# API responses above COMPRESS_MIN_BYTES are compressed with the best
+# encoding the client accepts (br > gzip). Routes whose body is a pure
+# function of a few inputs (filters, question pages, ...) set
+# request.state.compress_key; their compressed bodies are kept in a bounded
+# LRU so each one is compressed once per worker, not once per request.
+#
+# Entries are keyed on the route key plus a digest of the body itself
+# (blake2b: microseconds, against milliseconds for a dense brotli pass), so
+# a route key that misses an input (diagram manifest, ...) costs a miss,
+# never a stale body.
+
+import os
+import gzip
+import zlib
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Any, Dict, Tuple
+
+try:
+    import brotli  # optional: gzip only without it
+except ImportError:  # pragma: no cover - brotli not installed
+    brotli = None
+
+# Bodies smaller than this are sent as-is (compression would not pay for itself)
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+# Total compressed bytes kept per worker; 0 disables the cache
+COMPRESS_CACHE_BYTES = int(os.getenv("COMPRESS_CACHE_BYTES", str(32 * 1024 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Uncached bodies are compressed on the request path, so use a fast level;
+# cached bodies are compressed once, so they can afford a denser one.
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+BROTLI_QUALITY_CACHED = int(os.getenv("BROTLI_QUALITY_CACHED", "9"))
+
+_COMPRESSIBLE = ("application/json", "application/javascript", "application/msgpack", "text/")
+
+
+# -----------------------------
+# Negotiation / encoders
+# -----------------------------
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding for an Accept-Encoding header ("br", "gzip" or None)."""
+    if not accept_encoding:
+        return None
+    q: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            q[name] = weight
+
+    star = q.get("*", 0.0)
+    for enc in ("br", "gzip"):
+        if enc == "br" and brotli is None:
+            continue
+        if q.get(enc, star) > 0:
+            return enc
+    return None
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY_CACHED if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def body_digest(body: bytes) -> bytes:
+    """Identity of an uncompressed body for the compressed-body cache."""
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+class _StreamEncoder:
+    """Incremental encoder for streamed (multi-chunk) responses."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def feed(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._c.process(chunk) + self._c.flush()
+        return self._c.compress(chunk) + self._c.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._c.finish() if self.encoding == "br" else self._c.flush()
+
+
+# -----------------------------
+# Compressed-body cache (bounded LRU, per worker)
+# -----------------------------
+class CompressedCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[Any, ...], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Tuple[Any, ...], data: bytes) -> None:
+        if len(data) > self.max_bytes // 8:
+            return  # one huge body must not flush everything else
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._items), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+
+compressed_cache = CompressedCache(COMPRESS_CACHE_BYTES)
+
+
+# -----------------------------
+# ASGI middleware
+# -----------------------------
+class CompressionMiddleware:
+    def __init__(self, app, cache: Optional[CompressedCache] = compressed_cache):
+        self.app = app
+        self.cache = cache if cache is not None and cache.max_bytes > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        accept = ""
+        for k, v in scope.get("headers") or []:
+            if k == b"accept-encoding":
+                accept = v.decode("latin-1")
+                break
+        encoding = negotiate(accept)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start: Optional[Dict[str, Any]] = None
+        stream: Optional[_StreamEncoder] = None
+        passthrough = False
+
+        async def wrapped_send(message):
+            nonlocal start, stream, passthrough
+
+            if message["type"] == "http.response.start":
+                start = message
+                headers = {k.lower(): v for k, v in message.get("headers", [])}
+                ctype = headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in headers
+                    or message.get("status", 200) in (204, 206, 304)
+                    or not ctype.startswith(_COMPRESSIBLE)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+
+            if stream is not None:
+                out = stream.feed(body) if more else stream.feed(body) + stream.finish()
+                await send({"type": "http.response.body", "body": out, "more_body": more})
+                return
+
+            if more:
+                # streamed response: compress chunk by chunk, never cached
+                stream = _StreamEncoder(encoding)
+                await send(_with_encoding(start, encoding, None))
+                await send({"type": "http.response.body", "body": stream.feed(body), "more_body": True})
+                return
+
+            if len(body) < COMPRESS_MIN_BYTES:
+                await send(start)
+                await send(message)
+                return
+
+            key = (scope.get("state") or {}).get("compress_key")
+            data = None
+            if key is not None and self.cache is not None:
+                cache_key = (key, encoding, body_digest(body))
+                data = self.cache.get(cache_key)
+                if data is None:
+                    data = compress(body, encoding, cached=True)
+                    self.cache.put(cache_key, data)
+            if data is None:
+                data = compress(body, encoding)
+
+            await send(_with_encoding(start, encoding, len(data)))
+            await send({"type": "http.response.body", "body": data, "more_body": False})
+
+        await self.app(scope, receive, wrapped_send)
+
+
+def _with_encoding(start: Dict[str, Any], encoding: str, length: Optional[int]) -> Dict[str, Any]:
+    headers = [
+        (k, v) for k, v in start.get("headers", [])
+        if k.lower() not in (b"content-length", b"vary")
+    ]
+    vary = [v for k, v in start.get("headers", []) if k.lower() == b"vary"]
+    headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    headers.append((b"content-encoding", encoding.encode("latin-1")))
+    if length is not None:
+        headers.append((b"content-length", str(length).encode("latin-1")))
+    return {**start, "headers": headers}
+
+
+if __name__ == "__main__":
+    # Bandwidth / CPU report: python compression.py [items]
+    import sys
+    import json
+    import random
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rnd = random.Random(7)
+    words = "find the value of x given that the gradient of the curve at point solve equation area triangle".split()
+
+    def sentence(k):
+        return " ".join(rnd.choice(words) for _ in range(k)).capitalize() + "."
+
+    page = {
+        "items": [
+            {
+                "id": f"NECO_2023_THEORY_Q{i}",
+                "type": "theory",
+                "exam": "NECO",
+                "year": 2023,
+                "subject": "Mathematics",
+                "question_text": sentence(60),
+                "sub_questions": [{"label": c, "text": sentence(25)} for c in "abc"],
+                "solution_steps": [sentence(20) for _ in range(8)],
+                "diagrams": [],
+            }
+            for i in range(n)
+        ],
+        "limit": n,
+        "offset": 0,
+    }
+    body = json.dumps(page, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def timed(fn, reps=50):
+        t0 = time.perf_counter()
+        for _ in range(reps):
+            out = fn()
+        return out, (time.perf_counter() - t0) / reps
+
+    print(f"theory page ({n} items): {len(body):,} bytes")
+    cases = [("gzip", lambda: compress(body, "gzip"))]
+    if brotli is not None:
+        cases.append((f"br q{BROTLI_QUALITY}", lambda: compress(body, "br")))
+        cases.append((f"br q{BROTLI_QUALITY_CACHED}", lambda: compress(body, "br", cached=True)))
+    for name, fn in cases:
+        out, secs = timed(fn)
+        print(f"  {name:<8} {len(out):>8,} bytes  ({len(out) / len(body):.0%})  {secs * 1e3:6.2f} ms/compress")
+
+    cache = CompressedCache(COMPRESS_CACHE_BYTES)
+    cache.put(("page", "gzip", body_digest(body)), compress(body, "gzip", cached=True))
+    _, secs = timed(lambda: cache.get(("page", "gzip", body_digest(body))), reps=10000)
+    print(f"  cached hit (digest included): {secs * 1e6:.2f} us")
@@ -1,7 +1,7 @@
 
 import os
 import sqlite3
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 
 # ----------------------------
 # Detect Postgres
@@ -27,17 +27,40 @@ def init_db(db_path: Optional[str] = None) -> None:
         _init_db_sqlite(db_path=db_path)
 
 
-def get_db(db_path: Optional[str] = None):
+def get_db(
+    db_path: Optional[str] = None,
+    connect_timeout: Optional[int] = None,
+    statement_timeout_ms: Optional[int] = None,
+):
     """
     Get a DB connection.
     - If DATABASE_URL is set => psycopg2 connection (RealDictCursor)
     - Else => sqlite3 connection (Row)
+    connect_timeout (seconds) and statement_timeout_ms bound how long a
+    cold/degraded Postgres may stall the connect and each query.
     """
     if _using_postgres():
-        return _get_pg()
+        return _get_pg(connect_timeout=connect_timeout, statement_timeout_ms=statement_timeout_ms)
     return _get_sqlite(db_path=db_path)
 
 
+def get_content_version(db) -> int:
+    """
+    Current question-bank content version.
+    Bumped by triggers on every INSERT/UPDATE/DELETE of questions, so caches and
+    replicas can tell "something changed" with a single-row lookup.
+    """
+    cur = db.cursor()
+    cur.execute("SELECT version FROM content_version WHERE id = 1")
+    row = cur.fetchone()
+    if not row:
+        return 0
+    try:
+        return int(row["version"])
+    except Exception:
+        return int(row[0])
+
+
 # ----------------------------
 # SQLite implementation (keeps your current schema)
 # ----------------------------
@@ -130,12 +153,19 @@ def _init_db_sqlite(db_path: Optional[str] = None) -> None:
         )
 
         # lightweight migration for older SQLite DBs
-        cur.execute("PRAGMA table_info(questions);")
+        # (table_xinfo also lists generated columns)
+        cur.execute("PRAGMA table_xinfo(questions);")
         cols = {row[1] for row in cur.fetchall()}
         for col, ddl in [
             ("exam", "ALTER TABLE questions ADD COLUMN exam TEXT;"),
             ("year", "ALTER TABLE questions ADD COLUMN year INTEGER;"),
             ("subject", "ALTER TABLE questions ADD COLUMN subject TEXT;"),
+            # precomputed list-card stem (summary view)
+            ("stem", "ALTER TABLE questions ADD COLUMN stem TEXT GENERATED ALWAYS AS (substr(question_text, 1, 160)) VIRTUAL;"),
+            # per-row change tracking (/questions/changes); stamped by the triggers below
+            ("version", "ALTER TABLE questions ADD COLUMN version INTEGER NOT NULL DEFAULT 0;"),
+            ("created_version", "ALTER TABLE questions ADD COLUMN created_version INTEGER NOT NULL DEFAULT 0;"),
+            ("updated_at", "ALTER TABLE questions ADD COLUMN updated_at TEXT;"),
         ]:
             if col not in cols:
                 cur.execute(ddl)
@@ -143,15 +173,256 @@ def _init_db_sqlite(db_path: Optional[str] = None) -> None:
         cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_exam_year_subject ON questions(exam, year, subject);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_qtype ON questions(qtype);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_sort_key ON questions(sort_key);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_version ON questions(version);")
 
         cur.execute("CREATE INDEX IF NOT EXISTS idx_admin_audit_created_at ON admin_audit_log(created_at);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_admin_audit_action ON admin_audit_log(action);")
 
+        # deleted question ids, with the version that deleted them
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_tombstones (
+              id TEXT PRIMARY KEY,
+              version INTEGER NOT NULL,
+              deleted_at TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_question_tombstones_version ON question_tombstones(version);")
+
+        # precomputed "more like this" neighbours (question_similar.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_similar (
+              qid TEXT NOT NULL,
+              rank INTEGER NOT NULL,
+              similar_id TEXT NOT NULL,
+              score REAL NOT NULL,
+              PRIMARY KEY (qid, rank)
+            );
+            """
+        )
+
+        # near-duplicate links (question_dedup.py): duplicate id -> canonical id
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_duplicates (
+              id TEXT PRIMARY KEY,
+              canonical_id TEXT NOT NULL,
+              score REAL NOT NULL
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_question_duplicates_canonical ON question_duplicates(canonical_id);")
+
+        # syllabus topic tags (question_topics.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_topics (
+              qid TEXT NOT NULL,
+              topic TEXT NOT NULL,
+              PRIMARY KEY (qid, topic)
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_question_topics_topic ON question_topics(topic, qid);")
+
+        # graded sessions (/attempts); one row per submitted session + one per answer
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attempts (
+              id TEXT PRIMARY KEY,
+              identifier TEXT NOT NULL,
+              session_id TEXT NOT NULL,
+              mode TEXT NOT NULL,
+              exam TEXT,
+              subject TEXT,
+              seed BIGINT,
+              total INTEGER NOT NULL,
+              graded INTEGER NOT NULL,
+              correct INTEGER NOT NULL,
+              duration_ms BIGINT,
+              created_at TEXT NOT NULL DEFAULT (datetime('now')),
+              UNIQUE (identifier, session_id)
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_attempts_identifier_created ON attempts(identifier, created_at);")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attempt_answers (
+              attempt_id TEXT NOT NULL,
+              qid TEXT NOT NULL,
+              answer TEXT,
+              correct INTEGER,
+              time_ms INTEGER,
+              PRIMARY KEY (attempt_id, qid)
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_attempt_answers_qid ON attempt_answers(qid);")
+
+        # per-question progress taps (progress_events.py, written behind in bulk)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS progress_events (
+              id TEXT PRIMARY KEY,
+              identifier TEXT NOT NULL,
+              qid TEXT NOT NULL,
+              kind TEXT NOT NULL,
+              correct INTEGER,
+              time_ms INTEGER,
+              client_ts BIGINT,
+              created_at TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_progress_events_identifier ON progress_events(identifier, client_ts);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_progress_events_qid ON progress_events(qid);")
+
+        # running per-question totals (question_stats.py): deltas from /attempts + periodic roll-up
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_stats (
+              qid TEXT PRIMARY KEY,
+              attempts INTEGER NOT NULL DEFAULT 0,
+              correct INTEGER NOT NULL DEFAULT 0,
+              time_ms_sum BIGINT NOT NULL DEFAULT 0,
+              timed INTEGER NOT NULL DEFAULT 0,
+              updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """
+        )
+
+        # offline IRT calibration (question_irt.py), replaced wholesale per run
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_irt (
+              qid TEXT PRIMARY KEY,
+              model TEXT NOT NULL,
+              difficulty REAL NOT NULL,
+              discrimination REAL NOT NULL,
+              responses INTEGER NOT NULL,
+              calibrated_at TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """
+        )
+
+        # content version: bumped on any change to questions; the changed row
+        # (or its tombstone) is stamped with the new version
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS content_version (
+              id INTEGER PRIMARY KEY CHECK (id = 1),
+              version INTEGER NOT NULL DEFAULT 1,
+              updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """
+        )
+        cur.execute("INSERT OR IGNORE INTO content_version (id, version) VALUES (1, 1);")
+        for event in ("insert", "update", "delete"):
+            # replaced by the stamping triggers below
+            cur.execute(f"DROP TRIGGER IF EXISTS trg_questions_content_version_{event};")
+
+        bump = "UPDATE content_version SET version = version + 1, updated_at = datetime('now') WHERE id = 1;"
+        stamp = (
+            "UPDATE questions SET version = (SELECT version FROM content_version WHERE id = 1), "
+            "updated_at = datetime('now') WHERE id = NEW.id;"
+        )
+        tombstone = (
+            "INSERT OR REPLACE INTO question_tombstones (id, version, deleted_at) "
+            "SELECT OLD.id, version, datetime('now') FROM content_version WHERE id = 1"
+        )
+        # UPDATE OF <content columns> only, so the stamp itself does not re-fire it
+        content_cols = (
+            "id, exam, year, subject, paper, section, qtype, sort_key, page, marks, question_text, "
+            "options_json, answer, explanation, sub_questions_json, solution_steps_json, diagrams_json"
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_questions_version_insert
+            AFTER INSERT ON questions
+            BEGIN
+              {bump}
+              UPDATE questions SET created_version = (SELECT version FROM content_version WHERE id = 1) WHERE id = NEW.id;
+              {stamp}
+              DELETE FROM question_tombstones WHERE id = NEW.id;
+            END;
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_questions_version_update
+            AFTER UPDATE OF {content_cols} ON questions
+            BEGIN
+              {bump}
+              {stamp}
+              {tombstone} AND OLD.id <> NEW.id;
+              DELETE FROM question_tombstones WHERE id = NEW.id;
+            END;
+            """
+        )
+        cur.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_questions_version_delete
+            AFTER DELETE ON questions
+            BEGIN
+              {bump}
+              {tombstone};
+            END;
+            """
+        )
+
+        _create_sqlite_fts(cur)
+
         conn.commit()
     finally:
         conn.close()
 
 
+def _create_sqlite_fts(cur) -> None:
+    """
+    Full-text index for /questions/search: an FTS5 table over question_text
+    and options_json only (search is public, so never answers/explanations),
+    keyed by questions.id (stored UNINDEXED: the implicit rowid of questions
+    can be renumbered by VACUUM) and kept in step by triggers. Built from
+    existing rows on first creation; the older rowid-linked layout is
+    replaced. Also used by question_replica.py. No-op if SQLite lacks FTS5.
+    """
+    cur.execute("SELECT sql FROM sqlite_master WHERE name = 'questions_fts'")
+    row = cur.fetchone()
+    if row:
+        if "content=" not in row[0]:
+            return
+        cur.execute("DROP TABLE questions_fts;")
+        for trg in ("insert", "delete", "update"):
+            cur.execute(f"DROP TRIGGER IF EXISTS trg_questions_fts_{trg};")
+    try:
+        cur.execute(
+            """
+            CREATE VIRTUAL TABLE questions_fts USING fts5(
+              id UNINDEXED, question_text, options_json,
+              tokenize='porter unicode61'
+            );
+            """
+        )
+    except sqlite3.OperationalError:
+        return  # built without FTS5: search falls back to LIKE
+
+    cur.execute("INSERT INTO questions_fts (id, question_text, options_json) SELECT id, question_text, options_json FROM questions;")
+    fts_delete = "DELETE FROM questions_fts WHERE id = OLD.id;"
+    fts_insert = (
+        "INSERT INTO questions_fts (id, question_text, options_json) "
+        "VALUES (NEW.id, NEW.question_text, NEW.options_json);"
+    )
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_questions_fts_insert AFTER INSERT ON questions BEGIN {fts_insert} END;")
+    cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_questions_fts_delete AFTER DELETE ON questions BEGIN {fts_delete} END;")
+    cur.execute(
+        "CREATE TRIGGER IF NOT EXISTS trg_questions_fts_update "
+        f"AFTER UPDATE OF id, question_text, options_json ON questions BEGIN {fts_delete} {fts_insert} END;"
+    )
+
+
 def _get_sqlite(db_path: Optional[str] = None) -> sqlite3.Connection:
     db_path = db_path or os.getenv("DB_PATH", "exam_partner.db")
     conn = sqlite3.connect(db_path, check_same_thread=False)
@@ -162,13 +433,21 @@ def _get_sqlite(db_path: Optional[str] = None) -> sqlite3.Connection:
 # ----------------------------
 # Postgres implementation
 # ----------------------------
-def _get_pg():
+def _get_pg(connect_timeout: Optional[int] = None, statement_timeout_ms: Optional[int] = None):
     import psycopg2
+    from psycopg2.extensions import parse_dsn
     from psycopg2.extras import RealDictCursor
 
     url = (os.getenv("DATABASE_URL") or "").strip()
     # Neon uses SSL; your URL already includes sslmode=require
-    conn = psycopg2.connect(url, cursor_factory=RealDictCursor)
+    kwargs: Dict[str, Any] = {"cursor_factory": RealDictCursor}
+    if connect_timeout:
+        kwargs["connect_timeout"] = int(connect_timeout)
+    if statement_timeout_ms:
+        # appended to any options already in the URL (e.g. Neon's endpoint=...)
+        options = parse_dsn(url).get("options", "")
+        kwargs["options"] = f"{options} -c statement_timeout={int(statement_timeout_ms)}".strip()
+    conn = psycopg2.connect(url, **kwargs)
     return _PGConn(conn)
 
 
@@ -262,13 +541,241 @@ def _init_db_postgres() -> None:
             """
         )
 
+        # precomputed list-card stem (summary view)
+        cur.execute(
+            "ALTER TABLE questions ADD COLUMN IF NOT EXISTS stem TEXT "
+            "GENERATED ALWAYS AS (LEFT(question_text, 160)) STORED;"
+        )
+
         cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_exam_year_subject ON questions(exam, year, subject);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_qtype ON questions(qtype);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_sort_key ON questions(sort_key);")
 
+        # per-row change tracking (/questions/changes); stamped by trg_questions_stamp_version
+        cur.execute("ALTER TABLE questions ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0;")
+        cur.execute("ALTER TABLE questions ADD COLUMN IF NOT EXISTS created_version BIGINT NOT NULL DEFAULT 0;")
+        cur.execute("ALTER TABLE questions ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_version ON questions(version);")
+
+        # full-text search (/questions/search): weighted tsvector + GIN over the
+        # pre-reveal text only (search is public: no answers/explanations)
+        cur.execute(
+            """
+            SELECT generation_expression FROM information_schema.columns
+            WHERE table_name = 'questions' AND column_name = 'search_tsv'
+            """
+        )
+        row = cur.fetchone()
+        if row and "explanation" in (row.get("generation_expression") or ""):
+            cur.execute("ALTER TABLE questions DROP COLUMN search_tsv;")  # older layout (drops its index too)
+        cur.execute(
+            """
+            ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_tsv tsvector
+            GENERATED ALWAYS AS (
+              setweight(to_tsvector('english', COALESCE(question_text, '')), 'A') ||
+              setweight(to_tsvector('english', COALESCE(options_json, '')), 'B')
+            ) STORED;
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_questions_search_tsv ON questions USING GIN (search_tsv);")
+
         cur.execute("CREATE INDEX IF NOT EXISTS idx_admin_audit_created_at ON admin_audit_log(created_at);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_admin_audit_action ON admin_audit_log(action);")
 
+        # deleted question ids, with the version that deleted them
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_tombstones (
+              id TEXT PRIMARY KEY,
+              version BIGINT NOT NULL,
+              deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_question_tombstones_version ON question_tombstones(version);")
+
+        # precomputed "more like this" neighbours (question_similar.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_similar (
+              qid TEXT NOT NULL,
+              rank INTEGER NOT NULL,
+              similar_id TEXT NOT NULL,
+              score REAL NOT NULL,
+              PRIMARY KEY (qid, rank)
+            );
+            """
+        )
+
+        # near-duplicate links (question_dedup.py): duplicate id -> canonical id
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_duplicates (
+              id TEXT PRIMARY KEY,
+              canonical_id TEXT NOT NULL,
+              score REAL NOT NULL
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_question_duplicates_canonical ON question_duplicates(canonical_id);")
+
+        # syllabus topic tags (question_topics.py)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_topics (
+              qid TEXT NOT NULL,
+              topic TEXT NOT NULL,
+              PRIMARY KEY (qid, topic)
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_question_topics_topic ON question_topics(topic, qid);")
+
+        # graded sessions (/attempts); one row per submitted session + one per answer
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attempts (
+              id TEXT PRIMARY KEY,
+              identifier TEXT NOT NULL,
+              session_id TEXT NOT NULL,
+              mode TEXT NOT NULL,
+              exam TEXT,
+              subject TEXT,
+              seed BIGINT,
+              total INTEGER NOT NULL,
+              graded INTEGER NOT NULL,
+              correct INTEGER NOT NULL,
+              duration_ms BIGINT,
+              created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+              UNIQUE (identifier, session_id)
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_attempts_identifier_created ON attempts(identifier, created_at);")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attempt_answers (
+              attempt_id TEXT NOT NULL,
+              qid TEXT NOT NULL,
+              answer TEXT,
+              correct INTEGER,
+              time_ms INTEGER,
+              PRIMARY KEY (attempt_id, qid)
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_attempt_answers_qid ON attempt_answers(qid);")
+
+        # per-question progress taps (progress_events.py, written behind in bulk)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS progress_events (
+              id TEXT PRIMARY KEY,
+              identifier TEXT NOT NULL,
+              qid TEXT NOT NULL,
+              kind TEXT NOT NULL,
+              correct INTEGER,
+              time_ms INTEGER,
+              client_ts BIGINT,
+              created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_progress_events_identifier ON progress_events(identifier, client_ts);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_progress_events_qid ON progress_events(qid);")
+
+        # running per-question totals (question_stats.py): deltas from /attempts + periodic roll-up
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_stats (
+              qid TEXT PRIMARY KEY,
+              attempts INTEGER NOT NULL DEFAULT 0,
+              correct INTEGER NOT NULL DEFAULT 0,
+              time_ms_sum BIGINT NOT NULL DEFAULT 0,
+              timed INTEGER NOT NULL DEFAULT 0,
+              updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+
+        # offline IRT calibration (question_irt.py), replaced wholesale per run
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS question_irt (
+              qid TEXT PRIMARY KEY,
+              model TEXT NOT NULL,
+              difficulty DOUBLE PRECISION NOT NULL,
+              discrimination DOUBLE PRECISION NOT NULL,
+              responses INTEGER NOT NULL,
+              calibrated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+
+        # content version: bumped once per statement that changes questions
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS content_version (
+              id INTEGER PRIMARY KEY CHECK (id = 1),
+              version BIGINT NOT NULL DEFAULT 1,
+              updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            );
+            """
+        )
+        cur.execute("INSERT INTO content_version (id, version) VALUES (1, 1) ON CONFLICT (id) DO NOTHING;")
+        cur.execute(
+            """
+            CREATE OR REPLACE FUNCTION bump_content_version() RETURNS trigger AS $$
+            BEGIN
+              UPDATE content_version SET version = version + 1, updated_at = NOW() WHERE id = 1;
+              RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """
+        )
+        cur.execute(
+            """
+            CREATE OR REPLACE TRIGGER trg_questions_content_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON questions
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_content_version();
+            """
+        )
+        # Rows are stamped with the version their statement bumps to (current + 1).
+        # FOR UPDATE holds the content_version row until commit, so concurrent
+        # writers are serialized and versions become visible in order.
+        cur.execute(
+            """
+            CREATE OR REPLACE FUNCTION stamp_question_version() RETURNS trigger AS $$
+            DECLARE
+              v BIGINT;
+            BEGIN
+              SELECT version + 1 INTO v FROM content_version WHERE id = 1 FOR UPDATE;
+              IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND OLD.id <> NEW.id) THEN
+                INSERT INTO question_tombstones (id, version, deleted_at) VALUES (OLD.id, v, NOW())
+                ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, deleted_at = EXCLUDED.deleted_at;
+              END IF;
+              IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+              END IF;
+              IF TG_OP = 'INSERT' THEN
+                NEW.created_version := v;
+              END IF;
+              NEW.version := v;
+              NEW.updated_at := NOW();
+              DELETE FROM question_tombstones WHERE id = NEW.id;
+              RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+            """
+        )
+        cur.execute(
+            """
+            CREATE OR REPLACE TRIGGER trg_questions_stamp_version
+            BEFORE INSERT OR UPDATE OR DELETE ON questions
+            FOR EACH ROW EXECUTE FUNCTION stamp_question_version();
+            """
+        )
+
         db.commit()
     finally:
         db.close()
@@ -281,8 +788,9 @@ class _PGConn:
     def __init__(self, conn):
         self._conn = conn
 
-    def cursor(self):
-        return _PGCursor(self._conn.cursor())
+    def cursor(self, name: Optional[str] = None):
+        # a named cursor is server-side: fetchmany() pulls rows in batches instead of all at once
+        return _PGCursor(self._conn.cursor(name) if name else self._conn.cursor())
 
     def commit(self):
         return self._conn.commit()
@@ -308,3 +816,13 @@ class _PGCursor:
 
     def fetchall(self):
         return self._cur.fetchall()
+
+    def fetchmany(self, size: int):
+        return self._cur.fetchmany(size)
+
+    def close(self):
+        return self._cur.close()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cur.rowcount
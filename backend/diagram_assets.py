@@ -0,0 +1,240 @@
+# diagram_assets.py (responsive WebP/AVIF variants of question diagrams)
+#
+# backend/diagrams holds the raw scans/exports (PNG, some over 500 KB).
+# The build step re-encodes each one as AVIF and WebP at a couple of width
+# breakpoints, in parallel across a process pool. Output files are named by
+# a hash of their bytes, so they can be cached forever:
+#
+#   DIAGRAM_ASSETS_DIR/
+#     manifest.json                        {source name: entry}
+#     NECO_2023_MATHEMATICS_OBJ_Q13_D1.480w.<hash>.avif
+#     NECO_2023_MATHEMATICS_OBJ_Q13_D1.480w.<hash>.webp
+#     ...
+#
+# Each entry also records the source's width/height and a tiny blurred
+# placeholder (data: URI), so clients can lay out and paint a preview
+# before the image arrives.
+#
+# Unchanged sources (same sha256) are skipped on rebuild.
+# Built by `python diagram_assets.py` or POST /admin/diagrams/build.
+# Pillow is only needed for the build, not to serve.
+
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Any, Dict, List
+
+logger = logging.getLogger("exampartner")
+
+DIAGRAMS_DIR = Path(os.getenv("DIAGRAMS_DIR", str(Path(__file__).resolve().parent / "diagrams")))
+DIAGRAM_ASSETS_DIR = Path(os.getenv("DIAGRAM_ASSETS_DIR", str(Path(__file__).resolve().parent / "diagram_assets")))
+# URL the assets dir is served at (see app.py)
+DIAGRAM_ASSETS_URL = "/static/diagram-assets"
+
+# Width breakpoints (px); sources narrower than a breakpoint are not upscaled
+DIAGRAM_WIDTHS = [int(w) for w in os.getenv("DIAGRAM_WIDTHS", "480,960").split(",") if w.strip()]
+DIAGRAM_BUILD_WORKERS = int(os.getenv("DIAGRAM_BUILD_WORKERS", "0")) or None  # None = cpu count
+# Placeholder width (px); blurred and inlined as a WebP data: URI (a few hundred bytes)
+PLACEHOLDER_WIDTH = int(os.getenv("DIAGRAM_PLACEHOLDER_WIDTH", "16"))
+
+# Preferred first: the browser takes the first <source> type it supports
+FORMATS = (
+    ("avif", "image/avif", {"quality": 55}),
+    ("webp", "image/webp", {"quality": 80, "method": 6}),
+)
+
+SOURCE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# -----------------------------
+# Build (runs in pool workers)
+# -----------------------------
+def _placeholder(im) -> str:
+    import io
+    import base64
+    from PIL import Image, ImageFilter
+
+    w = min(PLACEHOLDER_WIDTH, im.width)
+    h = max(1, round(im.height * w / im.width))
+    tiny = im.convert("RGB").resize((w, h), Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buf = io.BytesIO()
+    tiny.save(buf, format="WEBP", quality=40)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def _build_one(src: str, source_hash: str, out_dir: str, widths: List[int]) -> Dict[str, Any]:
+    import io
+    from PIL import Image, features
+
+    with Image.open(src) as im:
+        im.load()
+        if im.mode not in ("RGB", "RGBA", "L", "LA"):
+            im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+        width, height = im.size
+        placeholder = _placeholder(im)
+
+        stem = Path(src).stem
+        variants: List[Dict[str, Any]] = []
+        for w in sorted({min(w, width) for w in widths} or {width}):
+            h = max(1, round(height * w / width))
+            resized = im if w == width else im.resize((w, h), Image.LANCZOS)
+            for ext, mime, opts in FORMATS:
+                if ext == "avif" and not features.check("avif"):
+                    continue  # Pillow built without AVIF: WebP only
+                buf = io.BytesIO()
+                resized.save(buf, format=ext.upper(), **opts)
+                data = buf.getvalue()
+                name = f"{stem}.{w}w.{hashlib.sha256(data).hexdigest()[:12]}.{ext}"
+                path = os.path.join(out_dir, name)
+                if not os.path.exists(path):
+                    with open(f"{path}.tmp", "wb") as f:
+                        f.write(data)
+                    os.replace(f"{path}.tmp", path)
+                variants.append({"file": name, "type": mime, "width": w, "height": h, "bytes": len(data)})
+
+    return {
+        "source_hash": source_hash,
+        "source_bytes": os.path.getsize(src),
+        "width": width,
+        "height": height,
+        "placeholder": placeholder,
+        "variants": variants,
+    }
+
+
+def build_diagram_assets(
+    src_dir: Optional[Path] = None,
+    out_dir: Optional[Path] = None,
+    workers: Optional[int] = DIAGRAM_BUILD_WORKERS,
+) -> Dict[str, Any]:
+    """(Re)build variants for every diagram in `src_dir`; returns a summary."""
+    src_dir = Path(src_dir or DIAGRAMS_DIR)
+    out_dir = Path(out_dir or DIAGRAM_ASSETS_DIR)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    previous = _read_manifest(out_dir) or {}
+    sources = sorted(p for p in src_dir.iterdir() if p.is_file() and p.suffix.lower() in SOURCE_EXTS)
+
+    manifest: Dict[str, Any] = {}
+    todo = []
+    for p in sources:
+        digest = _sha256(p)
+        old = previous.get(p.name)
+        if (
+            old and old.get("source_hash") == digest and "placeholder" in old
+            and all((out_dir / v["file"]).exists() for v in old["variants"])
+        ):
+            manifest[p.name] = old
+        else:
+            todo.append((p, digest))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                p.name: pool.submit(_build_one, str(p), digest, str(out_dir), DIAGRAM_WIDTHS)
+                for p, digest in todo
+            }
+            for name, fut in futures.items():
+                try:
+                    manifest[name] = fut.result()
+                except Exception:
+                    logger.exception("Diagram build failed: %s", name)
+
+    tmp = out_dir / f"manifest.json.tmp.{os.getpid()}"
+    tmp.write_text(json.dumps(manifest, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, out_dir / "manifest.json")
+
+    keep = {v["file"] for e in manifest.values() for v in e["variants"]} | {"manifest.json"}
+    for p in out_dir.iterdir():
+        if p.is_file() and p.name not in keep and not p.name.startswith("manifest.json.tmp"):
+            p.unlink()
+
+    # what a phone downloads: smallest variant at the largest breakpoint vs the original
+    best = sum(
+        min((v["bytes"] for v in e["variants"] if v["width"] == max(x["width"] for x in e["variants"])), default=e["source_bytes"])
+        for e in manifest.values() if e["variants"]
+    )
+    logger.info("Diagram assets built: %s diagrams (%s rebuilt)", len(manifest), len(todo))
+    return {
+        "dir": str(out_dir),
+        "diagrams": len(manifest),
+        "rebuilt": len(todo),
+        "source_bytes": sum(e["source_bytes"] for e in manifest.values()),
+        "best_variant_bytes": best,
+    }
+
+
+# -----------------------------
+# Reader (per worker, re-read when manifest.json changes)
+# -----------------------------
+_manifest: Optional[Dict[str, Any]] = None
+_manifest_stamp: Any = None
+
+
+def _read_manifest(out_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((out_dir / "manifest.json").read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def load_manifest() -> Dict[str, Any]:
+    global _manifest, _manifest_stamp
+    path = DIAGRAM_ASSETS_DIR / "manifest.json"
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if _manifest is None or _manifest_stamp != stamp:
+        _manifest = _read_manifest(DIAGRAM_ASSETS_DIR) or {}
+        _manifest_stamp = stamp
+    return _manifest
+
+
+def diagram_details(name: str) -> Dict[str, Any]:
+    """
+    What the question payload says about a diagram:
+      width, height, placeholder  (None if the diagram has not been built)
+      sources: <picture> sources, best format first
+        [{"type": "image/avif", "srcset": "/static/diagram-assets/x.480w.<hash>.avif 480w, ..."}, ...]
+        (empty if not built; clients fall back to the original)
+    """
+    entry = load_manifest().get(name)
+    if not entry:
+        return {"width": None, "height": None, "placeholder": None, "sources": []}
+    return {
+        "width": entry["width"],
+        "height": entry["height"],
+        "placeholder": entry.get("placeholder"),
+        "sources": _sources(entry),
+    }
+
+
+def _sources(entry: Dict[str, Any]) -> List[Dict[str, str]]:
+    out = []
+    for _, mime, _ in FORMATS:
+        vs = [v for v in entry["variants"] if v["type"] == mime]
+        if vs:
+            out.append({
+                "type": mime,
+                "srcset": ", ".join(f"{DIAGRAM_ASSETS_URL}/{v['file']} {v['width']}w" for v in vs),
+            })
+    return out
+
+
+if __name__ == "__main__":
+    # Build step: python diagram_assets.py
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(build_diagram_assets(), indent=2))
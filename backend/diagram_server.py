@@ -0,0 +1,188 @@
+# diagram_server.py (cache-friendly serving for diagram files)
+#
+# Replaces the StaticFiles mounts for /static/diagrams and
+# /static/diagram-assets. Each directory is scanned once at startup into a
+# manifest (size, mtime, sha256); requests are answered from that manifest
+# without a stat, with:
+#   - ETag = content hash, so revalidation is a 304 with no body
+#   - Cache-Control: immutable for content-hashed names (diagram assets)
+#   - single byte-range requests (206 / 416)
+#   - small files kept in memory (bounded LRU), so hot diagrams cost no disk I/O
+#
+# A name missing from the manifest triggers a (throttled) rescan, which is
+# how files added after startup get picked up; refresh() forces one.
+
+import os
+import time
+import hashlib
+import mimetypes
+import threading
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+# Files up to this size are kept in memory once read...
+DIAGRAM_CACHE_FILE_MAX = int(os.getenv("DIAGRAM_CACHE_FILE_MAX", str(256 * 1024)))
+# ...up to this many bytes per directory (per worker)
+DIAGRAM_CACHE_BYTES = int(os.getenv("DIAGRAM_CACHE_BYTES", str(32 * 1024 * 1024)))
+# Min seconds between rescans triggered by unknown names
+DIAGRAM_RESCAN_SECONDS = float(os.getenv("DIAGRAM_RESCAN_SECONDS", "10"))
+# Originals keep their name when replaced, so they are only cached briefly
+DIAGRAM_MAX_AGE = int(os.getenv("DIAGRAM_MAX_AGE", "3600"))
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg"}
+
+
+class DiagramFile:
+    __slots__ = ("path", "size", "mtime", "etag", "media_type")
+
+    def __init__(self, path: Path, size: int, mtime: float, digest: str):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = f'"{digest[:32]}"'
+        self.media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+class DiagramStore:
+    def __init__(self, root: Path, immutable: bool):
+        self.root = Path(root)
+        self.immutable = immutable
+        self.files: Dict[str, DiagramFile] = {}
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_size = 0
+
+    # -----------------------------
+    # Manifest
+    # -----------------------------
+    def refresh(self) -> int:
+        """Rescan the directory; unchanged files (same size + mtime) keep their hash."""
+        files: Dict[str, DiagramFile] = {}
+        if self.root.is_dir():
+            for p in self.root.iterdir():
+                if not p.is_file() or p.suffix.lower() not in IMAGE_EXTS:
+                    continue
+                st = p.stat()
+                old = self.files.get(p.name)
+                if old is not None and old.size == st.st_size and old.mtime == st.st_mtime:
+                    files[p.name] = old
+                    continue
+                h = hashlib.sha256()
+                with open(p, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+                files[p.name] = DiagramFile(p, st.st_size, st.st_mtime, h.hexdigest())
+
+        with self._lock:
+            for name in [n for n in self._cache if files.get(n) is not self.files.get(n)]:
+                self._cache_size -= len(self._cache.pop(name))
+            self.files = files
+            self._scanned_at = time.monotonic()
+        return len(files)
+
+    def lookup(self, name: str) -> Optional[DiagramFile]:
+        f = self.files.get(name)
+        if f is None and time.monotonic() - self._scanned_at >= DIAGRAM_RESCAN_SECONDS:
+            self.refresh()
+            f = self.files.get(name)
+        return f
+
+    # -----------------------------
+    # Bytes
+    # -----------------------------
+    def _read(self, name: str, f: DiagramFile, start: int, end: int) -> bytes:
+        """Bytes [start, end] of a file; small files come from (and go into) memory."""
+        if f.size > DIAGRAM_CACHE_FILE_MAX:
+            with open(f.path, "rb") as fh:
+                fh.seek(start)
+                return fh.read(end - start + 1)
+
+        with self._lock:
+            data = self._cache.get(name)
+            if data is not None:
+                self._cache.move_to_end(name)
+        if data is None:
+            data = f.path.read_bytes()
+            with self._lock:
+                if name not in self._cache:
+                    self._cache[name] = data
+                    self._cache_size += len(data)
+                    while self._cache_size > DIAGRAM_CACHE_BYTES:
+                        _, evicted = self._cache.popitem(last=False)
+                        self._cache_size -= len(evicted)
+        return data[start:end + 1]
+
+    # -----------------------------
+    # HTTP
+    # -----------------------------
+    def response(self, name: str, request: Request) -> Response:
+        f = self.lookup(name)
+        if f is None:
+            raise HTTPException(status_code=404, detail="Not Found")
+
+        headers = {
+            "ETag": f.etag,
+            "Last-Modified": formatdate(f.mtime, usegmt=True),
+            "Accept-Ranges": "bytes",
+            "Cache-Control": (
+                "public, max-age=31536000, immutable" if self.immutable else f"public, max-age={DIAGRAM_MAX_AGE}"
+            ),
+        }
+
+        inm = request.headers.get("if-none-match")
+        if inm and (inm.strip() == "*" or f.etag in [t.strip().removeprefix("W/") for t in inm.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        span = _parse_range(request.headers.get("range"), f.size)
+        if span == "invalid":
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{f.size}"})
+        if span is not None and not _if_range_ok(request.headers.get("if-range"), f):
+            span = None
+
+        if request.method == "HEAD":
+            return Response(status_code=200, media_type=f.media_type, headers={**headers, "Content-Length": str(f.size)})
+
+        if span is None:
+            return Response(content=self._read(name, f, 0, f.size - 1), media_type=f.media_type, headers=headers)
+
+        start, end = span
+        return Response(
+            content=self._read(name, f, start, end),
+            status_code=206,
+            media_type=f.media_type,
+            headers={**headers, "Content-Range": f"bytes {start}-{end}/{f.size}"},
+        )
+
+
+def _parse_range(value: Optional[str], size: int):
+    """
+    (start, end) for a single "bytes=" range, None to send the whole file
+    (no header, multi-range, other units), "invalid" if unsatisfiable.
+    """
+    if not value or not value.startswith("bytes=") or "," in value:
+        return None
+    first, _, last = value[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            n = int(last)  # suffix: last n bytes
+            if n <= 0:
+                return "invalid"
+            return (max(0, size - n), size - 1)
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return (start, min(end, size - 1))
+
+
+def _if_range_ok(value: Optional[str], f: DiagramFile) -> bool:
+    # If-Range: only honour the range if the client's copy is still current
+    return not value or value.strip() == f.etag or value.strip() == formatdate(f.mtime, usegmt=True)
@@ -0,0 +1,39 @@
+# grading.py (objective answer checking for /attempts)
+#
+# A session's answers are graded in one go: given answers and the answer
+# key are normalized to comparable labels, then compared as two NumPy
+# arrays (one vectorized == for the whole paper).
+#
+# Stored answers come in a few shapes ("B", "b", "(B)", "B. 12 cm");
+# when they start with an option label, the label is what counts.
+
+import re
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+CORRECT, WRONG, UNGRADED = 1, 0, -1
+
+_LABEL_RE = re.compile(r"^\s*\(?([A-Ha-h])\)?(?:[.):]|\s|$)")
+
+
+def normalize(answer: Optional[Any]) -> str:
+    if answer is None:
+        return ""
+    s = str(answer).strip()
+    m = _LABEL_RE.match(s)
+    if m:
+        return m.group(1).upper()
+    return " ".join(s.split()).upper()
+
+
+def grade_objective(given: Sequence[Optional[Any]], key: Sequence[Optional[Any]]) -> np.ndarray:
+    """
+    Per question: CORRECT, WRONG (including blank), or UNGRADED (no answer
+    key stored). Returns an int8 array aligned with `given`.
+    """
+    g = np.array([normalize(a) for a in given], dtype=str)
+    k = np.array([normalize(a) for a in key], dtype=str)
+    out = np.where(g == k, CORRECT, WRONG).astype(np.int8)
+    out[k == ""] = UNGRADED
+    return out
@@ -0,0 +1,50 @@
+# mock_exam.py (stratified sampling for /mock-exam)
+#
+# A mock paper draws N objective + M theory questions for one subject,
+# spread across years. Nothing here touches the database: the candidates
+# are the facet index's per-year position arrays (QuestionIndex.strata),
+# and a draw is a few random.sample() calls over them, so a paper costs
+# O(N + M) no matter how big the bank is (no ORDER BY RANDOM() scans).
+#
+# The RNG is seeded per paper; the same seed (and bank) gives the same
+# paper, so a paper can be shared or resumed by its seed.
+
+import random
+from typing import Any, Dict, List, Sequence
+
+
+def _stratum_order(k: Any):
+    # the draw must depend only on the seed, never on dict order
+    return (k is None, str(k))
+
+
+def allocate(sizes: Dict[Any, int], n: int, rnd: random.Random) -> Dict[Any, int]:
+    """
+    Split `n` picks across strata as evenly as their sizes allow
+    (a small stratum gives its unused share to the others).
+    """
+    alloc = {k: 0 for k in sizes}
+    keys = sorted((k for k, size in sizes.items() if size > 0), key=_stratum_order)
+    remaining = min(n, sum(sizes.values()))
+    while remaining and keys:
+        share = max(1, remaining // len(keys))
+        rnd.shuffle(keys)  # who gets the remainder
+        for k in keys:
+            take = min(share, sizes[k] - alloc[k], remaining)
+            alloc[k] += take
+            remaining -= take
+            if not remaining:
+                break
+        keys = [k for k in keys if alloc[k] < sizes[k]]
+    return alloc
+
+
+def sample_stratified(strata: Dict[Any, Sequence[int]], n: int, rnd: random.Random) -> List[int]:
+    """`n` distinct items spread across strata, in random order."""
+    alloc = allocate({k: len(v) for k, v in strata.items()}, n, rnd)
+    picked: List[int] = []
+    for k in sorted(alloc, key=_stratum_order):
+        if alloc[k]:
+            picked.extend(rnd.sample(strata[k], alloc[k]))
+    rnd.shuffle(picked)
+    return picked
@@ -0,0 +1,162 @@
+# paper_bundles.py (offline paper bundles for the service worker)
+#
+# One bundle per paper (exam, year, subject, qtype): every question in list
+# order, its solution, and the diagram files it references. Bundles are
+# gzip'd JSON named by a hash of their bytes, so a client re-downloads a
+# paper only when its content actually changed.
+#
+#   BUNDLES_DIR/
+#     manifest.json                          {"built_at", "bundles": [...]}
+#     NECO_2023_Mathematics_objective.<hash>.json.gz
+#
+# Built by `python paper_bundles.py` or POST /admin/bundles/publish.
+
+import os
+import re
+import gzip
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Any, Dict, List, Tuple, Callable, Iterable
+
+logger = logging.getLogger("exampartner")
+
+BUNDLES_DIR = os.getenv("BUNDLES_DIR", str(Path(__file__).resolve().parent / "bundles"))
+
+BUNDLE_FILE_RE = re.compile(r"^[A-Za-z0-9_.-]+\.[0-9a-f]{16}\.json\.gz$")
+
+_KEY_FIELDS = ("exam", "year", "subject", "qtype")
+
+
+def _slug(v: Any) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", str(v)).strip("-") or "x"
+
+
+def _sort_key(row: Dict[str, Any]):
+    # same ordering as the list endpoints
+    sk = row.get("sort_key")
+    return (999999999 if sk is None else int(sk), str(row["id"]))
+
+
+def build_bundles(
+    rows: Iterable[Dict[str, Any]],
+    to_question: Callable[[Dict[str, Any]], Any],
+    to_solution: Callable[[Dict[str, Any]], Any],
+    encode: Callable[[Any], bytes],
+    out_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Write one bundle per paper plus manifest.json into `out_dir`.
+    Unchanged papers keep their file name; files no longer in the manifest are removed.
+    """
+    out_dir = out_dir or BUNDLES_DIR
+    os.makedirs(out_dir, exist_ok=True)
+
+    papers: Dict[Tuple[Any, ...], List[Dict[str, Any]]] = {}
+    for row in sorted(rows, key=_sort_key):
+        key = tuple(row.get(f) for f in _KEY_FIELDS)
+        if any(v is None or v == "" for v in key):
+            continue  # not reachable through the paper filters
+        papers.setdefault(key, []).append(row)
+
+    entries: List[Dict[str, Any]] = []
+    for key, paper_rows in sorted(papers.items(), key=lambda kv: tuple(str(v) for v in kv[0])):
+        diagrams: List[str] = []
+        questions = []
+        for row in paper_rows:
+            q = to_question(row)
+            questions.append(q)
+            for d in getattr(q, "diagrams", None) or []:
+                name = d if isinstance(d, str) else getattr(d, "name", None)
+                if isinstance(name, str) and name not in diagrams:
+                    diagrams.append(name)
+
+        meta = dict(zip(_KEY_FIELDS, key))
+        body = encode({
+            **meta,
+            "questions": questions,
+            "solutions": [to_solution(r) for r in paper_rows],
+            "diagrams": diagrams,
+        })
+        data = gzip.compress(body, compresslevel=9, mtime=0)
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        name = "_".join(_slug(v) for v in key) + f".{digest}.json.gz"
+
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+
+        entries.append({
+            **meta,
+            "file": name,
+            "hash": digest,
+            "bytes": len(data),
+            "raw_bytes": len(body),
+            "count": len(paper_rows),
+            "diagrams": diagrams,
+        })
+
+    manifest = {"built_at": int(time.time()), "bundles": entries}
+    _write_atomic(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, separators=(",", ":")).encode("utf-8"))
+
+    keep = {e["file"] for e in entries}
+    for name in os.listdir(out_dir):
+        if BUNDLE_FILE_RE.match(name) and name not in keep:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+
+    logger.info("Paper bundles published: %s bundles in %s", len(entries), out_dir)
+    return {"dir": out_dir, "bundles": len(entries), "bytes": sum(e["bytes"] for e in entries), "built_at": manifest["built_at"]}
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# -----------------------------
+# Reader (per worker, re-read when manifest.json changes)
+# -----------------------------
+_manifest: Optional[Dict[str, Any]] = None
+_manifest_stamp: Any = None
+
+
+def load_manifest(out_dir: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    global _manifest, _manifest_stamp
+    path = os.path.join(out_dir or BUNDLES_DIR, "manifest.json")
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (path, st.st_ino, st.st_mtime_ns, st.st_size)
+    if _manifest is None or _manifest_stamp != stamp:
+        with open(path, "rb") as f:
+            _manifest = json.loads(f.read())
+        _manifest_stamp = stamp
+    return _manifest
+
+
+def bundle_path(name: str, out_dir: Optional[str] = None) -> Optional[str]:
+    """Path of a published bundle, or None if `name` is not one (no traversal)."""
+    if not BUNDLE_FILE_RE.match(name):
+        return None
+    manifest = load_manifest(out_dir)
+    if manifest is None or not any(e["file"] == name for e in manifest["bundles"]):
+        return None
+    path = os.path.join(out_dir or BUNDLES_DIR, name)
+    return path if os.path.exists(path) else None
+
+
+if __name__ == "__main__":
+    # Build step: python paper_bundles.py
+    from app import publish_paper_bundles
+
+    print(json.dumps(publish_paper_bundles(), indent=2))
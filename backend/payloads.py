@@ -0,0 +1,213 @@
+# payloads.py (typed response shapes + fast JSON encoding)
+#
+# Question payloads are msgspec Structs and are encoded straight to bytes
+# by msgspec, skipping FastAPI's jsonable_encoder walk and the stdlib
+# encoder. Field order matches the JSON the API has always returned.
+#
+# Routes return FastJSONResponse(...) explicitly; FastAPI cannot serialize
+# a Struct through its default response path.
+#
+# Question routes can also answer in MessagePack (same schema) when the
+# client sends Accept: application/msgpack; see negotiated_response().
+
+from typing import Optional, Any, Dict, List
+
+import msgspec
+from fastapi import Request
+from fastapi.responses import Response
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+
+
+class Diagram(msgspec.Struct):
+    """A diagram reference: the original file plus responsive <picture> sources (see diagram_assets.py)."""
+
+    name: str
+    url: str
+    sources: List[Dict[str, str]]
+    # original size (layout before load) + tiny blurred data: URI preview
+    width: Optional[int] = None
+    height: Optional[int] = None
+    placeholder: Optional[str] = None
+
+
+class Question(msgspec.Struct, omit_defaults=True):
+    """
+    Question as shown before "reveal" (see _row_to_question).
+    `stats` (attempts / pct_correct / avg_time_ms) is live, so it is never
+    baked into the bank; it is left out when there is none.
+    """
+
+    id: str
+    exam: Optional[str]
+    year: Optional[int]
+    subject: Optional[str]
+    paper: Optional[str]
+    section: Optional[str]
+    type: str
+    page: Optional[int]
+    marks: Optional[int]
+    question_text: str
+    options: Any
+    sub_questions: Any
+    diagrams: List[Any]
+    stats: Optional[Dict[str, Any]] = None
+
+
+class QuestionSummary(msgspec.Struct, omit_defaults=True):
+    """List card: the stem plus the short fields of the card's meta line."""
+
+    id: str
+    exam: Optional[str]
+    year: Optional[int]
+    subject: Optional[str]
+    paper: Optional[str]
+    section: Optional[str]
+    type: str
+    page: Optional[int]
+    marks: Optional[int]
+    stem: Optional[str]
+    stats: Optional[Dict[str, Any]] = None
+
+
+class Solution(msgspec.Struct):
+    id: str
+    answer: Optional[str]
+    explanation: Optional[str]
+    solution_steps: Any
+    sub_questions: Any
+
+
+class SearchHit(msgspec.Struct):
+    """A /questions/search result; `snippet` has the matched words wrapped in <mark>."""
+
+    id: str
+    exam: Optional[str]
+    year: Optional[int]
+    subject: Optional[str]
+    type: str
+    marks: Optional[int]
+    snippet: Optional[str]
+    score: float
+
+
+class SimilarQuestion(msgspec.Struct):
+    """A /question/{id}/similar item (list-card fields + cosine similarity)."""
+
+    id: str
+    exam: Optional[str]
+    year: Optional[int]
+    subject: Optional[str]
+    type: str
+    marks: Optional[int]
+    stem: Optional[str]
+    score: float
+
+
+class QuestionPage(msgspec.Struct):
+    items: List[Any]
+    limit: int
+    offset: int
+
+
+_json = msgspec.json.Encoder()
+_msgpack = msgspec.msgpack.Encoder()
+
+
+def encode_json(obj: Any) -> bytes:
+    """Structs, dicts, lists, datetimes -> compact UTF-8 JSON."""
+    return _json.encode(obj)
+
+
+def encode_msgpack(obj: Any) -> bytes:
+    return _msgpack.encode(obj)
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return encode_json(content)
+
+
+class MsgPackResponse(Response):
+    media_type = "application/msgpack"
+
+    def render(self, content: Any) -> bytes:
+        return encode_msgpack(content)
+
+
+def wants_msgpack(request: Request) -> bool:
+    accept = request.headers.get("accept", "").lower()
+    return any(t in accept for t in MSGPACK_TYPES)
+
+
+def negotiated_response(request: Request, obj: Any = None, raw: Optional[bytes] = None) -> Response:
+    """
+    JSON by default, MessagePack for Accept: application/msgpack.
+    Pass either a payload (`obj`) or already-encoded JSON bytes (`raw`, e.g. from the bank).
+    """
+    headers = {"Vary": "Accept"}
+    if wants_msgpack(request):
+        if raw is not None:
+            obj = msgspec.json.decode(raw)
+        return MsgPackResponse(obj, headers=headers)
+    if raw is not None:
+        return Response(content=raw, media_type="application/json", headers=headers)
+    return FastJSONResponse(obj, headers=headers)
+
+
+if __name__ == "__main__":
+    # Encode benchmark: python payloads.py
+    import json
+    import time
+    import random
+
+    from fastapi.encoders import jsonable_encoder
+
+    rnd = random.Random(7)
+    words = "find the value of x given that the gradient of the curve at point solve equation".split()
+
+    def sentence(k):
+        return " ".join(rnd.choice(words) for _ in range(k)).capitalize() + "."
+
+    def question(i):
+        return dict(
+            id=f"NECO_2023_OBJ_Q{i}",
+            exam="NECO",
+            year=2023,
+            subject="Mathematics",
+            paper="Paper 1",
+            section="A",
+            type="objective",
+            page=i // 5 + 1,
+            marks=1,
+            question_text=sentence(30),
+            options=[{"label": c, "text": sentence(4)} for c in "ABCD"],
+            sub_questions=None,
+            diagrams=[f"NECO_2023_Q{i}.png"] if i % 7 == 0 else [],
+        )
+
+    def stdlib(page):
+        # what FastAPI does for a returned dict: jsonable_encoder + JSONResponse.render
+        return json.dumps(
+            jsonable_encoder(page), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+        ).encode("utf-8")
+
+    def pct(samples, p):
+        s = sorted(samples)
+        return s[min(len(s) - 1, int(len(s) * p))] * 1e6
+
+    for n in (20, 100):
+        rows = [question(i) for i in range(n)]
+        as_dict = {"items": rows, "limit": n, "offset": 0}
+        as_struct = QuestionPage(items=[Question(**r) for r in rows], limit=n, offset=0)
+        assert json.loads(stdlib(as_dict)) == json.loads(encode_json(as_struct))
+
+        for name, fn, page in (("stdlib", stdlib, as_dict), ("msgspec", encode_json, as_struct)):
+            samples = []
+            for _ in range(2000):
+                t0 = time.perf_counter()
+                fn(page)
+                samples.append(time.perf_counter() - t0)
+            print(f"{n:>3} items  {name:<8} p50 {pct(samples, 0.50):8.1f} us   p99 {pct(samples, 0.99):8.1f} us")
@@ -16,6 +16,7 @@ from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
 
 from db import get_db, _using_postgres  # uses Postgres if DATABASE_URL is set; else SQLite
+from payloads import FastJSONResponse
 
 load_dotenv()
 # -----------------------------
@@ -519,7 +520,7 @@ def payment_history(request: Request, limit: int = 20):
             }
         )
 
-    return {"ok": True, "limit": limit, "items": items}
+    return FastJSONResponse({"ok": True, "limit": limit, "items": items})
 
 
 
@@ -0,0 +1,274 @@
+# progress_events.py (write-behind buffer for per-question progress events)
+#
+# Progress taps (viewed / revealed / answered) arrive in client batches via
+# POST /progress/events. Inserting each one synchronously would flood the
+# database, so each worker:
+#
+#   1. appends the accepted batch to a local append-only spool segment
+#      (one JSON line per event) and to an in-memory buffer, then acks;
+#   2. a flusher thread closes the segment every PROGRESS_FLUSH_SECONDS
+#      (sooner once PROGRESS_FLUSH_BATCH events are waiting) and writes it
+#      with multi-row INSERTs, then deletes the segment file;
+#   3. a failed write leaves the closed segment on disk; it is retried on
+#      the next cycle.
+#
+# A crash loses nothing that was acked: segments left behind (by this pid
+# or a dead one) are claimed and replayed at startup. Every event gets a
+# server id when accepted and inserts are ON CONFLICT DO NOTHING, so a
+# replay after a half-finished flush does not double count.
+#
+# Backpressure: when the buffer holds PROGRESS_BUFFER_MAX events, or
+# PROGRESS_MAX_PENDING segments are waiting on a slow database, add()
+# raises BufferFull and the endpoint answers 429 with Retry-After.
+
+import os
+import json
+import time
+import uuid
+import itertools
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Any, Callable, Dict, List, Tuple
+
+from db import get_db
+
+logger = logging.getLogger("exampartner")
+
+PROGRESS_SPOOL_DIR = os.getenv("PROGRESS_SPOOL_DIR", str(Path(__file__).resolve().parent / "progress_spool"))
+PROGRESS_FLUSH_SECONDS = float(os.getenv("PROGRESS_FLUSH_SECONDS", "2"))
+PROGRESS_FLUSH_BATCH = int(os.getenv("PROGRESS_FLUSH_BATCH", "2000"))
+PROGRESS_BUFFER_MAX = int(os.getenv("PROGRESS_BUFFER_MAX", "50000"))
+PROGRESS_MAX_PENDING = int(os.getenv("PROGRESS_MAX_PENDING", "20"))
+# Rows per INSERT statement
+PROGRESS_INSERT_CHUNK = 500
+
+EVENT_KINDS = ("viewed", "revealed", "answered")
+_COLUMNS = ("id", "identifier", "qid", "kind", "correct", "time_ms", "client_ts")
+
+
+class BufferFull(Exception):
+    pass
+
+
+def insert_events(rows: List[Dict[str, Any]]) -> None:
+    """Bulk insert (one transaction, PROGRESS_INSERT_CHUNK rows per statement)."""
+    if not rows:
+        return
+    db = get_db()
+    try:
+        cur = db.cursor()
+        for i in range(0, len(rows), PROGRESS_INSERT_CHUNK):
+            chunk = rows[i:i + PROGRESS_INSERT_CHUNK]
+            cur.execute(
+                f"INSERT INTO progress_events ({', '.join(_COLUMNS)}) VALUES "
+                + ",".join(f"({', '.join('?' for _ in _COLUMNS)})" for _ in chunk)
+                + " ON CONFLICT (id) DO NOTHING",
+                tuple(r.get(c) for r in chunk for c in _COLUMNS),
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+class ProgressBuffer:
+    def __init__(
+        self,
+        spool_dir: str = PROGRESS_SPOOL_DIR,
+        writer: Callable[[List[Dict[str, Any]]], None] = insert_events,
+    ):
+        self.spool_dir = spool_dir
+        self.writer = writer
+        self._lock = threading.Lock()         # buffer + current segment
+        self._flush_lock = threading.Lock()   # one flush at a time
+        self._wake = threading.Event()
+        self._events: List[Dict[str, Any]] = []
+        self._segment: Optional[Tuple[str, Any]] = None  # (path, open file)
+        self._seq = itertools.count(1)
+        self._pending = 0
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"accepted": 0, "written": 0, "rejected": 0, "failed_flushes": 0}
+
+    # -----------------------------
+    # Accept
+    # -----------------------------
+    def add(self, identifier: str, events: List[Dict[str, Any]]) -> int:
+        now = int(time.time() * 1000)
+        rows = [
+            {
+                "id": uuid.uuid4().hex,
+                "identifier": identifier,
+                "qid": e["qid"],
+                "kind": e["kind"],
+                "correct": None if e.get("correct") is None else int(bool(e["correct"])),
+                "time_ms": e.get("time_ms"),
+                "client_ts": e.get("ts") or now,
+            }
+            for e in events
+        ]
+        with self._lock:
+            if len(self._events) + len(rows) > PROGRESS_BUFFER_MAX or self._pending >= PROGRESS_MAX_PENDING:
+                self.stats["rejected"] += len(rows)
+                raise BufferFull()
+            if self._segment is None:
+                self._open_segment()
+            f = self._segment[1]
+            f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in rows))
+            f.flush()
+            self._events.extend(rows)
+            self.stats["accepted"] += len(rows)
+            if len(self._events) >= PROGRESS_FLUSH_BATCH:
+                self._wake.set()
+        return len(rows)
+
+    # -----------------------------
+    # Spool segments
+    # -----------------------------
+    def _segment_name(self, suffix: str) -> str:
+        seq = next(self._seq)
+        return os.path.join(self.spool_dir, f"progress.{os.getpid()}.{int(time.time())}.{seq:06d}.{suffix}")
+
+    def _open_segment(self) -> None:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = self._segment_name("open")
+        self._segment = (path, open(path, "a", encoding="utf-8"))
+
+    def _close_segment(self) -> Optional[str]:
+        """Current segment -> .ready (caller holds _lock)."""
+        if self._segment is None:
+            return None
+        path, f = self._segment
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        self._segment = None
+        ready = path[: -len(".open")] + ".ready"
+        os.replace(path, ready)
+        return ready
+
+    def _claimable(self) -> List[str]:
+        """Closed segments of this worker, plus anything left by dead workers."""
+        try:
+            names = sorted(os.listdir(self.spool_dir))
+        except FileNotFoundError:
+            return []
+        mine = str(os.getpid())
+        current = os.path.basename(self._segment[0]) if self._segment else None
+        out = []
+        for name in names:
+            parts = name.split(".")
+            if len(parts) != 5 or parts[0] != "progress" or name == current:
+                continue
+            if parts[1] == mine:
+                out.append(os.path.join(self.spool_dir, name))
+            elif parts[1].isdigit() and not _pid_alive(int(parts[1])):
+                # adopt it (rename is atomic: only one worker wins)
+                dst = self._segment_name("ready")
+                try:
+                    os.rename(os.path.join(self.spool_dir, name), dst)
+                    out.append(dst)
+                except FileNotFoundError:
+                    pass  # another worker adopted it first
+        return out
+
+    @staticmethod
+    def _read_segment(path: str) -> List[Dict[str, Any]]:
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    pass  # torn last line from a crash mid-write
+        return rows
+
+    # -----------------------------
+    # Flush
+    # -----------------------------
+    def flush(self) -> int:
+        """Write every closed segment; returns events written."""
+        with self._flush_lock:
+            with self._lock:
+                fresh = self._events
+                self._events = []
+                fresh_path = self._close_segment()
+
+            paths = self._claimable()
+            written = done = 0
+            for path in paths:
+                rows = fresh if path == fresh_path else self._read_segment(path)
+                try:
+                    self.writer(rows)
+                except Exception:
+                    self.stats["failed_flushes"] += 1
+                    logger.exception("Progress flush failed (%s events kept in %s)", len(rows), path)
+                    break  # retried next cycle
+                os.remove(path)
+                written += len(rows)
+                done += 1
+
+            with self._lock:
+                self._pending = len(paths) - done
+            self.stats["written"] += written
+            return written
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(PROGRESS_FLUSH_SECONDS)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Progress flush loop error")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="progress-flush", daemon=True)
+        self._thread.start()
+        logger.info("Progress event buffer started: %s (flush every %ss)", self.spool_dir, PROGRESS_FLUSH_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "buffered": len(self._events), "pending_segments": self._pending}
+
+
+progress_buffer = ProgressBuffer()
+
+
+if __name__ == "__main__":
+    # Throughput check against a scratch SQLite DB: python progress_events.py [events]
+    import sys
+    import tempfile
+
+    from db import init_db
+
+    os.environ.pop("DATABASE_URL", None)
+    tmp = tempfile.mkdtemp()
+    os.environ["DB_PATH"] = os.path.join(tmp, "progress_bench.db")
+    init_db()
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    buf = ProgressBuffer(spool_dir=os.path.join(tmp, "spool"))
+    batch = [{"qid": f"Q{i % 500}", "kind": "answered", "correct": i % 2, "time_ms": 900} for i in range(50)]
+
+    t0 = time.perf_counter()
+    for i in range(n // len(batch)):
+        buf.add(f"user{i % 1000}", batch)
+        if i % 40 == 39:
+            buf.flush()
+    accept = time.perf_counter() - t0
+    buf.flush()
+    total = time.perf_counter() - t0
+    print(f"{n} events: accept+spool {accept / n * 1e6:.1f} us/event, end-to-end {n / total:,.0f} events/s")
+    print(buf.snapshot())
@@ -0,0 +1,300 @@
+# question_bank.py (compiled, read-only question bank shared across workers)
+#
+# The questions table is compiled into ONE binary file that every uvicorn
+# worker mmaps. The OS page cache then holds a single copy for all
+# processes, and lookups are slices of the mapping (no per-worker caches).
+#
+# File layout (little-endian):
+#   header   : magic | format | count | built_at | directory offset/size
+#   directory: JSON {"sections": {name: [offset, size]}, "views": [...]}
+#   ids      : question ids (utf-8), sorted, concatenated
+#   id_offs  : u32[count + 1]  offsets into `ids`
+#   id_recs  : u32[count]      record number for each sorted id
+#   facets   : JSON {field: {value: [start, length]}} into `fac_ids`
+#   fac_ids  : u32[...]        record numbers per facet value, ascending
+#   <view>.offs : u64[count + 1]  offsets into `<view>.data` (record order)
+#   <view>.data : pre-encoded JSON for that view of each question, in list order
+#
+# Views are the payload shapes the API serves (e.g. "full", "summary"),
+# each encoded once at build time.
+#
+# Records are stored in list order (sort_key, id), so a record number is
+# also its position in the default listing.
+
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import logging
+import threading
+from array import array
+from typing import Optional, Any, Dict, List, Callable, Iterable
+
+logger = logging.getLogger("exampartner")
+
+MAGIC = b"EPQBANK1"
+# bumped when the layout OR a payload shape changes, so stale banks are ignored
+# until republished (3: "full" no longer carries answers; "solution" view added)
+FORMAT_VERSION = 3
+
+# magic, format, count, built_at, directory offset, directory size
+_HEADER = struct.Struct("<8sIIQQQ")
+
+FACET_FIELDS = ("qtype", "exam", "year", "subject")
+
+# How often a worker re-stats the bank file to pick up a published swap
+BANK_RECHECK_SECONDS = float(os.getenv("QUESTION_BANK_RECHECK_SECONDS", "5"))
+
+
+# -----------------------------
+# Helpers
+# -----------------------------
+def _le(a: array) -> bytes:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _pad(buf: bytearray, align: int = 8) -> None:
+    while len(buf) % align:
+        buf.append(0)
+
+
+def _json_bytes(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _sort_key(row: Dict[str, Any]):
+    # same ordering as the SQL list queries: COALESCE(sort_key, 999999999), id
+    sk = row.get("sort_key")
+    return (999999999 if sk is None else int(sk), str(row["id"]))
+
+
+def _facet_value(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+# -----------------------------
+# Build / publish
+# -----------------------------
+def compile_bank(
+    path: str,
+    rows: Iterable[Dict[str, Any]],
+    views: Dict[str, Callable[[Dict[str, Any]], Any]],
+    encode: Optional[Callable[[Any], bytes]] = None,
+) -> Dict[str, Any]:
+    """
+    Compile question rows into a bank file at `path`.
+    `views` maps a view name to the function producing that payload from a row;
+    `encode` turns a payload into JSON bytes (default: stdlib json).
+    The file is written next to `path` and swapped in with os.replace(),
+    so running workers never see a half-written bank.
+    """
+    rows = sorted(rows, key=_sort_key)
+    count = len(rows)
+    encode = encode or _json_bytes
+
+    sections: Dict[str, bytes] = {}
+
+    for view, to_payload in views.items():
+        data = bytearray()
+        offs = array("Q", [0])
+        for row in rows:
+            data += encode(to_payload(row))
+            offs.append(len(data))
+        sections[f"{view}.offs"] = _le(offs)
+        sections[f"{view}.data"] = bytes(data)
+
+    facets: Dict[str, Dict[str, List[int]]] = {f: {} for f in FACET_FIELDS}
+    for rec, row in enumerate(rows):
+        for field in FACET_FIELDS:
+            v = _facet_value(row.get(field))
+            if v is not None:
+                facets[field].setdefault(v, []).append(rec)
+
+    by_id = sorted(range(count), key=lambda r: str(rows[r]["id"]).encode("utf-8"))
+    ids = bytearray()
+    id_offs = array("I", [0])
+    id_recs = array("I")
+    for rec in by_id:
+        ids += str(rows[rec]["id"]).encode("utf-8")
+        id_offs.append(len(ids))
+        id_recs.append(rec)
+
+    fac_ids = array("I")
+    fac_dir: Dict[str, Dict[str, List[int]]] = {}
+    for field, values in facets.items():
+        fac_dir[field] = {}
+        for value, recs in values.items():
+            fac_dir[field][value] = [len(fac_ids), len(recs)]
+            fac_ids.extend(recs)
+
+    sections["ids"] = bytes(ids)
+    sections["id_offs"] = _le(id_offs)
+    sections["id_recs"] = _le(id_recs)
+    sections["facets"] = json.dumps(fac_dir, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    sections["fac_ids"] = _le(fac_ids)
+
+    body = bytearray(_HEADER.size)
+    layout: Dict[str, List[int]] = {}
+    for name, data in sections.items():
+        _pad(body)
+        layout[name] = [len(body), len(data)]
+        body += data
+
+    directory = json.dumps({"sections": layout, "views": list(views)}, separators=(",", ":")).encode("utf-8")
+    _pad(body)
+    dir_off = len(body)
+    body += directory
+
+    built_at = int(time.time())
+    _HEADER.pack_into(body, 0, MAGIC, FORMAT_VERSION, count, built_at, dir_off, len(directory))
+
+    tmp = f"{path}.tmp.{os.getpid()}"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+    return {"path": path, "count": count, "bytes": len(body), "built_at": built_at, "views": list(views)}
+
+
+# -----------------------------
+# Reader
+# -----------------------------
+class QuestionBank:
+    """Read-only view over a compiled bank file (mmapped, shared page cache)."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        view = memoryview(self._mm)
+        magic, fmt, self.count, self.built_at, dir_off, dir_size = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"Not a question bank (format {fmt}): {path}")
+
+        directory = json.loads(bytes(view[dir_off:dir_off + dir_size]))
+        sec = {name: view[off:off + size] for name, (off, size) in directory["sections"].items()}
+
+        self._ids = sec["ids"]
+        self._id_offs = self._u(sec["id_offs"], "I")
+        self._id_recs = self._u(sec["id_recs"], "I")
+        self._fac_ids = self._u(sec["fac_ids"], "I")
+        self._facets: Dict[str, Dict[str, List[int]]] = json.loads(bytes(sec["facets"]))
+
+        # view name -> (offsets, data)
+        self.views = list(directory["views"])
+        self._views = {v: (self._u(sec[f"{v}.offs"], "Q"), sec[f"{v}.data"]) for v in self.views}
+
+    @staticmethod
+    def _u(mv: memoryview, code: str):
+        if sys.byteorder == "little":
+            return mv.cast(code)
+        a = array(code, bytes(mv))
+        a.byteswap()
+        return a
+
+    def _id_at(self, i: int) -> bytes:
+        return bytes(self._ids[self._id_offs[i]:self._id_offs[i + 1]])
+
+    def record_of(self, qid: str) -> Optional[int]:
+        key = qid.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._id_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._id_at(lo) == key:
+            return self._id_recs[lo]
+        return None
+
+    def payload(self, rec: int, view: str = "full") -> memoryview:
+        """Pre-encoded JSON for a record (zero-copy slice of the mapping)."""
+        offs, data = self._views[view]
+        return data[offs[rec]:offs[rec + 1]]
+
+    def get(self, qid: str, view: str = "full") -> Optional[memoryview]:
+        rec = self.record_of(qid)
+        return None if rec is None else self.payload(rec, view)
+
+    def facet(self, field: str, value: Any):
+        """Ascending record numbers for one facet value (empty if unknown)."""
+        v = _facet_value(value)
+        span = self._facets.get(field, {}).get(v) if v is not None else None
+        if not span:
+            return self._fac_ids[0:0]
+        start, length = span
+        return self._fac_ids[start:start + length]
+
+    def facet_values(self, field: str) -> List[str]:
+        return list(self._facets.get(field, {}))
+
+    def iter_ids(self):
+        """(record, id) pairs for every question in the bank."""
+        for i in range(self.count):
+            yield self._id_recs[i], self._id_at(i).decode("utf-8")
+
+
+# -----------------------------
+# Per-worker handle (picks up atomic swaps)
+# -----------------------------
+_bank: Optional[QuestionBank] = None
+_bank_checked_at = 0.0
+_bank_lock = threading.Lock()
+
+
+def get_bank(path: Optional[str]) -> Optional[QuestionBank]:
+    """
+    Current bank for this worker, or None if no bank has been published.
+    The file is re-stat'ed at most every BANK_RECHECK_SECONDS; a new inode
+    (os.replace on publish) is mapped and the old mapping is released once
+    in-flight responses drop their slices.
+    """
+    global _bank, _bank_checked_at
+    if not path:
+        return None
+
+    now = time.monotonic()
+    if _bank is not None and now - _bank_checked_at < BANK_RECHECK_SECONDS:
+        return _bank
+
+    with _bank_lock:
+        if _bank is not None and now - _bank_checked_at < BANK_RECHECK_SECONDS:
+            return _bank
+        _bank_checked_at = now
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            _bank = None
+            return None
+
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if _bank is None or _bank.stamp != stamp:
+            try:
+                _bank = QuestionBank(path)
+                logger.info("Question bank mapped: %s (%s questions)", path, _bank.count)
+            except Exception:
+                logger.exception("Failed to map question bank %s", path)
+                _bank = None
+        return _bank
+
+
+if __name__ == "__main__":
+    # Build step: python question_bank.py  (reads the questions table, publishes the bank)
+    from app import publish_question_bank
+
+    print(json.dumps(publish_question_bank(), indent=2))
@@ -0,0 +1,185 @@
+# question_dedup.py (near-duplicate questions: MinHash + LSH)
+#
+# NECO reuses items across years with small edits. This pass finds them in
+# linear time, without comparing every pair:
+#
+#   1. shingles: hashed word 3-grams of question text + options
+#   2. MinHash: DEDUP_PERMUTATIONS (a*x+b) mod p hashes, vectorized with
+#      NumPy; equal signature slots estimate Jaccard similarity
+#   3. LSH: signatures cut into DEDUP_BANDS bands; questions sharing a band
+#      (within the same subject + qtype) become candidates
+#   4. candidates whose estimated similarity >= DEDUP_THRESHOLD are joined
+#      (union-find) into clusters
+#
+# Each cluster's canonical question is its earliest (year, id). With
+# link=True the members are written to question_duplicates(id,
+# canonical_id, score); question rows themselves are not touched, so
+# content versions do not move.
+#
+#   python question_dedup.py [--link] [--out report.json]
+#   POST /admin/dedup?link=true
+
+import os
+import json
+import time
+import zlib
+import logging
+from typing import Optional, Any, Dict, List, Iterable, Tuple
+
+from db import get_db
+from question_similar import _text, _WORD_RE
+
+logger = logging.getLogger("exampartner")
+
+DEDUP_PERMUTATIONS = int(os.getenv("DEDUP_PERMUTATIONS", "128"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))  # rows per band = permutations / bands
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_SHINGLE = 3
+# Buckets bigger than this (boilerplate stems) are checked against their first member only
+DEDUP_MAX_BUCKET = int(os.getenv("DEDUP_MAX_BUCKET", "50"))
+
+_PRIME = (1 << 61) - 1
+
+
+def _shingles(text: str) -> List[int]:
+    words = _WORD_RE.findall(text.lower())
+    k = min(DEDUP_SHINGLE, len(words)) or 1
+    grams = {" ".join(words[i:i + k]) for i in range(max(1, len(words) - k + 1))}
+    return [zlib.crc32(g.encode("utf-8")) for g in grams]
+
+
+class MinHasher:
+    def __init__(self, permutations: int = DEDUP_PERMUTATIONS, seed: int = 1):
+        import numpy as np
+
+        rng = np.random.default_rng(seed)
+        # a < 2^31 and x < 2^32 keep a*x + b inside uint64
+        self.a = rng.integers(1, 1 << 31, size=permutations, dtype=np.uint64)[:, None]
+        self.b = rng.integers(0, _PRIME, size=permutations, dtype=np.uint64)[:, None]
+
+    def signature(self, shingles: List[int]):
+        import numpy as np
+
+        x = np.asarray(shingles, dtype=np.uint64)[None, :]
+        return ((self.a * x + self.b) % np.uint64(_PRIME)).min(axis=1)
+
+
+def find_duplicates(rows: Iterable[Dict[str, Any]], threshold: float = DEDUP_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Clusters of near-duplicates (2+ members), largest first:
+      {"canonical_id", "size", "members": [{"id", "year", "score"}]}
+    `score` is the estimated Jaccard similarity to the canonical question.
+    """
+    import numpy as np
+
+    rows = list(rows)
+    if not rows:
+        return []
+    hasher = MinHasher()
+    sigs = np.stack([hasher.signature(_shingles(_text(r))) for r in rows])
+    per_band = max(1, DEDUP_PERMUTATIONS // DEDUP_BANDS)
+
+    def similarity(i: int, j: int) -> float:
+        return float(np.mean(sigs[i] == sigs[j]))
+
+    parent = list(range(len(rows)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(DEDUP_BANDS):
+        buckets: Dict[Tuple[Any, ...], List[int]] = {}
+        chunk = sigs[:, band * per_band:(band + 1) * per_band]
+        for i, r in enumerate(rows):
+            buckets.setdefault((r.get("subject"), r.get("qtype"), chunk[i].tobytes()), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            if len(members) > DEDUP_MAX_BUCKET:
+                pairs = [(members[0], j) for j in members[1:]]
+            else:
+                pairs = [(i, j) for n, i in enumerate(members) for j in members[n + 1:]]
+            for i, j in pairs:
+                ri, rj = find(i), find(j)
+                if ri != rj and similarity(i, j) >= threshold:
+                    parent[rj] = ri
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(rows)):
+        clusters.setdefault(find(i), []).append(i)
+
+    def age(i: int):
+        year = rows[i].get("year")
+        return (year if year is not None else 9999, str(rows[i]["id"]))
+
+    out = []
+    for members in clusters.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=age)
+        canonical = members[0]
+        out.append({
+            "canonical_id": str(rows[canonical]["id"]),
+            "size": len(members),
+            "members": [
+                {"id": str(rows[i]["id"]), "year": rows[i].get("year"), "score": round(similarity(canonical, i), 3)}
+                for i in members
+            ],
+        })
+    out.sort(key=lambda c: (-c["size"], c["canonical_id"]))
+    return out
+
+
+def dedup_questions(link: bool = False, threshold: float = DEDUP_THRESHOLD) -> Dict[str, Any]:
+    """Run find_duplicates() over the questions table; with link=True, replace question_duplicates."""
+    t0 = time.perf_counter()
+    db = get_db()
+    try:
+        cur = db.cursor()
+        cur.execute("SELECT id, exam, year, subject, qtype, question_text, options_json FROM questions")
+        rows = cur.fetchall()
+        clusters = find_duplicates(rows, threshold)
+
+        if link:
+            cur.execute("DELETE FROM question_duplicates")
+            cur.executemany(
+                "INSERT INTO question_duplicates (id, canonical_id, score) VALUES (?, ?, ?)",
+                [(m["id"], c["canonical_id"], m["score"]) for c in clusters for m in c["members"][1:]],
+            )
+            db.commit()
+    finally:
+        db.close()
+
+    secs = round(time.perf_counter() - t0, 2)
+    duplicates = sum(c["size"] - 1 for c in clusters)
+    logger.info("Dedup: %s questions, %s clusters, %s duplicates in %ss", len(rows), len(clusters), duplicates, secs)
+    return {
+        "questions": len(rows),
+        "clusters": len(clusters),
+        "duplicates": duplicates,
+        "threshold": threshold,
+        "linked": link,
+        "seconds": secs,
+        "report": clusters,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    out_path: Optional[str] = None
+    if "--out" in sys.argv:
+        out_path = sys.argv[sys.argv.index("--out") + 1]
+
+    result = dedup_questions(link="--link" in sys.argv)
+    text = json.dumps(result, indent=2)
+    if out_path:
+        with open(out_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(json.dumps({k: v for k, v in result.items() if k != "report"}, indent=2))
+    else:
+        print(text)
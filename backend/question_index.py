@@ -0,0 +1,298 @@
+# question_index.py (compact in-memory facet index over questions)
+#
+# Answers _build_filters-style queries (qtype/exam/year/subject) and
+# LIMIT/OFFSET pagination without touching the database.
+#
+# - Records are kept in list order (COALESCE(sort_key, 999999999), id), so a
+#   record's position IS its sort order; no per-query sorting.
+# - Facet values are interned: each column is an array("H") of small codes.
+# - Every facet value also has a bitmask (Python int, bit i = record i).
+#   A query is a handful of big-int ANDs, i.e. vectorized over all records
+#   in C, and int.bit_count() gives the total for free.
+
+import sys
+import time
+from array import array
+from typing import Optional, Any, Dict, List, Iterable, Tuple
+
+FACET_FIELDS = ("qtype", "exam", "year", "subject")
+
+
+class QuestionRecord:
+    """Facet columns for one question (only used while building)."""
+
+    __slots__ = ("id", "qtype", "exam", "year", "subject", "sort_key")
+
+    def __init__(self, id, qtype, exam, year, subject, sort_key):
+        self.id = id
+        self.qtype = qtype
+        self.exam = exam
+        self.year = year
+        self.subject = subject
+        self.sort_key = sort_key
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "QuestionRecord":
+        sk = row.get("sort_key")
+        return cls(
+            str(row["id"]),
+            _facet_value(row.get("qtype")),
+            _facet_value(row.get("exam")),
+            _facet_value(row.get("year")),
+            _facet_value(row.get("subject")),
+            999999999 if sk is None else int(sk),
+        )
+
+
+def _facet_value(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+# popcount per byte (used to skip whole bytes of the mask while paginating)
+_POP = bytes(bin(i).count("1") for i in range(256))
+
+
+class QuestionIndex:
+    def __init__(self, records: List[QuestionRecord]):
+        self.count = len(records)
+        self.ids: List[str] = [r.id for r in records]
+        self.built_at = time.time()
+
+        # interned facet codes: values[field][code] -> value, code 0 = NULL
+        self._values: Dict[str, List[Optional[str]]] = {}
+        self._columns: Dict[str, array] = {}
+        self._masks: Dict[str, Dict[str, int]] = {}
+
+        for field in FACET_FIELDS:
+            values: List[Optional[str]] = [None]
+            codes: Dict[str, int] = {}
+            col = array("H")
+            bits: Dict[int, List[int]] = {}
+            for i, r in enumerate(records):
+                v = getattr(r, field)
+                if v is None:
+                    col.append(0)
+                    continue
+                code = codes.get(v)
+                if code is None:
+                    code = codes[v] = len(values)
+                    values.append(v)
+                col.append(code)
+                bits.setdefault(code, []).append(i)
+
+            self._values[field] = values
+            self._columns[field] = col
+            self._masks[field] = {values[c]: _mask_from_positions(p, self.count) for c, p in bits.items()}
+
+        self._all = (1 << self.count) - 1
+        self._pos: Optional[Dict[str, int]] = None
+        self._strata: Dict[Any, Dict[Optional[str], array]] = {}
+
+    # -----------------------------
+    # Builders
+    # -----------------------------
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "QuestionIndex":
+        records = [QuestionRecord.from_row(r) for r in rows]
+        records.sort(key=lambda r: (r.sort_key, r.id))
+        return cls(records)
+
+    @classmethod
+    def from_bank(cls, bank) -> "QuestionIndex":
+        """Build from a compiled QuestionBank (record numbers are kept as positions)."""
+        records = [QuestionRecord(None, None, None, None, None, rec) for rec in range(bank.count)]
+        for rec, qid in bank.iter_ids():
+            records[rec].id = qid
+        for field in FACET_FIELDS:
+            for value in bank.facet_values(field):
+                for rec in bank.facet(field, value):
+                    setattr(records[rec], field, value)
+        return cls(records)
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def mask(self, filters: Dict[str, Any]) -> int:
+        m = self._all
+        for field, value in filters.items():
+            v = _facet_value(value)
+            if v is None:
+                continue
+            m &= self._masks.get(field, {}).get(v, 0)
+            if not m:
+                break
+        return m
+
+    def page(self, filters: Dict[str, Any], limit: int, offset: int) -> List[int]:
+        """Record positions for one page, in list order."""
+        if limit <= 0:
+            return []
+        m = self.mask(filters)
+        if not m:
+            return []
+
+        raw = m.to_bytes((self.count + 7) // 8 or 1, "little")
+        out: List[int] = []
+        skip = max(0, offset)
+        for bi, byte in enumerate(raw):
+            if not byte:
+                continue
+            pop = _POP[byte]
+            if skip >= pop:
+                skip -= pop
+                continue
+            base = bi * 8
+            while byte:
+                low = byte & -byte
+                if skip:
+                    skip -= 1
+                else:
+                    out.append(base + low.bit_length() - 1)
+                    if len(out) >= limit:
+                        return out
+                byte ^= low
+        return out
+
+    def positions(self, filters: Dict[str, Any]) -> array:
+        """Every matching record position, in list order."""
+        out = array("I")
+        raw = self.mask(filters).to_bytes((self.count + 7) // 8 or 1, "little")
+        for bi, byte in enumerate(raw):
+            base = bi * 8
+            while byte:
+                low = byte & -byte
+                out.append(base + low.bit_length() - 1)
+                byte ^= low
+        return out
+
+    def strata(self, filters: Dict[str, Any], field: str) -> Dict[Optional[str], array]:
+        """
+        Matching positions grouped by `field` (e.g. year), as compact arrays.
+        Computed once per (filters, field) for the life of the index, so
+        samplers (mock exams) only index into ready-made arrays.
+        """
+        key = (tuple(sorted((k, _facet_value(v)) for k, v in filters.items())), field)
+        cached = self._strata.get(key)
+        if cached is None:
+            col, values = self._columns[field], self._values[field]
+            cached = {}
+            for pos in self.positions(filters):
+                cached.setdefault(values[col[pos]], array("I")).append(pos)
+            if len(self._strata) >= 512:
+                self._strata.clear()
+            self._strata[key] = cached
+        return cached
+
+    def add_tags(self, field: str, pairs: Iterable[Tuple[str, str]]) -> None:
+        """
+        Multi-valued facet (e.g. topic) from (qid, value) pairs; filterable
+        like the other fields but has no column, so value_of()/rank() skip it.
+        """
+        positions: Dict[str, List[int]] = {}
+        for qid, value in pairs:
+            pos = self.position(qid)
+            v = _facet_value(value)
+            if pos is not None and v is not None:
+                positions.setdefault(v, []).append(pos)
+        self._masks[field] = {v: _mask_from_positions(p, self.count) for v, p in positions.items()}
+
+    def position(self, qid: str) -> Optional[int]:
+        if self._pos is None:
+            # built on first lookup only; list queries never need it
+            self._pos = {q: i for i, q in enumerate(self.ids)}
+        return self._pos.get(qid)
+
+    def value_of(self, field: str, pos: int) -> Optional[str]:
+        return self._values[field][self._columns[field][pos]]
+
+    def rank(self, pos: int, fields=FACET_FIELDS) -> int:
+        """0-based position of a record within the list of records sharing its `fields` values."""
+        m = self.mask({f: self.value_of(f, pos) for f in fields})
+        return (m & ((1 << pos) - 1)).bit_count()
+
+    # -----------------------------
+    # Memory report
+    # -----------------------------
+    def footprint(self) -> Dict[str, int]:
+        ids = sys.getsizeof(self.ids) + sum(sys.getsizeof(s) for s in self.ids)
+        columns = sum(sys.getsizeof(c) for c in self._columns.values())
+        masks = sum(sys.getsizeof(m) for d in self._masks.values() for m in d.values())
+        dictionary = sum(
+            sys.getsizeof(v) for vals in self._values.values() for v in vals if v is not None
+        )
+        return {
+            "ids": ids,
+            "columns": columns,
+            "masks": masks,
+            "dictionary": dictionary,
+            "total": ids + columns + masks + dictionary,
+        }
+
+
+def _mask_from_positions(positions: List[int], count: int) -> int:
+    buf = bytearray((count + 7) // 8 or 1)
+    for p in positions:
+        buf[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buf, "little")
+
+
+def _deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+if __name__ == "__main__":
+    # Memory report: python question_index.py [count]
+    import random
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    rnd = random.Random(7)
+    subjects = ["Mathematics", "English", "Biology", "Physics", "Chemistry", "Agric", "Economics", "Government"]
+    rows = [
+        {
+            "id": f"{rnd.choice(['NECO', 'WAEC', 'JAMB'])}_{2010 + i % 16}_OBJ_Q{i}",
+            "qtype": "objective" if i % 5 else "theory",
+            "exam": rnd.choice(["NECO", "WAEC", "JAMB"]),
+            "year": 2010 + i % 16,
+            "subject": rnd.choice(subjects),
+            "sort_key": i,
+        }
+        for i in range(n)
+    ]
+
+    index = QuestionIndex.from_rows(rows)
+    baseline = {r["id"]: dict(r) for r in rows}
+
+    fp = index.footprint()
+    base = _deep_sizeof(baseline)
+    per10k = 10_000 / n
+    print(f"questions:            {n}")
+    print(f"index bytes/10k:      {int(fp['total'] * per10k):,}  {fp}")
+    print(f"dict-of-dicts/10k:    {int(base * per10k):,}")
+    print(f"ratio:                {base / fp['total']:.1f}x smaller")
+
+    f = {"qtype": "objective", "exam": "NECO", "year": 2020, "subject": "Mathematics"}
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        index.page(f, 20, 40)
+    t_idx = (time.perf_counter() - t0) / 1000
+    ordered = sorted(baseline.values(), key=lambda r: (r["sort_key"], r["id"]))
+    t0 = time.perf_counter()
+    for _ in range(100):
+        [
+            r for r in ordered
+            if r["qtype"] == f["qtype"] and r["exam"] == f["exam"] and r["year"] == f["year"] and r["subject"] == f["subject"]
+        ][40:60]
+    t_base = (time.perf_counter() - t0) / 100
+    print(f"page query:           {t_idx * 1e6:.0f} us (index) vs {t_base * 1e6:.0f} us (dict scan)")
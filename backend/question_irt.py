@@ -0,0 +1,240 @@
+# question_irt.py (offline item-response-theory calibration)
+#
+# Percent correct mixes up "hard question" with "attempted by weak
+# students". IRT separates the two: each student has an ability theta,
+# each question a difficulty b (and, for 2PL, a discrimination a), and
+#
+#   P(correct) = 1 / (1 + exp(-a * (theta - b)))        (1PL: a = 1)
+#
+# Every graded answer in attempt_answers is one observation. The response
+# matrix (students x questions) is sparse, so it is kept as COO triplets
+# (user, item, correct) and every gradient / curvature sum is a
+# np.bincount over the row or column index: O(responses) per step, with no
+# Python loops over rows.
+#
+# The fit is joint MAP with weak normal priors (they pin the scale and
+# keep questions everyone gets right finite), alternating one damped
+# Newton step for all abilities with one for all item parameters until
+# the largest change drops below IRT_TOLERANCE.
+#
+# Results replace question_irt(qid, model, difficulty, discrimination,
+# responses) in one transaction; questions with fewer than
+# IRT_MIN_RESPONSES graded answers are left out.
+#
+#   python question_irt.py [1pl|2pl]   or   POST /admin/irt/calibrate?model=2pl
+#   python question_irt.py bench [responses]   (synthetic data, checks recovery)
+
+import os
+import sys
+import json
+import time
+import logging
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from scipy.special import expit
+
+from db import get_db, _using_postgres
+
+logger = logging.getLogger("exampartner")
+
+IRT_MIN_RESPONSES = int(os.getenv("IRT_MIN_RESPONSES", "30"))
+IRT_MAX_ITERATIONS = int(os.getenv("IRT_MAX_ITERATIONS", "100"))
+IRT_TOLERANCE = float(os.getenv("IRT_TOLERANCE", "1e-3"))
+# Rows per fetchmany() while loading responses
+IRT_FETCH_CHUNK = 50_000
+
+# prior variances: ability, difficulty, log-discrimination
+THETA_VAR, B_VAR, LOG_A_VAR = 1.0, 4.0, 0.25
+# largest step per iteration (keeps early Newton steps sane)
+MAX_STEP = 1.0
+
+MODELS = ("1pl", "2pl")
+
+
+def fit_irt(
+    users: np.ndarray,
+    items: np.ndarray,
+    correct: np.ndarray,
+    n_users: int,
+    n_items: int,
+    model: str = "2pl",
+    max_iterations: int = IRT_MAX_ITERATIONS,
+    tol: float = IRT_TOLERANCE,
+) -> Dict[str, Any]:
+    """
+    Fit on COO responses (users[k], items[k], correct[k] in {0, 1}).
+    Returns theta (n_users), difficulty / discrimination (n_items),
+    iterations and the mean log-likelihood.
+    """
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {MODELS}")
+    y = correct.astype(np.float64)
+    counts = np.bincount(items, minlength=n_items)
+
+    # start: b from each item's smoothed logit(p correct), everyone average
+    p_item = (np.bincount(items, y, n_items) + 0.5) / (counts + 1.0)
+    b = -np.log(p_item / (1.0 - p_item))
+    theta = np.zeros(n_users)
+    log_a = np.zeros(n_items)
+
+    it = 0
+    for it in range(1, max_iterations + 1):
+        a = np.exp(log_a)
+        a_k = a[items]
+
+        # abilities (items fixed)
+        p = expit(a_k * (theta[users] - b[items]))
+        r, w = y - p, p * (1.0 - p)
+        grad = np.bincount(users, a_k * r, n_users) - theta / THETA_VAR
+        curv = np.bincount(users, a_k * a_k * w, n_users) + 1.0 / THETA_VAR
+        step_theta = np.clip(grad / curv, -MAX_STEP, MAX_STEP)
+        theta += step_theta
+
+        # difficulties (abilities fixed)
+        d = theta[users] - b[items]
+        p = expit(a_k * d)
+        r, w = y - p, p * (1.0 - p)
+        grad = -np.bincount(items, a_k * r, n_items) - b / B_VAR
+        curv = np.bincount(items, a_k * a_k * w, n_items) + 1.0 / B_VAR
+        step_b = np.clip(grad / curv, -MAX_STEP, MAX_STEP)
+        b += step_b
+        change = max(np.abs(step_theta).max(initial=0.0), np.abs(step_b).max(initial=0.0))
+
+        # discriminations on log scale so a stays positive (2PL only)
+        if model == "2pl":
+            z = a_k * (theta[users] - b[items])
+            p = expit(z)
+            r, w = y - p, p * (1.0 - p)
+            grad = np.bincount(items, z * r, n_items) - log_a / LOG_A_VAR
+            curv = np.bincount(items, z * z * w, n_items) + 1.0 / LOG_A_VAR
+            step_a = np.clip(grad / curv, -MAX_STEP / 2, MAX_STEP / 2)
+            log_a += step_a
+            change = max(change, np.abs(step_a).max(initial=0.0))
+
+        if change < tol:
+            break
+
+    a = np.exp(log_a)
+    p = np.clip(expit(a[items] * (theta[users] - b[items])), 1e-12, 1 - 1e-12)
+    loglik = float(np.mean(y * np.log(p) + (1.0 - y) * np.log(1.0 - p))) if len(y) else 0.0
+    return {
+        "theta": theta,
+        "difficulty": b,
+        "discrimination": a,
+        "responses": counts,
+        "iterations": it,
+        "loglik": loglik,
+    }
+
+
+def load_responses(db) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[str], List[str]]:
+    """Every graded answer as COO arrays + the user / question id for each code."""
+    user_codes: Dict[str, int] = {}
+    item_codes: Dict[str, int] = {}
+    users: List[int] = []
+    items: List[int] = []
+    correct: List[int] = []
+
+    # Postgres: server-side cursor, so the result set is streamed rather than held client-side
+    cur = db.cursor("irt_responses") if _using_postgres() else db.cursor()
+    cur.execute(
+        """
+        SELECT a.identifier, aa.qid, aa.correct
+        FROM attempt_answers aa
+        JOIN attempts a ON a.id = aa.attempt_id
+        WHERE aa.correct IS NOT NULL
+        """
+    )
+    while True:
+        rows = cur.fetchmany(IRT_FETCH_CHUNK)
+        if not rows:
+            break
+        for r in rows:
+            users.append(user_codes.setdefault(r["identifier"], len(user_codes)))
+            items.append(item_codes.setdefault(r["qid"], len(item_codes)))
+            correct.append(1 if r["correct"] else 0)
+    cur.close()
+
+    return (
+        np.array(users, dtype=np.int64),
+        np.array(items, dtype=np.int64),
+        np.array(correct, dtype=np.int8),
+        list(user_codes),
+        list(item_codes),
+    )
+
+
+def calibrate(model: str = "2pl") -> Dict[str, Any]:
+    """Fit on all recorded attempts and replace question_irt in one transaction."""
+    if model not in MODELS:
+        raise ValueError(f"model must be one of {MODELS}")
+    t0 = time.perf_counter()
+
+    db = get_db()
+    try:
+        users, items, correct, user_ids, item_ids = load_responses(db)
+        t_load = time.perf_counter() - t0
+        fit = fit_irt(users, items, correct, len(user_ids), len(item_ids), model)
+
+        rows = [
+            (item_ids[j], model, float(fit["difficulty"][j]), float(fit["discrimination"][j]), int(n))
+            for j, n in enumerate(fit["responses"])
+            if n >= IRT_MIN_RESPONSES
+        ]
+        cur = db.cursor()
+        cur.execute("DELETE FROM question_irt")
+        cur.executemany(
+            "INSERT INTO question_irt (qid, model, difficulty, discrimination, responses) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    out = {
+        "model": model,
+        "responses": int(len(correct)),
+        "students": len(user_ids),
+        "questions": len(item_ids),
+        "calibrated": len(rows),
+        "iterations": fit["iterations"],
+        "loglik": round(fit["loglik"], 4),
+        "load_seconds": round(t_load, 2),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+    logger.info("IRT calibration: %s", out)
+    return out
+
+
+def _bench(n_responses: int) -> None:
+    """Synthetic students/questions with known parameters: timing + how well they are recovered."""
+    rnd = np.random.default_rng(7)
+    n_users = max(100, n_responses // 40)
+    n_items = max(50, n_responses // 400)
+    theta = rnd.normal(0, 1, n_users)
+    b = rnd.normal(0, 1, n_items)
+    a = np.exp(rnd.normal(0, 0.3, n_items))
+    users = rnd.integers(0, n_users, n_responses)
+    items = rnd.integers(0, n_items, n_responses)
+    correct = (rnd.random(n_responses) < expit(a[items] * (theta[users] - b[items]))).astype(np.int8)
+
+    for model in MODELS:
+        t0 = time.perf_counter()
+        fit = fit_irt(users, items, correct, n_users, n_items, model)
+        secs = time.perf_counter() - t0
+        print(
+            f"{model}: {n_responses:,} responses ({n_users:,} students x {n_items:,} questions) "
+            f"in {secs:.1f}s, {fit['iterations']} iterations | "
+            f"corr(b) {np.corrcoef(b, fit['difficulty'])[0, 1]:.3f}  "
+            f"corr(theta) {np.corrcoef(theta, fit['theta'])[0, 1]:.3f}"
+            + (f"  corr(a) {np.corrcoef(a, fit['discrimination'])[0, 1]:.3f}" if model == "2pl" else "")
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        _bench(int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000)
+    else:
+        print(json.dumps(calibrate(sys.argv[1] if len(sys.argv) > 1 else "2pl"), indent=2))
@@ -0,0 +1,344 @@
+# question_replica.py (per-node SQLite replica of the question bank)
+#
+# Question content almost never changes, but every question request used to
+# depend on Neon being warm and healthy. Each node keeps a local SQLite copy
+# of the questions table, re-synced whenever the Postgres content version
+# moves, and question reads switch to it automatically when the primary is
+# slow or unreachable.
+#
+# Only active in Postgres mode (DATABASE_URL set); in SQLite mode the DB is
+# already local and reads go straight to it.
+
+import os
+import math
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Any, Callable, TypeVar
+
+from db import get_db, get_content_version, _using_postgres, _create_sqlite_fts
+
+try:
+    import fcntl  # one syncing worker per node (POSIX only)
+except ImportError:  # pragma: no cover - Windows dev machines
+    fcntl = None
+
+logger = logging.getLogger("exampartner")
+
+T = TypeVar("T")
+
+REPLICA_PATH = os.getenv("REPLICA_PATH", str(Path(__file__).resolve().parent / "questions_replica.db"))
+REPLICA_SYNC_SECONDS = int(os.getenv("REPLICA_SYNC_SECONDS", "60"))
+# A primary read slower than this (or failing) routes question reads to the replica...
+PRIMARY_LATENCY_MS = int(os.getenv("PRIMARY_LATENCY_MS", "1500"))
+# ...for this long, after which the primary is tried again.
+REPLICA_COOLDOWN_SECONDS = int(os.getenv("REPLICA_COOLDOWN_SECONDS", "30"))
+# Connect timeout (seconds) for request-path reads of the primary
+PRIMARY_CONNECT_TIMEOUT = max(1, math.ceil(PRIMARY_LATENCY_MS / 1000))
+
+_QUESTION_COLUMNS = (
+    "id, exam, year, subject, paper, section, qtype, sort_key, page, marks, question_text, "
+    "options_json, answer, explanation, sub_questions_json, solution_steps_json, diagrams_json, stem, "
+    "version, created_version, updated_at"
+)
+
+_degraded_until = 0.0
+
+
+def replica_enabled() -> bool:
+    return bool(REPLICA_PATH) and _using_postgres()
+
+
+def replica_available() -> bool:
+    return replica_enabled() and os.path.exists(REPLICA_PATH)
+
+
+def get_primary_db():
+    """
+    Primary connection for request-path reads: the connect is bounded by
+    PRIMARY_CONNECT_TIMEOUT and every statement by PRIMARY_LATENCY_MS, so a
+    primary that accepts connections but stalls on queries fails fast too.
+    """
+    return get_db(connect_timeout=PRIMARY_CONNECT_TIMEOUT, statement_timeout_ms=PRIMARY_LATENCY_MS)
+
+
+def primary_degraded() -> bool:
+    """True while request-path reads are being kept off the primary."""
+    return time.monotonic() < _degraded_until
+
+
+def mark_primary_degraded() -> None:
+    """Keep request-path reads off the primary for REPLICA_COOLDOWN_SECONDS."""
+    global _degraded_until
+    _degraded_until = time.monotonic() + REPLICA_COOLDOWN_SECONDS
+
+
+# -----------------------------
+# Replica connection (read-only, dict rows like RealDictCursor)
+# -----------------------------
+class _ReplicaCursor:
+    def __init__(self, cur):
+        self._cur = cur
+
+    def execute(self, query: str, params: Any = None):
+        return self._cur.execute(query, params or ())
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+
+class _ReplicaConn:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _ReplicaCursor(self._conn.cursor())
+
+    def commit(self):
+        return None
+
+    def close(self):
+        return self._conn.close()
+
+
+def _dict_row(cur, row):
+    return {d[0]: row[i] for i, d in enumerate(cur.description)}
+
+
+def get_replica_db() -> _ReplicaConn:
+    conn = sqlite3.connect(f"file:{REPLICA_PATH}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = _dict_row
+    return _ReplicaConn(conn)
+
+
+def replica_version() -> Optional[int]:
+    if not replica_available():
+        return None
+    db = get_replica_db()
+    try:
+        return get_content_version(db)
+    except Exception:
+        return None
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Read routing
+# -----------------------------
+def read_questions(query: Callable[[Any], T]) -> T:
+    """
+    Run query(db) for a question read.
+    - Primary healthy => Postgres (connect and statements bounded, see
+      get_primary_db); a slow, timed-out or failed read marks the primary
+      degraded for REPLICA_COOLDOWN_SECONDS
+    - Primary degraded => local replica
+    Falls back to the primary whenever no replica has been synced yet.
+    """
+    if not replica_available():
+        db = get_db()
+        try:
+            return query(db)
+        finally:
+            db.close()
+
+    if primary_degraded():
+        return _read_replica(query)
+
+    t0 = time.monotonic()
+    try:
+        db = get_primary_db()
+        try:
+            result = query(db)
+        finally:
+            db.close()
+    except Exception:
+        logger.exception("Primary question read failed; serving from replica for %ss", REPLICA_COOLDOWN_SECONDS)
+        mark_primary_degraded()
+        return _read_replica(query)
+
+    elapsed_ms = (time.monotonic() - t0) * 1000
+    if elapsed_ms > PRIMARY_LATENCY_MS:
+        logger.warning(
+            "Primary question read took %.0fms (> %sms); serving from replica for %ss",
+            elapsed_ms, PRIMARY_LATENCY_MS, REPLICA_COOLDOWN_SECONDS,
+        )
+        mark_primary_degraded()
+    return result
+
+
+def _read_replica(query: Callable[[Any], T]) -> T:
+    db = get_replica_db()
+    try:
+        return query(db)
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Sync (Postgres -> local SQLite)
+# -----------------------------
+def sync_replica(force: bool = False) -> Optional[int]:
+    """
+    Copy the questions table into REPLICA_PATH if the primary's content version
+    differs from the replica's. The new file is built beside the old one and
+    swapped in with os.replace(), so readers never see a partial copy.
+    Returns the replica's version after the sync.
+    """
+    if not replica_enabled():
+        return None
+
+    local = replica_version()
+
+    db = get_db(connect_timeout=10)
+    try:
+        version = get_content_version(db)
+        if not force and local == version:
+            return local
+
+        cur = db.cursor()
+        cur.execute(f"SELECT {_QUESTION_COLUMNS} FROM questions")
+        rows = cur.fetchall()
+        cur.execute("SELECT id, version, deleted_at FROM question_tombstones")
+        tombstones = cur.fetchall()
+        cur.execute("SELECT qid, rank, similar_id, score FROM question_similar")
+        similar = cur.fetchall()
+        cur.execute("SELECT qid, topic FROM question_topics")
+        topics = cur.fetchall()
+    finally:
+        db.close()
+
+    cols = [c.strip() for c in _QUESTION_COLUMNS.split(",")]
+    tmp = f"{REPLICA_PATH}.tmp.{os.getpid()}"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+
+    conn = sqlite3.connect(tmp)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE questions (
+              id TEXT PRIMARY KEY,
+              exam TEXT,
+              year INTEGER,
+              subject TEXT,
+              paper TEXT,
+              section TEXT,
+              qtype TEXT NOT NULL,
+              sort_key INTEGER,
+              page INTEGER,
+              marks INTEGER,
+              question_text TEXT NOT NULL,
+              options_json TEXT,
+              answer TEXT,
+              explanation TEXT,
+              sub_questions_json TEXT,
+              solution_steps_json TEXT,
+              diagrams_json TEXT,
+              stem TEXT,
+              version INTEGER NOT NULL DEFAULT 0,
+              created_version INTEGER NOT NULL DEFAULT 0,
+              updated_at TEXT
+            );
+            """
+        )
+        cur.executemany(
+            f"INSERT INTO questions ({_QUESTION_COLUMNS}) VALUES ({','.join('?' for _ in cols)})",
+            [tuple(_sqlite_value(r[c]) for c in cols) for r in rows],
+        )
+        cur.execute(
+            """
+            CREATE TABLE question_tombstones (
+              id TEXT PRIMARY KEY,
+              version INTEGER NOT NULL,
+              deleted_at TEXT
+            );
+            """
+        )
+        cur.executemany(
+            "INSERT INTO question_tombstones (id, version, deleted_at) VALUES (?, ?, ?)",
+            [(t["id"], t["version"], _sqlite_value(t["deleted_at"])) for t in tombstones],
+        )
+        cur.execute(
+            """
+            CREATE TABLE question_similar (
+              qid TEXT NOT NULL,
+              rank INTEGER NOT NULL,
+              similar_id TEXT NOT NULL,
+              score REAL NOT NULL,
+              PRIMARY KEY (qid, rank)
+            );
+            """
+        )
+        cur.executemany(
+            "INSERT INTO question_similar (qid, rank, similar_id, score) VALUES (?, ?, ?, ?)",
+            [(s["qid"], s["rank"], s["similar_id"], s["score"]) for s in similar],
+        )
+        cur.execute("CREATE TABLE question_topics (qid TEXT NOT NULL, topic TEXT NOT NULL, PRIMARY KEY (qid, topic));")
+        cur.executemany(
+            "INSERT INTO question_topics (qid, topic) VALUES (?, ?)",
+            [(t["qid"], t["topic"]) for t in topics],
+        )
+        cur.execute("CREATE INDEX idx_question_topics_topic ON question_topics(topic, qid);")
+        cur.execute("CREATE INDEX idx_questions_exam_year_subject ON questions(exam, year, subject);")
+        cur.execute("CREATE INDEX idx_questions_qtype ON questions(qtype);")
+        cur.execute("CREATE INDEX idx_questions_sort_key ON questions(sort_key);")
+        cur.execute("CREATE INDEX idx_questions_version ON questions(version);")
+        cur.execute("CREATE INDEX idx_question_tombstones_version ON question_tombstones(version);")
+        cur.execute(
+            """
+            CREATE TABLE content_version (
+              id INTEGER PRIMARY KEY CHECK (id = 1),
+              version INTEGER NOT NULL,
+              updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+            );
+            """
+        )
+        cur.execute("INSERT INTO content_version (id, version) VALUES (1, ?)", (version,))
+        _create_sqlite_fts(cur)
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, REPLICA_PATH)
+    logger.info("Question replica synced: version %s, %s questions", version, len(rows))
+    return version
+
+
+def _sqlite_value(v: Any) -> Any:
+    # timestamps (TIMESTAMPTZ) are stored as ISO text, as SQLite mode does
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def _sync_loop() -> None:
+    lock_file = None
+    while True:
+        try:
+            if fcntl is not None and lock_file is None:
+                # only one worker per node keeps the replica in sync
+                f = open(f"{REPLICA_PATH}.lock", "a")
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    lock_file = f
+                except OSError:
+                    f.close()
+            if fcntl is None or lock_file is not None:
+                sync_replica()
+        except Exception:
+            logger.exception("Question replica sync failed")
+        time.sleep(REPLICA_SYNC_SECONDS)
+
+
+def start_replica_sync() -> None:
+    if not replica_enabled():
+        return
+    t = threading.Thread(target=_sync_loop, name="question-replica-sync", daemon=True)
+    t.start()
+    logger.info("Question replica sync started: %s (every %ss)", REPLICA_PATH, REPLICA_SYNC_SECONDS)
@@ -0,0 +1,235 @@
+# question_search.py (full-text search over the question bank)
+#
+# Backs GET /questions/search. The indexes themselves are created in db.py:
+#   - Postgres: questions.search_tsv, a weighted generated tsvector
+#     (question_text A, options B) with a GIN index;
+#     ranked by ts_rank_cd, snippets from ts_headline.
+#   - SQLite (local dev + the per-node replica): questions_fts, an FTS5
+#     table over the same columns, keyed by id; ranked by bm25, snippets
+#     from snippet().
+#
+# Only pre-reveal text is indexed: the route is public, so answers and
+# explanations must never be matchable.
+#
+# Which one runs depends on the connection read_questions() hands over, so
+# search keeps working from the replica while the primary is degraded.
+#
+# User input is never passed through as query syntax: it is reduced to
+# words, all of which must match (the last one as a prefix, for
+# search-as-you-type).
+
+import re
+import sqlite3
+from typing import Optional, Any, Dict, List, Tuple
+
+from db import _PGConn
+
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+# bm25 column weights: id (UNINDEXED, never matches), question_text, options_json
+FTS_WEIGHTS = (0.0, 3.0, 1.0)
+
+# FTS5 sorts by its hidden rank column natively (no separate bm25() pass)
+_BM25 = f"bm25({', '.join(str(w) for w in FTS_WEIGHTS)})"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+MAX_TERMS = 8
+
+
+def search_terms(q: str) -> List[str]:
+    return _WORD_RE.findall(q or "")[:MAX_TERMS]
+
+
+def _filters(
+    exam: Optional[str], year: Optional[int], subject: Optional[str], qtype: Optional[str]
+) -> Tuple[str, List[Any]]:
+    where: List[str] = []
+    params: List[Any] = []
+    for col, val in (("q.exam", exam), ("q.year", year), ("q.subject", subject), ("q.qtype", qtype)):
+        if val is not None and val != "":
+            where.append(f"{col} = ?")
+            params.append(val)
+    return "".join(f" AND {w}" for w in where), params
+
+
+def search_questions(
+    db,
+    q: str,
+    exam: Optional[str] = None,
+    year: Optional[int] = None,
+    subject: Optional[str] = None,
+    qtype: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Ranked matches, best first:
+      {id, exam, year, subject, type, marks, snippet, score}
+    `snippet` is an excerpt of question_text with matches wrapped in <mark>.
+    """
+    terms = search_terms(q)
+    if not terms:
+        return []
+    where_sql, params = _filters(exam, year, subject, qtype)
+    if isinstance(db, _PGConn):
+        return _search_postgres(db, terms, where_sql, params, limit, offset)
+    return _search_sqlite(db, terms, where_sql, params, limit, offset)
+
+
+def _search_postgres(db, terms, where_sql, params, limit, offset) -> List[Dict[str, Any]]:
+    # to_tsquery over sanitized words: w1 & w2 & last:*
+    tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+    cur = db.cursor()
+    # ts_headline is slow: only computed for the page, after ranking
+    cur.execute(
+        f"""
+        SELECT m.*, ts_headline('english', m.question_text, m.query,
+                 'StartSel={SNIPPET_OPEN}, StopSel={SNIPPET_CLOSE}, MaxWords=30, MinWords=12, MaxFragments=1'
+               ) AS snippet
+        FROM (
+          SELECT q.id, q.exam, q.year, q.subject, q.qtype, q.marks, q.question_text, t.query,
+                 ts_rank_cd(q.search_tsv, t.query) AS score
+          FROM questions q, to_tsquery('english', ?) AS t(query)
+          WHERE q.search_tsv @@ t.query{where_sql}
+          ORDER BY score DESC, q.id
+          LIMIT ? OFFSET ?
+        ) m
+        ORDER BY m.score DESC, m.id
+        """,
+        (tsquery, *params, limit, offset),
+    )
+    return [_hit(r) for r in cur.fetchall()]
+
+
+def _search_sqlite(db, terms, where_sql, params, limit, offset) -> List[Dict[str, Any]]:
+    match = " ".join(f'"{t}"' for t in terms[:-1]) + f' "{terms[-1]}"*'
+    cur = db.cursor()
+    try:
+        cur.execute(
+            f"""
+            SELECT q.id, q.exam, q.year, q.subject, q.qtype, q.marks,
+                   snippet(questions_fts, 1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', 24) AS snippet,
+                   -questions_fts.rank AS score
+            FROM questions_fts
+            JOIN questions q ON q.id = questions_fts.id
+            WHERE questions_fts MATCH ? AND questions_fts.rank MATCH ?{where_sql}
+            ORDER BY questions_fts.rank
+            LIMIT ? OFFSET ?
+            """,
+            (match.strip(), _BM25, *params, limit, offset),
+        )
+    except sqlite3.OperationalError as e:
+        if "questions_fts" not in str(e):
+            raise
+        return _search_like(db, terms, where_sql, params, limit, offset)
+    return [_hit(r) for r in cur.fetchall()]
+
+
+def _search_like(db, terms, where_sql, params, limit, offset) -> List[Dict[str, Any]]:
+    # SQLite without FTS5: unranked substring match on the question text
+    like_sql = "".join(" AND q.question_text LIKE ?" for _ in terms)
+    cur = db.cursor()
+    cur.execute(
+        f"""
+        SELECT q.id, q.exam, q.year, q.subject, q.qtype, q.marks,
+               substr(q.question_text, 1, 160) AS snippet, 0 AS score
+        FROM questions q
+        WHERE 1 = 1{like_sql}{where_sql}
+        ORDER BY COALESCE(q.sort_key, 999999999), q.id
+        LIMIT ? OFFSET ?
+        """,
+        (*[f"%{t}%" for t in terms], *params, limit, offset),
+    )
+    return [_hit(r) for r in cur.fetchall()]
+
+
+def _hit(row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "exam": row["exam"],
+        "year": row["year"],
+        "subject": row["subject"],
+        "type": row["qtype"],
+        "marks": row["marks"],
+        "snippet": row["snippet"],
+        "score": round(float(row["score"] or 0), 4),
+    }
+
+
+if __name__ == "__main__":
+    # Latency benchmark on a synthetic bank (SQLite/FTS5):
+    #   python question_search.py [count]
+    # For Postgres, point DATABASE_URL at a scratch database and run
+    #   python question_search.py --postgres  (searches whatever is loaded there)
+    import os
+    import sys
+    import json
+    import time
+    import random
+    import tempfile
+
+    from db import init_db, get_db
+
+    def pct(samples, p):
+        s = sorted(samples)
+        return s[min(len(s) - 1, int(len(s) * p))] * 1000
+
+    queries = [
+        "gradient curve", "quadratic equation", "simultaneous", "probability", "circle radius",
+        "photosynthesis", "differentiate", "velocity", "matrix determinant", "triangle", "integ",
+    ]
+
+    if "--postgres" in sys.argv:
+        db = get_db()
+    else:
+        os.environ.pop("DATABASE_URL", None)
+        n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+        path = os.path.join(tempfile.mkdtemp(), "search_bench.db")
+        init_db(path)
+        rnd = random.Random(7)
+        topic = (
+            "gradient curve equation quadratic roots simultaneous probability circle radius triangle "
+            "photosynthesis differentiate integrate velocity acceleration matrix determinant sequence"
+        ).split()
+        # Zipf-ish vocabulary: a few very common words, a long tail of rare ones
+        words = "find the value of x given that at point solve".split() + topic + [
+            "".join(rnd.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rnd.randint(4, 10))) for _ in range(20000)
+        ]
+        cum, total = [], 0.0
+        for i in range(len(words)):
+            total += 1 / (i + 1)
+            cum.append(total)
+
+        def sentence(k):
+            return " ".join(rnd.choices(words, cum_weights=cum, k=k)).capitalize() + "."
+
+        db = get_db(path)
+        cur = db.cursor()
+        t0 = time.perf_counter()
+        # rows carry explanations like real ones, but those are deliberately not
+        # indexed (public route), so only question text and options are searched
+        cur.executemany(
+            "INSERT INTO questions (id, exam, year, subject, qtype, sort_key, question_text, options_json, explanation) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    f"Q{i:06d}", rnd.choice(["NECO", "WAEC", "JAMB"]), rnd.randint(2010, 2024),
+                    rnd.choice(["Mathematics", "Physics", "Biology"]), rnd.choice(["objective", "theory"]),
+                    i, sentence(30), json.dumps([{"label": c, "text": sentence(4)} for c in "ABCD"]), sentence(40),
+                )
+                for i in range(n)
+            ),
+        )
+        db.commit()
+        print(f"loaded {n} questions in {time.perf_counter() - t0:.1f}s")
+
+    for filters in ({}, {"exam": "NECO", "year": 2023}):
+        samples = []
+        for _ in range(20):
+            for q in queries:
+                t0 = time.perf_counter()
+                search_questions(db, q, limit=20, **filters)
+                samples.append(time.perf_counter() - t0)
+        print(f"filters={filters or '-'}  p50 {pct(samples, 0.50):7.2f} ms   p99 {pct(samples, 0.99):7.2f} ms")
+    print(search_questions(db, "quadratic roots", limit=1))
+    db.close()
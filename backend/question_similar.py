@@ -0,0 +1,182 @@
+# question_similar.py ("more like this": precomputed nearest questions)
+#
+# Offline job: every question gets a hashed TF-IDF vector (word unigrams +
+# bigrams of question text and options, hashed into SIMILAR_FEATURES
+# columns), and its SIMILAR_TOP_K nearest neighbours by cosine similarity
+# within the same subject are written to the question_similar table:
+#
+#   question_similar(qid, rank, similar_id, score)   PRIMARY KEY (qid, rank)
+#
+# /question/{qid}/similar is then one indexed lookup; nothing is computed
+# per request. A rebuild bumps content_version (as question_topics.py does),
+# so cached neighbour lists and the replica refresh. Rerun after loading
+# questions:
+#   python question_similar.py   or   POST /admin/similar/build
+#
+# NumPy/SciPy are only needed here, not to serve.
+
+import os
+import re
+import json
+import time
+import zlib
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Iterable
+
+from db import get_db
+
+logger = logging.getLogger("exampartner")
+
+SIMILAR_TOP_K = int(os.getenv("SIMILAR_TOP_K", "10"))
+# Hashed feature space (collisions are rare enough at this size to not matter)
+SIMILAR_FEATURES = 1 << int(os.getenv("SIMILAR_FEATURE_BITS", "20"))
+# Neighbours scoring below this are not stored
+SIMILAR_MIN_SCORE = float(os.getenv("SIMILAR_MIN_SCORE", "0.05"))
+# Cells per similarity block (rows x group size), bounds memory per step
+SIMILAR_BLOCK_CELLS = int(os.getenv("SIMILAR_BLOCK_CELLS", str(8 * 1024 * 1024)))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _text(row: Dict[str, Any]) -> str:
+    parts = [row.get("question_text") or ""]
+    try:
+        options = json.loads(row.get("options_json") or "null")
+    except ValueError:
+        options = None
+    if isinstance(options, list):
+        parts += [str(o.get("text", "")) if isinstance(o, dict) else str(o) for o in options]
+    elif isinstance(options, dict):
+        parts += [str(v) for v in options.values()]
+    return " ".join(parts)
+
+
+def _features(text: str) -> Counter:
+    words = _WORD_RE.findall(text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return Counter(zlib.crc32(g.encode("utf-8")) % SIMILAR_FEATURES for g in grams)
+
+
+def tfidf_matrix(texts: List[str]):
+    """L2-normalized hashed TF-IDF rows (scipy CSR, float32)."""
+    import numpy as np
+    from scipy import sparse
+
+    indptr = [0]
+    indices: List[int] = []
+    data: List[float] = []
+    for t in texts:
+        counts = _features(t)
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+
+    X = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(texts), SIMILAR_FEATURES),
+    )
+    X.sum_duplicates()
+    X.data = 1.0 + np.log(X.data)  # sublinear tf
+
+    n = X.shape[0]
+    df = np.bincount(X.indices, minlength=SIMILAR_FEATURES)
+    idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+    X.data *= idf[X.indices]
+
+    norms = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags((1.0 / norms).astype(np.float32)) @ X
+
+
+def top_k_neighbors(X, k: int = SIMILAR_TOP_K, min_score: float = SIMILAR_MIN_SCORE):
+    """
+    For each row of X: (neighbour row indices, scores), best first, self excluded.
+    Cosine similarity computed block by block as sparse products.
+    """
+    import numpy as np
+
+    n = X.shape[0]
+    out = []
+    if n < 2:
+        return [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in range(n)]
+
+    kk = min(k, n - 1)
+    XT = X.T.tocsr()
+    block = max(1, SIMILAR_BLOCK_CELLS // n)
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        S = (X[start:stop] @ XT).toarray()
+        S[np.arange(stop - start), np.arange(start, stop)] = -1.0  # not yourself
+
+        top = np.argpartition(-S, kk - 1, axis=1)[:, :kk]
+        scores = np.take_along_axis(S, top, axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        for i in range(stop - start):
+            keep = scores[i] >= min_score
+            out.append((top[i][keep], scores[i][keep]))
+    return out
+
+
+def compute_similar(rows: Iterable[Dict[str, Any]], k: int = SIMILAR_TOP_K) -> List[tuple]:
+    """(qid, rank, similar_id, score) rows; neighbours are drawn from the same subject only."""
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for r in rows:
+        groups.setdefault(r.get("subject"), []).append(r)
+
+    pairs: List[tuple] = []
+    for group in groups.values():
+        ids = [str(r["id"]) for r in group]
+        X = tfidf_matrix([_text(r) for r in group])
+        for i, (nbrs, scores) in enumerate(top_k_neighbors(X, k)):
+            for rank, (j, s) in enumerate(zip(nbrs.tolist(), scores.tolist()), start=1):
+                pairs.append((ids[i], rank, ids[j], round(float(s), 4)))
+    return pairs
+
+
+def build_similar_table(k: int = SIMILAR_TOP_K) -> Dict[str, Any]:
+    """Recompute question_similar from the questions table (replaced in one transaction)."""
+    t0 = time.perf_counter()
+    db = get_db()
+    try:
+        cur = db.cursor()
+        cur.execute("SELECT id, subject, question_text, options_json FROM questions")
+        rows = cur.fetchall()
+        pairs = compute_similar(rows, k)
+
+        cur.execute("DELETE FROM question_similar")
+        cur.executemany("INSERT INTO question_similar (qid, rank, similar_id, score) VALUES (?, ?, ?, ?)", pairs)
+        # neighbour lists are served content too: move the version so caches/replica refresh
+        cur.execute("UPDATE content_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+        db.commit()
+    finally:
+        db.close()
+
+    secs = round(time.perf_counter() - t0, 2)
+    logger.info("Similar questions built: %s questions, %s pairs in %ss", len(rows), len(pairs), secs)
+    return {"questions": len(rows), "pairs": len(pairs), "seconds": secs}
+
+
+if __name__ == "__main__":
+    # Build step: python question_similar.py
+    # Timing only, on synthetic text: python question_similar.py --bench [count]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if "--bench" in sys.argv:
+        import random
+
+        n = int(sys.argv[-1]) if sys.argv[-1].isdigit() else 20000
+        rnd = random.Random(7)
+        vocab = ["".join(rnd.choice("abcdefghij") for _ in range(5)) for _ in range(5000)]
+        rows = [
+            {"id": f"Q{i}", "subject": ("Mathematics", "Physics")[i % 2], "question_text": " ".join(rnd.choices(vocab, k=40))}
+            for i in range(n)
+        ]
+        t0 = time.perf_counter()
+        pairs = compute_similar(rows)
+        print(f"{n} questions -> {len(pairs)} pairs in {time.perf_counter() - t0:.1f}s")
+    else:
+        print(json.dumps(build_similar_table(), indent=2))
@@ -0,0 +1,249 @@
+# question_stats.py (live per-question attempt statistics)
+#
+# Every question carries attempts / percent correct / average time, for
+# ranking and adaptive practice. None of it is computed with COUNT/AVG on
+# the request path:
+#
+#   question_stats(qid, attempts, correct, time_ms_sum, timed, updated_at)
+#
+# holds running totals. POST /attempts adds the session's graded answers
+# as deltas (one multi-row upsert in the attempt's own transaction), and
+# rollup_question_stats() periodically rebuilds the table from
+# attempt_answers in one GROUP BY, which also repairs any drift.
+#
+# Readers never hit the table per request: each worker keeps a snapshot of
+# it (StatsSnapshot, one SELECT) loaded at startup and reloaded in the
+# background every QUESTION_STATS_TTL_SECONDS, with the numbers also laid out as NumPy
+# columns over the facet index for sorting whole lists. The snapshot also
+# carries the latest IRT calibration (question_irt.py), when there is one.
+#
+#   python question_stats.py   or   POST /admin/stats/rollup
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Optional, Any, Dict, List, Iterable, Tuple
+
+import numpy as np
+
+from db import get_db, _using_postgres
+from question_replica import get_primary_db, primary_degraded, mark_primary_degraded
+
+logger = logging.getLogger("exampartner")
+
+QUESTION_STATS_TTL_SECONDS = int(os.getenv("QUESTION_STATS_TTL_SECONDS", "60"))
+
+# sort option -> (column, descending); questions with no attempts always sort last
+SORTS = {
+    "attempts": ("attempts", False),
+    "-attempts": ("attempts", True),
+    "pct_correct": ("pct_correct", False),
+    "-pct_correct": ("pct_correct", True),
+    "avg_time": ("avg_time_ms", False),
+    "-avg_time": ("avg_time_ms", True),
+}
+# the same orderings in SQL (list fallback without the index); `s` = question_stats
+SQL_SORTS = {
+    "attempts": "s.attempts",
+    "pct_correct": "1.0 * s.correct / s.attempts",
+    "avg_time": "1.0 * s.time_ms_sum / NULLIF(s.timed, 0)",
+}
+
+
+# -----------------------------
+# Writes
+# -----------------------------
+def add_deltas(cur, graded: Iterable[Tuple[str, int, Optional[int]]]) -> int:
+    """
+    Fold graded answers (qid, correct 0/1, time_ms) into the running totals.
+    Runs on the caller's cursor/transaction. Rows are upserted in qid order
+    so concurrent sessions lock them in the same order (no deadlocks).
+    """
+    totals: Dict[str, List[int]] = {}
+    for qid, correct, time_ms in graded:
+        t = totals.setdefault(qid, [0, 0, 0, 0])
+        t[0] += 1
+        t[1] += 1 if correct else 0
+        if time_ms is not None:
+            t[2] += int(time_ms)
+            t[3] += 1
+    if not totals:
+        return 0
+
+    qids = sorted(totals)
+    cur.execute(
+        "INSERT INTO question_stats (qid, attempts, correct, time_ms_sum, timed) VALUES "
+        + ",".join("(?, ?, ?, ?, ?)" for _ in qids)
+        + """
+        ON CONFLICT (qid) DO UPDATE SET
+          attempts = question_stats.attempts + excluded.attempts,
+          correct = question_stats.correct + excluded.correct,
+          time_ms_sum = question_stats.time_ms_sum + excluded.time_ms_sum,
+          timed = question_stats.timed + excluded.timed,
+          updated_at = CURRENT_TIMESTAMP
+        """,
+        tuple(v for q in qids for v in (q, *totals[q])),
+    )
+    return len(qids)
+
+
+def rollup_question_stats() -> Dict[str, Any]:
+    """Rebuild question_stats from attempt_answers (one transaction)."""
+    t0 = time.perf_counter()
+    db = get_db()
+    try:
+        cur = db.cursor()
+        if _using_postgres():
+            # attempts committing meanwhile wait here and add their deltas on top
+            cur.execute("LOCK TABLE question_stats IN EXCLUSIVE MODE")
+        cur.execute("DELETE FROM question_stats")
+        cur.execute(
+            """
+            INSERT INTO question_stats (qid, attempts, correct, time_ms_sum, timed)
+            SELECT qid, COUNT(*), SUM(correct), COALESCE(SUM(time_ms), 0), COUNT(time_ms)
+            FROM attempt_answers
+            WHERE correct IS NOT NULL
+            GROUP BY qid
+            """
+        )
+        cur.execute("SELECT COUNT(*) AS n, COALESCE(SUM(attempts), 0) AS a FROM question_stats")
+        row = cur.fetchone()
+        db.commit()
+    finally:
+        db.close()
+
+    secs = round(time.perf_counter() - t0, 2)
+    out = {"questions": int(row["n"]), "attempts": int(row["a"]), "seconds": secs}
+    logger.info("Question stats rolled up: %s questions, %s graded answers in %ss", out["questions"], out["attempts"], secs)
+    return out
+
+
+# -----------------------------
+# Reads (per-worker snapshot)
+# -----------------------------
+class StatsSnapshot:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.by_qid: Dict[str, Tuple[int, int, int, int]] = {
+            str(r["qid"]): (int(r["attempts"]), int(r["correct"]), int(r["time_ms_sum"]), int(r["timed"]))
+            for r in rows
+            if r.get("attempts")
+        }
+        self.irt: Dict[str, Tuple[float, float]] = {
+            str(r["qid"]): (float(r["difficulty"]), float(r["discrimination"]))
+            for r in rows
+            if r.get("difficulty") is not None
+        }
+        # cheap fingerprint for cache keys: moves whenever any total does
+        sums = [0, 0, 0, 0]
+        for t in self.by_qid.values():
+            for i in range(4):
+                sums[i] += t[i]
+        self.stamp = (len(self.by_qid), *sums, len(self.irt), round(sum(d for d, _ in self.irt.values()), 6))
+        self._columns: Optional[Tuple[List[str], Dict[str, np.ndarray]]] = None
+
+    def get(self, qid: str) -> Optional[Dict[str, Any]]:
+        t = self.by_qid.get(qid)
+        if t is None:
+            return None
+        attempts, correct, time_sum, timed = t
+        out = {
+            "attempts": attempts,
+            "pct_correct": round(100.0 * correct / attempts, 1),
+            "avg_time_ms": round(time_sum / timed) if timed else None,
+        }
+        irt = self.irt.get(qid)
+        if irt is not None:
+            out["difficulty"], out["discrimination"] = round(irt[0], 3), round(irt[1], 3)
+        return out
+
+    def columns(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """attempts / pct_correct / avg_time_ms aligned with `ids` (NaN = no data); cached per id list."""
+        if self._columns is not None and self._columns[0] is ids:
+            return self._columns[1]
+
+        raw = np.zeros((len(ids), 4), dtype=np.float64)
+        for i, qid in enumerate(ids):
+            t = self.by_qid.get(qid)
+            if t is not None:
+                raw[i] = t
+        attempts, correct, time_sum, timed = raw.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cols = {
+                "attempts": np.where(attempts > 0, attempts, np.nan),
+                "pct_correct": np.where(attempts > 0, correct / attempts, np.nan),
+                "avg_time_ms": np.where(timed > 0, time_sum / timed, np.nan),
+            }
+        self._columns = (ids, cols)  # one index at a time
+        return cols
+
+    def order(self, ids: List[str], positions, sort: str) -> np.ndarray:
+        """`positions` (list order) re-ordered by `sort`; ties and no-data rows keep list order."""
+        column, desc = SORTS[sort]
+        pos = np.asarray(positions, dtype=np.int64)
+        values = self.columns(ids)[column][pos]
+        keys = -values if desc else values
+        # NaN sorts last with a stable argsort, either direction
+        return pos[np.argsort(keys, kind="stable")]
+
+
+_snapshot = StatsSnapshot([])
+_snapshot_at: Optional[float] = None
+_refreshing = threading.Lock()
+
+
+def refresh_stats_snapshot() -> bool:
+    """
+    Reload the snapshot now (connect and query bounded like request-path reads).
+    Skipped while the primary is degraded; on errors the old snapshot is kept.
+    """
+    global _snapshot, _snapshot_at
+    if primary_degraded():
+        return False
+    try:
+        db = get_primary_db()
+        try:
+            cur = db.cursor()
+            cur.execute(
+                """
+                SELECT s.qid, s.attempts, s.correct, s.time_ms_sum, s.timed, i.difficulty, i.discrimination
+                FROM question_stats s
+                LEFT JOIN question_irt i ON i.qid = s.qid
+                """
+            )
+            _snapshot = StatsSnapshot(cur.fetchall())
+            _snapshot_at = time.monotonic()
+        finally:
+            db.close()
+    except Exception:
+        logger.exception("Question stats load failed; keeping the previous snapshot")
+        mark_primary_degraded()
+        return False
+    return True
+
+
+def _refresh_in_background() -> None:
+    try:
+        refresh_stats_snapshot()
+    finally:
+        _refreshing.release()
+
+
+def stats_snapshot() -> StatsSnapshot:
+    """
+    Current snapshot, without waiting: once it is QUESTION_STATS_TTL_SECONDS
+    old, one background thread reloads it and callers keep the old one meanwhile.
+    """
+    global _snapshot_at
+    now = time.monotonic()
+    if (_snapshot_at is None or now - _snapshot_at >= QUESTION_STATS_TTL_SECONDS) and _refreshing.acquire(blocking=False):
+        _snapshot_at = now
+        threading.Thread(target=_refresh_in_background, name="question-stats-refresh", daemon=True).start()
+    return _snapshot
+
+
+if __name__ == "__main__":
+    # Periodic roll-up (cron): python question_stats.py
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(rollup_question_stats(), indent=2))
@@ -0,0 +1,145 @@
+# question_topics.py (syllabus topic tags via Aho-Corasick)
+#
+# Topics come from a syllabus dictionary (SYLLABUS_PATH, JSON):
+#
+#   {"Mathematics": {"Quadratic equations": ["quadratic", "discriminant", ...], ...},
+#    "*": {...topics for every subject...}}
+#
+# Each subject's keywords are compiled into one Aho-Corasick automaton, so
+# a question's text is scanned once no matter how many keywords there are.
+# Matches must sit on word boundaries and are case-insensitive.
+#
+# Tags are computed in bulk (never per request) and stored in
+#   question_topics(qid, topic)   PRIMARY KEY (qid, topic), index (topic, qid)
+# The run bumps the content version, so list caches, the facet index and
+# the replica pick the new tags up.
+#
+#   python question_topics.py   or   POST /admin/topics/build
+
+import os
+import json
+import time
+import logging
+from collections import deque
+from pathlib import Path
+from typing import Optional, Any, Dict, List, Iterable, Set, Tuple
+
+from db import get_db
+
+logger = logging.getLogger("exampartner")
+
+SYLLABUS_PATH = os.getenv("SYLLABUS_PATH", str(Path(__file__).resolve().parent / "syllabus_topics.json"))
+ALL_SUBJECTS = "*"
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton: every (keyword -> topic) hit in one pass over the text."""
+
+    def __init__(self, keywords: Dict[str, str]):
+        # node = index into these lists; node 0 is the root
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]  # (keyword length, topic)
+
+        for kw, topic in keywords.items():
+            kw = kw.lower().strip()
+            if not kw:
+                continue
+            node = 0
+            for ch in kw:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(kw), topic))
+
+        # failure links, breadth first; outputs inherit their fail node's
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def topics(self, text: str) -> Set[str]:
+        text = (text or "").lower()
+        found: Set[str] = set()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, topic in out[node]:
+                start = i - length + 1
+                # whole words only ("sin" must not match "single")
+                if (start == 0 or not text[start - 1].isalnum()) and (i + 1 == len(text) or not text[i + 1].isalnum()):
+                    found.add(topic)
+        return found
+
+
+def load_syllabus(path: Optional[str] = None) -> Dict[str, Dict[str, List[str]]]:
+    with open(path or SYLLABUS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_matchers(syllabus: Dict[str, Dict[str, List[str]]]) -> Dict[str, KeywordMatcher]:
+    """One matcher per subject (subject-specific topics + the "*" ones); "*" alone for other subjects."""
+    shared = {kw: topic for topic, kws in syllabus.get(ALL_SUBJECTS, {}).items() for kw in kws}
+    matchers = {ALL_SUBJECTS: KeywordMatcher(shared)}
+    for subject, topics in syllabus.items():
+        if subject == ALL_SUBJECTS:
+            continue
+        keywords = dict(shared)
+        keywords.update({kw: topic for topic, kws in topics.items() for kw in kws})
+        matchers[subject] = KeywordMatcher(keywords)
+    return matchers
+
+
+def tag_rows(rows: Iterable[Dict[str, Any]], matchers: Dict[str, KeywordMatcher]) -> List[Tuple[str, str]]:
+    """(qid, topic) pairs for `rows` (id, subject, question_text)."""
+    pairs: List[Tuple[str, str]] = []
+    for r in rows:
+        m = matchers.get(r.get("subject") or "") or matchers[ALL_SUBJECTS]
+        pairs.extend((str(r["id"]), t) for t in sorted(m.topics(r.get("question_text") or "")))
+    return pairs
+
+
+def build_question_topics(syllabus_path: Optional[str] = None) -> Dict[str, Any]:
+    """Re-tag every question and replace question_topics in one transaction."""
+    t0 = time.perf_counter()
+    matchers = build_matchers(load_syllabus(syllabus_path))
+
+    db = get_db()
+    try:
+        cur = db.cursor()
+        cur.execute("SELECT id, subject, question_text FROM questions")
+        rows = cur.fetchall()
+        pairs = tag_rows(rows, matchers)
+
+        cur.execute("DELETE FROM question_topics")
+        cur.executemany("INSERT INTO question_topics (qid, topic) VALUES (?, ?)", pairs)
+        # tags are list content too: move the version so caches/index/replica refresh
+        cur.execute("UPDATE content_version SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+        db.commit()
+    finally:
+        db.close()
+
+    secs = round(time.perf_counter() - t0, 2)
+    tagged = len({q for q, _ in pairs})
+    logger.info("Question topics built: %s of %s questions tagged, %s tags in %ss", tagged, len(rows), len(pairs), secs)
+    return {"questions": len(rows), "tagged": tagged, "tags": len(pairs), "seconds": secs}
+
+
+if __name__ == "__main__":
+    # Build step: python question_topics.py
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(build_question_topics(), indent=2))
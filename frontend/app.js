@@ -32,6 +32,11 @@ let currentListIds = [];      // IDs from the current rendered list
 let currentIndex = -1;        // index of activeQuestionId within currentListIds
 let selectedOptionKey = null; // visual-only option highlight
 
+// Prefetched questions for Prev/Next (filled via /questions/batch)
+const PREFETCH_AHEAD = 3;
+const QUESTION_CACHE_MAX = 60;
+const questionCache = new Map(); // id -> question
+
 function highlightQuestionCard(qid) {
   const items = document.querySelectorAll(".item");
   items.forEach((el) => {
@@ -86,13 +91,46 @@ function renderDiagrams(diagrams) {
   box.innerHTML = "";
   if (!diagrams || !diagrams.length) return;
 
-  for (const name of diagrams) {
+  const base = apiBaseNoSlash();
+  for (const d of diagrams) {
+    // older payloads: plain file names; now {name, url, sources}
+    const name = typeof d === "string" ? d : d.name;
+    const url = typeof d === "string" ? `/static/diagrams/${encodeURIComponent(d)}` : d.url;
+
     const img = document.createElement("img");
     img.loading = "lazy";
     img.alt = name;
     img.className = "diagram-img";
-    img.src = `${apiBaseNoSlash()}/static/diagrams/${encodeURIComponent(name)}`;
-    box.appendChild(img);
+    img.src = `${base}${url}`;
+
+    // ✅ reserve the box up front and paint the blurred preview until the image loads
+    if (typeof d === "object" && d.width && d.height) {
+      img.width = d.width;
+      img.height = d.height;
+    }
+    if (typeof d === "object" && d.placeholder) {
+      img.style.backgroundImage = `url("${d.placeholder}")`;
+      img.style.backgroundSize = "cover";
+      img.addEventListener("load", () => { img.style.backgroundImage = ""; }, { once: true });
+    }
+
+    // ✅ WebP/AVIF at the right width; offline, only the original is cached
+    const sources = (typeof d === "object" && d.sources) || [];
+    if (!sources.length || !navigator.onLine) {
+      box.appendChild(img);
+      continue;
+    }
+
+    const pic = document.createElement("picture");
+    for (const s of sources) {
+      const source = document.createElement("source");
+      source.type = s.type;
+      source.srcset = s.srcset.split(", ").map((part) => `${base}${part}`).join(", ");
+      source.sizes = "(max-width: 720px) 100vw, 720px";
+      pic.appendChild(source);
+    }
+    pic.appendChild(img);
+    box.appendChild(pic);
   }
 }
 function scrollToExplainBox() {
@@ -378,6 +416,53 @@ async function api(path, opts = {}) {
   return body || { ok: true };
 }
 
+// ====== Bootstrap (one round trip at app start) ======
+// /bootstrap answers /health, /me, /filters, /founding/status and
+// /payments/public-key together; each part is consumed once below.
+const boot = {
+  filtersQuery: null,
+  filters: null,
+  meToken: null,
+  me: null,
+  publicKey: null,
+};
+
+async function loadBootstrap({ qtype = null } = {}) {
+  const qs = filtersQuery({ qtype });
+  const r = await api(`/bootstrap${qs ? `?${qs}` : ""}`, { method: "GET" });
+  if (!r?.ok) return;
+
+  boot.filtersQuery = qs;
+  boot.filters = r.filters || null;
+  boot.meToken = state.token;
+  boot.me = r.me || null;
+  boot.publicKey = r.paystack_public_key || null;
+
+  if (state.devMode && r.health?.ok) setStatus(`Connected: ${r.health.service}`, "ok");
+}
+
+// ====== Offline papers (service worker) ======
+async function registerServiceWorker() {
+  if (!("serviceWorker" in navigator)) return;
+  try {
+    await navigator.serviceWorker.register("./sw.js");
+  } catch (e) {
+    console.warn("Service worker registration failed:", e);
+  }
+}
+
+// Paid users: ask the service worker to fetch new/changed paper bundles
+// (names are content-hashed, so unchanged papers are not downloaded again).
+async function syncOfflineBundles() {
+  if (!state.isPaid || !state.token || !("serviceWorker" in navigator)) return;
+  try {
+    const reg = await navigator.serviceWorker.ready;
+    reg.active?.postMessage({ type: "sync-bundles", apiBase: state.apiBase, token: state.token });
+  } catch (e) {
+    console.warn("Offline bundle sync failed:", e);
+  }
+}
+
 // ====== Filters ======
 function fillSelect(el, values) {
   el.innerHTML = "";
@@ -420,19 +505,28 @@ function loadFilterCache() {
 }
 
 
-async function fetchFilters({ qtype = null, exam = null, year = null } = {}) {
+function filtersQuery({ qtype = null, exam = null, year = null } = {}) {
   const params = new URLSearchParams();
   if (qtype) params.set("qtype", qtype);
   if (exam) params.set("exam", exam);
   if (year !== null && year !== undefined && year !== "") {
     params.set("year", String(year));
   }
+  return params.toString();
+}
 
-  const qs = params.toString();
+async function fetchFilters({ qtype = null, exam = null, year = null } = {}) {
+  const qs = filtersQuery({ qtype, exam, year });
   const path = `/filters${qs ? `?${qs}` : ""}`;
 
   try {
-    const r = await api(path, { method: "GET" });
+    // ✅ first call at start is usually already answered by /bootstrap
+    let r = null;
+    if (boot.filters && boot.filtersQuery === qs) {
+      r = boot.filters;
+      boot.filters = null;
+    }
+    if (!r) r = await api(path, { method: "GET" });
 
     // Expect { ok: true, exams, years, subjects }
     if (r?.ok && Array.isArray(r.exams)) {
@@ -672,7 +766,7 @@ if (!items || !items.length) {
          ${q.type ? `<span class="pill">${escapeHtml(q.type)}</span>` : ""}
        </div>
 
-    <div class="qtext">${escapeHtml(trimText(q.question_text, 140))}</div>
+    <div class="qtext">${escapeHtml(trimText(q.stem ?? q.question_text, 140))}</div>
 
   <div class="meta">${escapeHtml(meta.join(" • "))}</div>
 `;
@@ -714,10 +808,14 @@ async function openQuestion(id) {
       ensureActiveCardVisibleInList(id);
     });
 
-    const q = await api(`/question/${encodeURIComponent(id)}`);
+    const q = questionCache.get(id) || await api(`/question/${encodeURIComponent(id)}`);
+    if (q?.ok === false) throw new Error(q.error || "Request failed");
+    cacheQuestion(q);
+    prefetchQuestions(currentIndex);
 
     // ✅ Keep current question in state so Reveal/Explain (wired once in init) can use it
     state.currentQuestion = q;
+    state.currentSolution = null; // fetched on first Reveal/Explain
 
     els("viewer").hidden = false;
     els("qTitle").textContent = id;
@@ -737,7 +835,7 @@ async function openQuestion(id) {
     if (q.subject) tag.push(q.subject);
     if (tag.length) meta.push(tag.join(" "));
 
-    if (q.diagrams && q.diagrams.length) meta.push(`diagrams: ${q.diagrams.join(", ")}`);
+    if (q.diagrams && q.diagrams.length) meta.push(`diagrams: ${q.diagrams.map((d) => d?.name ?? d).join(", ")}`);
 
     els("qMeta").textContent = meta.join(" • ");
 
@@ -825,6 +923,30 @@ async function openQuestion(id) {
 }
 
 
+function cacheQuestion(q) {
+  if (!q?.id) return;
+  questionCache.delete(q.id);
+  questionCache.set(q.id, q);
+  while (questionCache.size > QUESTION_CACHE_MAX) {
+    questionCache.delete(questionCache.keys().next().value);
+  }
+}
+
+// Fetch the next few questions of the list in ONE request so Next is instant
+async function prefetchQuestions(fromIndex) {
+  if (fromIndex < 0) return;
+  const ids = currentListIds
+    .slice(fromIndex + 1, fromIndex + 1 + PREFETCH_AHEAD)
+    .filter((qid) => !questionCache.has(qid));
+  if (!ids.length) return;
+
+  const r = await api(`/questions/batch?ids=${ids.map(encodeURIComponent).join(",")}`);
+  if (!Array.isArray(r?.items)) return;
+  for (const item of r.items) {
+    if (!item.error) cacheQuestion(item);
+  }
+}
+
 function closeViewer() {
   els("viewer").hidden = true;
   setViewerOpen(false);
@@ -919,7 +1041,10 @@ function updatePayEmailUI() {
 
   const wasPaid = !!state.isPaid;
 
-  const r = await api("/me");
+  let r = null;
+  if (boot.me && boot.meToken === state.token) r = boot.me;
+  boot.me = null;
+  if (!r) r = await api("/me");
 
   if (r?.identifier) {
     state.authenticated = true;
@@ -934,6 +1059,7 @@ function updatePayEmailUI() {
     const nowPaid = !!r.is_paid;
     state.isPaid = nowPaid;
     setPaidChip(nowPaid);
+    syncOfflineBundles();
 
     const btnLogout = els("btnLogout");
     if (btnLogout) btnLogout.hidden = false;
@@ -1112,7 +1238,8 @@ async function loadList(targetPageIndex = state.pageIndex) {
   setListPagerUI({ loading: true });
 
   const filterQs = buildFilterQuery();
-  const r = await api(`/questions/${mode}?limit=${limit}&offset=${offset}${filterQs}`);
+  // ✅ summary view: list cards only need the stem and their meta-line fields; openQuestion fetches the full item
+  const r = await api(`/questions/${mode}?limit=${limit}&offset=${offset}&view=summary${filterQs}`);
 
 
   // Paywall: show ONLY after user has attempted to load questions
@@ -1199,6 +1326,8 @@ function updateUpgradeUI() {
 
 
 async function getPaystackPublicKeyOrThrow() {
+  if (boot.publicKey && boot.publicKey.startsWith("pk_")) return boot.publicKey;
+
   const r = await api("/payments/public-key", { method: "GET" });
   if (!r?.ok) throw new Error(r?.error || "Failed to get Paystack public key");
   if (!r.public_key || typeof r.public_key !== "string" || !r.public_key.startsWith("pk_")) {
@@ -1491,6 +1620,23 @@ function adminClearAuditBox() {
   box.hidden = true;
 }
 
+// ====== Solutions (loaded on demand) ======
+async function loadSolution(q) {
+  if (state.currentSolution && state.currentSolution.id === q.id) return state.currentSolution;
+
+  const r = await api(`/question/${encodeURIComponent(q.id)}/solution`);
+  if (r?.ok === false) return r;
+
+  // ignore late responses for a question the user already left
+  if (state.currentQuestion?.id === q.id) state.currentSolution = r;
+  return r;
+}
+
+function solutionErrorHtml(r) {
+  if (r?.status === 402) return `<div>Answers and solutions for this question are for paid users. Upgrade to continue.</div>`;
+  return `<div>Could not load the solution: ${escapeHtml(String(r?.error || "unknown error"))}</div>`;
+}
+
 // ====== Init ======
 async function init() {
   els("yr").textContent = new Date().getFullYear();
@@ -1498,6 +1644,7 @@ async function init() {
 
   // ✅ used by Reveal/Explain handlers (wired once)
   state.currentQuestion = null;
+  state.currentSolution = null;
 
   // Dev mode: only when URL has ?dev=1 (so normal local testing can still be "user mode")
   const devMode = isDev;
@@ -1540,6 +1687,8 @@ async function init() {
   const apiBaseEl = els("apiBase");
   if (apiBaseEl) apiBaseEl.value = state.apiBase;
 
+  registerServiceWorker();
+  await loadBootstrap({ qtype: els("mode")?.value || "objective" });
   await initFiltersUI();
 
   const modeEl = els("mode");
@@ -1636,17 +1785,26 @@ async function init() {
   // ✅ D) Wire Reveal/Explain ONCE here (uses state.currentQuestion)
   const btnReveal = els("btnReveal");
   if (btnReveal) {
-    btnReveal.onclick = () => {
+    btnReveal.onclick = async () => {
       const q = state.currentQuestion;
       if (!q) return;
 
       const exp = els("qExplain");
       if (!exp) return;
 
+      const sol = await loadSolution(q);
+      if (state.currentQuestion !== q) return;
+
       exp.hidden = false;
 
+      if (sol?.ok === false) {
+        exp.innerHTML = solutionErrorHtml(sol);
+        scrollToExplainBox();
+        return;
+      }
+
       // Prefer main answer; if missing (common in theory), still show something sensible
-      const ans = q.answer ? escapeHtml(String(q.answer)) : "—";
+      const ans = sol.answer ? escapeHtml(String(sol.answer)) : "—";
 
       // If theory has sub-questions, reveal can also show their answers (if present)
       const subAnswers = (items) => {
@@ -1674,8 +1832,8 @@ async function init() {
 
       const pieces = [];
       pieces.push(`<div><b>Answer:</b> ${ans}</div>`);
-      if (q.sub_questions) {
-        const sa = subAnswers(q.sub_questions);
+      if (sol.sub_questions) {
+        const sa = subAnswers(sol.sub_questions);
         if (sa) pieces.push(`<div style="margin-top:10px;"><b>Sub-question answers:</b>${sa}</div>`);
       }
 
@@ -1686,28 +1844,37 @@ async function init() {
 
   const btnExplain = els("btnExplain");
   if (btnExplain) {
-    btnExplain.onclick = () => {
+    btnExplain.onclick = async () => {
       const q = state.currentQuestion;
       if (!q) return;
 
       const exp = els("qExplain");
       if (!exp) return;
 
+      const sol = await loadSolution(q);
+      if (state.currentQuestion !== q) return;
+
       exp.hidden = false;
 
+      if (sol?.ok === false) {
+        exp.innerHTML = solutionErrorHtml(sol);
+        scrollToExplainBox();
+        return;
+      }
+
       const pieces = [];
 
-      if (q.explanation) {
-        pieces.push(`<div><b>Explanation:</b><br>${escapeHtml(q.explanation)}</div>`);
+      if (sol.explanation) {
+        pieces.push(`<div><b>Explanation:</b><br>${escapeHtml(sol.explanation)}</div>`);
       }
 
-      if (q.solution_steps) {
-        pieces.push(`<div><b>Steps:</b>${renderSolutionSteps(q.solution_steps)}</div>`);
+      if (sol.solution_steps) {
+        pieces.push(`<div><b>Steps:</b>${renderSolutionSteps(sol.solution_steps)}</div>`);
       }
 
       // For theory, this shows full tree (including answer/explanation inside subquestions)
-      if (q.sub_questions) {
-        pieces.push(`<div><b>Sub-questions:</b>${renderSubQuestions(q.sub_questions)}</div>`);
+      if (sol.sub_questions) {
+        pieces.push(`<div><b>Sub-questions:</b>${renderSubQuestions(sol.sub_questions)}</div>`);
       }
 
       exp.innerHTML = pieces.length ? pieces.join("<hr/>") : `<div>No explanation/steps available.</div>`;
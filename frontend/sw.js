@@ -1,15 +1,23 @@
-
-const CACHE_NAME = "ExamPartner v20";
+const CACHE_NAME = "ExamPartner v28";
 const ASSETS = [
   "./",
   "./index.html",
   "./styles.css",
-  "./app.js?v=20",
+  "./app.js?v=28",
   "./manifest.json",
   "./icons/icon-192.png",
   "./icons/icon-512.png",
 ];
 
+// Offline paper bundles (paid): kept across app versions, synced from /bundles/manifest
+const BUNDLE_CACHE = "ExamPartner bundles";
+const BUNDLE_MANIFEST_KEY = "./offline-manifest.json";
+
+// API runtime cache: /filters, /question/{id}, list pages (stale-while-revalidate)
+const RUNTIME_CACHE = "ExamPartner api";
+const RUNTIME_MAX_ENTRIES = 300;
+const VERSION_HEADER = "X-Content-Version";
+
 self.addEventListener("install", (event) => {
   event.waitUntil(
     caches
@@ -22,16 +30,267 @@ self.addEventListener("install", (event) => {
 self.addEventListener("activate", (event) => {
   event.waitUntil(
     caches.keys().then((keys) =>
-      Promise.all(keys.map((k) => (k !== CACHE_NAME ? caches.delete(k) : null)))
+      Promise.all(keys.map((k) => (![CACHE_NAME, BUNDLE_CACHE, RUNTIME_CACHE].includes(k) ? caches.delete(k) : null)))
     ).then(() => self.clients.claim())
   );
 });
 
+// ====== Bundle sync (incremental: bundle names are content-hashed) ======
+let bundleSync = null;
+let bundleIds = null; // qid -> bundle url, built on first offline lookup
+let paperUrls = null; // "exam|year|subject|qtype" -> bundle url
+const bundleMemo = new Map();
+
+function paperKey(exam, year, subject, qtype) {
+  return [exam, year, subject, qtype].map((v) => String(v ?? "")).join("|");
+}
+
+async function syncBundles(apiBase, token) {
+  const base = String(apiBase || "").replace(/\/$/, "");
+  const headers = token ? { Authorization: `Bearer ${token}` } : {};
+
+  const res = await fetch(`${base}/bundles/manifest`, { headers, cache: "no-store" });
+  if (!res.ok) return;
+  const manifest = await res.json();
+
+  const cache = await caches.open(BUNDLE_CACHE);
+  const keep = new Set();
+
+  for (const b of manifest.bundles || []) {
+    const url = `${base}/bundles/${b.file}`;
+    keep.add(url);
+    if (!(await cache.match(url))) {
+      const r = await fetch(url, { headers });
+      if (r.ok) await cache.put(url, r);
+    }
+
+    for (const name of b.diagrams || []) {
+      const durl = `${base}/static/diagrams/${encodeURIComponent(name)}`;
+      keep.add(durl);
+      if (await cache.match(durl)) continue;
+      try {
+        const d = await fetch(durl);
+        if (d.ok) await cache.put(durl, d);
+      } catch {
+        // diagrams are best-effort; the question still works without them
+      }
+    }
+  }
+
+  // drop papers (and diagrams) no longer in the manifest
+  for (const req of await cache.keys()) {
+    if (!keep.has(req.url) && !req.url.endsWith("/offline-manifest.json")) await cache.delete(req);
+  }
+
+  await cache.put(
+    BUNDLE_MANIFEST_KEY,
+    new Response(JSON.stringify({ base, bundles: manifest.bundles || [] }), {
+      headers: { "Content-Type": "application/json" },
+    })
+  );
+  bundleIds = null;
+  paperUrls = null;
+  bundleMemo.clear();
+}
+
+self.addEventListener("message", (event) => {
+  const msg = event.data || {};
+  if (msg.type !== "sync-bundles" || bundleSync) return;
+  bundleSync = syncBundles(msg.apiBase, msg.token)
+    .catch(() => null)
+    .finally(() => { bundleSync = null; });
+  event.waitUntil(bundleSync);
+});
+
+// ====== Offline answers from bundles ======
+async function readBundle(url) {
+  if (bundleMemo.has(url)) return bundleMemo.get(url);
+  const cache = await caches.open(BUNDLE_CACHE);
+  const r = await cache.match(url);
+  const bundle = r ? await r.json() : null;
+  if (bundleMemo.size >= 8) bundleMemo.delete(bundleMemo.keys().next().value);
+  bundleMemo.set(url, bundle);
+  return bundle;
+}
+
+async function loadPapers() {
+  if (paperUrls) return true;
+  const cache = await caches.open(BUNDLE_CACHE);
+  const m = await cache.match(BUNDLE_MANIFEST_KEY);
+  if (!m) return false;
+  const manifest = await m.json();
+  paperUrls = new Map();
+  for (const b of manifest.bundles || []) {
+    paperUrls.set(paperKey(b.exam, b.year, b.subject, b.qtype), `${manifest.base}/bundles/${b.file}`);
+  }
+  return true;
+}
+
+async function bundleForId(qid) {
+  if (!(await loadPapers())) return null;
+  if (!bundleIds) {
+    bundleIds = new Map();
+    for (const url of paperUrls.values()) {
+      const b = await readBundle(url);
+      for (const q of b?.questions || []) bundleIds.set(q.id, url);
+    }
+  }
+  const url = bundleIds.get(qid);
+  return url ? readBundle(url) : null;
+}
+
+function jsonResponse(body) {
+  return new Response(JSON.stringify(body), {
+    headers: { "Content-Type": "application/json", "X-Offline": "1" },
+  });
+}
+
+async function offlineAnswer(url) {
+  const path = url.pathname;
+  let m;
+
+  if ((m = path.match(/\/questions\/(objective|theory)$/))) {
+    if (!(await loadPapers())) return null;
+    const p = url.searchParams;
+    const bundleUrl = paperUrls.get(paperKey(p.get("exam"), p.get("year"), p.get("subject"), m[1]));
+    const b = bundleUrl ? await readBundle(bundleUrl) : null;
+    if (!b) return null;
+    const limit = parseInt(p.get("limit") || "20", 10);
+    const offset = parseInt(p.get("offset") || "0", 10);
+    let items = b.questions.slice(offset, offset + limit);
+    if (p.get("view") === "summary") {
+      items = items.map((q) => ({
+        id: q.id, exam: q.exam, year: q.year, subject: q.subject, paper: q.paper, section: q.section,
+        type: q.type, page: q.page, marks: q.marks, stem: String(q.question_text || "").slice(0, 160),
+      }));
+    }
+    return jsonResponse({ items, limit, offset });
+  }
+
+  if ((m = path.match(/\/question\/([^/]+)(\/solution)?$/))) {
+    const qid = decodeURIComponent(m[1]);
+    const b = await bundleForId(qid);
+    const list = m[2] ? b?.solutions : b?.questions;
+    const item = (list || []).find((x) => x.id === qid);
+    return item ? jsonResponse(item) : null;
+  }
+
+  if (path.endsWith("/questions/batch")) {
+    const ids = (url.searchParams.get("ids") || "").split(",").map((s) => s.trim()).filter(Boolean);
+    const items = [];
+    for (const qid of ids) {
+      const b = await bundleForId(qid);
+      items.push((b?.questions || []).find((x) => x.id === qid) || { id: qid, error: "not_found" });
+    }
+    return jsonResponse({ items });
+  }
+
+  return null;
+}
+
+// ====== Runtime cache (stale-while-revalidate, versioned by X-Content-Version) ======
+const RUNTIME_API = /\/(filters|questions\/(objective|theory)|question\/[^/]+)$/;
+
+let latestVersion = 0; // highest content version any response has reported
+const userTags = new Map(); // Authorization header -> short hash
+
+function responseVersion(res) {
+  return parseInt(res?.headers.get(VERSION_HEADER) || "0", 10) || 0;
+}
+
+async function userTag(req) {
+  // free and paid users see different pages: keep their copies apart
+  const auth = req.headers.get("Authorization") || "";
+  if (!auth) return "";
+  if (!userTags.has(auth)) {
+    const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(auth));
+    const hex = [...new Uint8Array(digest)].slice(0, 8).map((b) => b.toString(16).padStart(2, "0")).join("");
+    userTags.clear();
+    userTags.set(auth, hex);
+  }
+  return userTags.get(auth);
+}
+
+async function runtimeKey(req) {
+  const url = new URL(req.url);
+  url.searchParams.set("__u", await userTag(req));
+  url.searchParams.set("__a", req.headers.get("Accept") || "");
+  return url.toString();
+}
+
+async function trimRuntimeCache(cache) {
+  // keys() is in insertion order and entries are re-put on refresh, so the front is the oldest
+  const keys = await cache.keys();
+  for (let i = 0; i < keys.length - RUNTIME_MAX_ENTRIES; i++) await cache.delete(keys[i]);
+}
+
+async function revalidate(req, key) {
+  const res = await fetch(req);
+  if (res.ok) {
+    latestVersion = Math.max(latestVersion, responseVersion(res));
+    const cache = await caches.open(RUNTIME_CACHE);
+    await cache.delete(key);
+    await cache.put(key, res.clone());
+    await trimRuntimeCache(cache);
+  }
+  return res;
+}
+
+async function runtimeFetch(event, url) {
+  const req = event.request;
+  const key = await runtimeKey(req);
+  const cache = await caches.open(RUNTIME_CACHE);
+  const cached = await cache.match(key);
+
+  // a copy older than content we have already seen is not served
+  if (cached && responseVersion(cached) >= latestVersion) {
+    event.waitUntil(revalidate(req, key).catch(() => null));
+    return cached;
+  }
+
+  try {
+    return await revalidate(req, key);
+  } catch {
+    if (cached) return cached; // offline: stale beats nothing
+    const offline = await offlineAnswer(url).catch(() => null);
+    return offline || new Response("", { status: 504, statusText: "Offline" });
+  }
+}
+
+const QUESTION_API = /\/(questions\/(objective|theory|batch)|question\/[^/]+(\/solution)?)$/;
+
 self.addEventListener("fetch", (event) => {
   const req = event.request;
 
   if (req.method !== "GET") return;
 
+  const url = new URL(req.url);
+
+  if (RUNTIME_API.test(url.pathname)) {
+    event.respondWith(runtimeFetch(event, url));
+    return;
+  }
+
+  // Question API: network first, downloaded paper bundles when offline
+  if (QUESTION_API.test(url.pathname)) {
+    event.respondWith(
+      fetch(req).catch(async () => {
+        const offline = await offlineAnswer(url).catch(() => null);
+        return offline || new Response("", { status: 504, statusText: "Offline" });
+      })
+    );
+    return;
+  }
+
+  // Bundles + diagrams cached by the sync above
+  if (url.origin !== self.location.origin) {
+    if (!/\/(bundles|static\/diagrams)\//.test(url.pathname)) return;
+    event.respondWith(
+      caches.open(BUNDLE_CACHE).then((cache) => cache.match(req.url)).then((cached) => cached || fetch(req))
+    );
+    return;
+  }
+
   event.respondWith(
     caches.match(req).then((cached) => {
       if (cached) return cached;